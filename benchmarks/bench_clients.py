@@ -0,0 +1,129 @@
+"""
+Per-call latency of a fresh OpenAI client per call vs. the shared, pooled
+client from `get_client`, against a local fake server (so only client setup
+and connection handling are measured).
+
+    python benchmarks/bench_clients.py [--calls 50]
+"""
+
+# Standard library
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import threading
+import statistics
+import importlib
+from typing import Callable, List
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# Local
+from termite.dtos import Config
+
+call_llm_module = importlib.import_module("termite.shared.call_llm")
+
+
+#########
+# HELPERS
+#########
+
+
+MESSAGES = [{"role": "user", "content": "Hi"}]
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive
+
+    def log_message(self, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        # Otherwise delayed ACKs add ~40ms to every response and hide the difference
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        body = json.dumps(
+            {
+                "id": "chatcmpl-1",
+                "object": "chat.completion",
+                "created": 0,
+                "model": "gpt-4o",
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": "Hello"},
+                        "finish_reason": "stop",
+                    }
+                ],
+            }
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def time_calls(call: Callable[[], None], num_calls: int) -> List[float]:
+    times = []
+    for _ in range(num_calls):
+        start_time = time.perf_counter()
+        call()
+        times.append((time.perf_counter() - start_time) * 1000)
+
+    return times
+
+
+def call_with_fresh_client():
+    import openai
+
+    with openai.OpenAI(max_retries=0) as client:
+        client.chat.completions.create(model="gpt-4o", messages=MESSAGES)
+
+
+def call_with_shared_client(config: Config):
+    call_llm_module.call_llm("System", MESSAGES, config)
+
+
+######
+# MAIN
+######
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=50)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["OPENAI_API_KEY"] = "test"
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+    config = Config(use_cache=False)
+    call_with_fresh_client()  # Warm up the imports
+    call_with_shared_client(config)
+
+    results = {
+        "fresh client per call": time_calls(call_with_fresh_client, args.calls),
+        "shared client": time_calls(
+            lambda: call_with_shared_client(config), args.calls
+        ),
+    }
+    for name, times in results.items():
+        print(
+            f"{name:>24}: median {statistics.median(times):.2f} ms, "
+            f"p90 {statistics.quantiles(times, n=10)[-1]:.2f} ms"
+        )
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Per-token overhead of collecting a streamed response: the old loop
+(`code += token` and a progress bar update per token) vs. StreamCollector, on
+a synthetic 20k-token stream.
+
+    python benchmarks/bench_stream_collector.py [--tokens 20000]
+"""
+
+# Standard library
+import io
+import os
+import sys
+import time
+import random
+import argparse
+from typing import Callable, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# Third party
+from rich.console import Console
+from rich.progress import BarColumn, Progress, TextColumn
+
+# Local
+from termite.shared import StreamCollector, track_progress
+
+
+#########
+# HELPERS
+#########
+
+
+WORDS = [
+    "self", ".", "widget", " =", " urwid", ".Text", "(", '"', "Hello", ")", "\n    "
+]
+
+
+def get_tokens(num_tokens: int) -> List[str]:
+    rng = random.Random(0)
+    return [rng.choice(WORDS) for _ in range(num_tokens)]
+
+
+def get_progress_bar() -> Progress:
+    # Renders to a buffer, as if to a terminal, so repaints cost what they would
+    console = Console(file=io.StringIO(), force_terminal=True, width=100)
+    return Progress(
+        BarColumn(), TextColumn("{task.fields[stats]}"), console=console
+    )
+
+
+def collect_naively(tokens: List[str]) -> str:
+    with get_progress_bar() as p_bar:
+        task = p_bar.add_task("build", total=len(tokens), stats="")
+        code = ""
+        for token in tokens:
+            code += token
+            p_bar.update(task, advance=1)
+
+    return code
+
+
+def collect_with_collector(tokens: List[str]) -> str:
+    with get_progress_bar() as p_bar:
+        task = p_bar.add_task("build", total=len(tokens), stats="")
+        incr_p_bar = track_progress(p_bar, task)
+        collector = StreamCollector(incr_p_bar)
+        for token in tokens:
+            collector.add(token)
+
+        return collector.finish()
+
+
+def time_per_token(collect: Callable[[List[str]], str], tokens: List[str]) -> float:
+    start_time = time.perf_counter()
+    output = collect(tokens)
+    elapsed = time.perf_counter() - start_time
+
+    assert output == "".join(tokens)
+    return elapsed / len(tokens) * 1e6
+
+
+######
+# MAIN
+######
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokens", type=int, default=20000)
+    args = parser.parse_args()
+
+    tokens = get_tokens(args.tokens)
+    for name, collect in (
+        ("+= and an update per token", collect_naively),
+        ("StreamCollector", collect_with_collector),
+    ):
+        print(f"{name:>28}: {time_per_token(collect, tokens):.2f} µs/token")
+
+
+if __name__ == "__main__":
+    main()
@@ -25,10 +25,12 @@ setup(
     ],
     keywords="openai claude cli commandline tui terminal generative-ui",
     include_package_data=True,
-    packages=find_packages(),
+    packages=find_packages(exclude=["tests", "tests.*"]),
+    package_data={"termite": ["shared/utils/seed_requirements.txt"]},
     entry_points={"console_scripts": ["termite = termite.__main__:main"]},
     install_requires=["openai", "anthropic", "ollama", "urwid", "rich", "textual"],
     requires=["openai", "anthropic", "ollama", "urwid", "rich", "textual"],
+    extras_require={"tokens": ["tiktoken"]},  # Exact token counts for budgets
     python_requires=">=3",
     license="Apache License",
 )
@@ -1,22 +1,56 @@
 # Standard library
 import os
+import json
 import time
 import argparse
-from pathlib import Path
+from dataclasses import asdict, replace
+from typing import Dict, List, Optional
 
 # Third party
 from rich.live import Live
+from rich.table import Table
 from rich.console import Console
+from rich.progress import BarColumn, MofNCompleteColumn, Progress, TimeElapsedColumn
 
 # Local
 try:
     from termite.shared import run_tui
-    from termite.termite import termite
-    from termite.dtos import Script, Config
+    from termite.shared.call_llm import STAGES
+    from termite.shared.utils import (
+        seed_venv,
+        parse_keys,
+        start_tracing,
+        save_trace,
+        get_llm_metrics,
+    )
+    from termite.dtos import Script, Config, BatchResult
+    from termite.library import (
+        find_tool,
+        list_tools,
+        load_tool,
+        mark_run,
+        save_tool,
+        suggest_tools,
+    )
 except ImportError:
     from shared import run_tui
-    from termite import termite
-    from dtos import Script, Config
+    from shared.call_llm import STAGES
+    from shared.utils import (
+        seed_venv,
+        parse_keys,
+        start_tracing,
+        save_trace,
+        get_llm_metrics,
+    )
+    from dtos import Script, Config, BatchResult
+    from library import (
+        find_tool,
+        list_tools,
+        load_tool,
+        mark_run,
+        save_tool,
+        suggest_tools,
+    )
 
 console = Console(log_time=False, log_path=False)
 print = console.print
@@ -52,9 +86,13 @@ def get_prompt(args: argparse.Namespace) -> str:
     return prompt
 
 
-def get_tool_name(prompt: str, args: argparse.Namespace) -> str:
+def get_default_name(prompt: str) -> str:
     timestamp = time.strftime("%Y-%m-%d-%H%M%S")
-    default_name = f"{timestamp}_{prompt[:25].replace(' ', '_')}"
+    return f"{timestamp}_{prompt[:25].replace(' ', '_').replace('/', '_')}"
+
+
+def get_tool_name(prompt: str, args: argparse.Namespace) -> str:
+    default_name = get_default_name(prompt)
 
     print("[cyan]What would you like to name your tool?[/cyan]")
     print(f"[bright_black]Default: '{default_name}'[/bright_black]")
@@ -67,37 +105,59 @@ def get_tool_name(prompt: str, args: argparse.Namespace) -> str:
     return tool_name
 
 
-def get_library_home() -> Path:
-    config_home = os.getenv("XDG_CONFIG_HOME", None)
-    if config_home:
-        library_dir = Path(config_home) / "termite"
-    else:
-        library_dir = Path.home() / ".termite"
+def save_to_library(
+    tui: Script, tool_name: str, prompt: str, library: str, quiet: bool = False
+) -> str:
+    file_path = save_tool(tui, tool_name, prompt, library)
+    if not quiet:
+        print(f"[bright_black]\nDone! Code saved to: {file_path}[/bright_black]")
 
-    library_dir.mkdir(parents=True, exist_ok=True)
+    return str(file_path)
 
-    return library_dir
 
+def load_script(name: str) -> Script:
+    tool = find_tool(name)
+    tui = load_tool(tool) if tool else None
+    if not tui:
+        print(f"[red]Error: No tool found with name '{name}'.[/red]")
+        # Never run a fuzzy match: a typo could start a different program
+        hint = "Run `termite --list` to see your tools."
+        if suggestions := suggest_tools(name):
+            names = ", ".join(f"'{suggestion}'" for suggestion in suggestions)
+            hint = f"Did you mean {names}?"
+        print(f"[bright_black]{hint}[/bright_black]")
+        raise SystemExit(1)
 
-def save_to_library(tui: Script, tool_name: str) -> Script:
-    library_dir = get_library_home()
-    file_path = library_dir / f"{tool_name}.py"
+    if tool["name"] != name:
+        print(f"[bright_black]Running '{tool['name']}'[/bright_black]")
 
-    with open(file_path, "w") as file:
-        file.write(tui.code)
+    mark_run(tool, tui)
+    return tui
 
-    print(f"[bright_black]\nDone! Code saved to: {file_path}[/bright_black]")
 
+def format_time(timestamp: Optional[float]) -> str:
+    return time.strftime("%Y-%m-%d %H:%M", time.localtime(timestamp)) if timestamp else ""
 
-def load_script(name: str) -> Script:
-    library_dir = get_library_home()
-    file_path = library_dir / f"{name}.py"
 
-    if not file_path.exists():
-        print(f"[red]Error: No tool found with name '{name}'.[/red]")
-        raise SystemExit
+def print_tools():
+    tools = list_tools()
+    if not tools:
+        print("[bright_black]No tools yet. Describe one to make it.[/bright_black]")
+        return
 
-    return Script(code=file_path.read_text())
+    table = Table(show_edge=False)
+    for column in ("Tool", "Library", "Last run", "Prompt"):
+        table.add_column(column, overflow="ellipsis", no_wrap=column != "Tool")
+
+    for tool in tools:
+        table.add_row(
+            tool["name"],
+            tool["library"] or "",
+            format_time(tool["last_run_at"]),
+            tool["prompt"] or "",
+        )
+
+    print(table)
 
 
 def print_loader(tui: Script):
@@ -113,6 +173,134 @@ def print_loader(tui: Script):
             return
 
 
+def parse_routes(routes: List[str]) -> Dict[str, str]:
+    parsed = {}
+    for route in routes:
+        stage, _, model = (part.strip() for part in route.partition("="))
+        if stage not in STAGES or not model:
+            print(f"[red]Invalid --route '{route}'. Use STAGE=[PROVIDER/]MODEL.[/red]")
+            print(f"[red]Stages: {', '.join(STAGES)}.[/red]")
+            raise SystemExit(1)
+
+        parsed[stage] = model
+
+    return parsed
+
+
+def is_batch(args: argparse.Namespace) -> bool:
+    # `termite batch prompts.jsonl`. Quote a two-word prompt that starts with "batch"
+    return len(args.prompt) == 2 and args.prompt[0] == "batch"
+
+
+def get_batch_names(jobs: List[dict]) -> List[str]:
+    names = []
+    for job in jobs:
+        name = base_name = job.get("name") or get_default_name(job["prompt"])
+        suffix = 2
+        while name in names:
+            name, suffix = f"{base_name}_{suffix}", suffix + 1
+
+        names.append(name)
+
+    return names
+
+
+def print_batch_summary(results: List[BatchResult], wall_time: float):
+    table = Table(show_edge=False, header_style="bold")
+    table.add_column("Tool")
+    table.add_column("Status")
+    table.add_column("Fix attempts", justify="right")
+    table.add_column("Time", justify="right")
+    table.add_column("Tokens (in/out)", justify="right")
+    for result in results:
+        if result.error:
+            status = "[red]failed[/red]"
+        elif result.success:
+            status = "[green]ok[/green]"
+        else:
+            status = f"[yellow]errors ({result.stop_reason})[/yellow]"
+
+        table.add_row(
+            result.name,
+            status,
+            str(result.fix_attempts),
+            f"{result.wall_time:.1f}s",
+            f"{result.input_tokens:,}/{result.output_tokens:,}",
+        )
+
+    print(table)
+
+    num_ok = sum(result.success for result in results)
+    num_tokens = sum(r.input_tokens + r.output_tokens for r in results)
+    print(
+        f"[bright_black]\n{num_ok}/{len(results)} TUIs run without errors. "
+        f"{wall_time:.1f}s total, {num_tokens:,} tokens, "
+        f"{sum(r.llm_calls for r in results)} LLM calls.[/bright_black]"
+    )
+
+    for provider, metrics in get_llm_metrics().items():
+        if metrics["retries"] or metrics["wait_time"]:
+            wait_time = metrics["wait_time"] + metrics["backoff_time"]
+            print(
+                f"[bright_black]{provider}: {metrics['retries']} retries "
+                f"({metrics['throttled']} throttled), {wait_time:.1f}s waiting on "
+                f"rate limits, max. queue depth {metrics['max_queue_depth']}."
+                "[/bright_black]"
+            )
+
+
+def run_batch(path: str, config: Config, args: argparse.Namespace):
+    try:
+        from termite.batch import batch, load_jobs
+    except ImportError:
+        from batch import batch, load_jobs
+
+    jobs = load_jobs(path)
+    for job, name in zip(jobs, get_batch_names(jobs)):
+        job["name"] = name
+
+    # Enough concurrency to keep the LLM busy, without oversubscribing the CPUs
+    config = replace(
+        config,
+        max_llm_calls=config.max_llm_calls or config.llm_pool_size,
+        max_validations=config.max_validations or os.cpu_count(),
+    )
+
+    progress = Progress(
+        BarColumn(), MofNCompleteColumn(), TimeElapsedColumn(), console=console
+    )
+    task = progress.add_task("batch", total=len(jobs))
+
+    libraries = {job["name"]: job.get("library", config.library) for job in jobs}
+
+    def _on_done(result: BatchResult, tui: Script):
+        if tui:
+            library = libraries[result.name]
+            try:
+                result.path = save_to_library(
+                    tui, result.name, result.prompt, library, quiet=True
+                )
+            except OSError as e:
+                result.success = False
+                result.error = f"Failed to save: {e}"
+
+        mark = "[green]✓[/green]" if result.success else "[red]✗[/red]"
+        progress.console.print(f"{mark} {result.name}")
+        progress.advance(task)
+
+    start_time = time.monotonic()
+    with progress:
+        results = batch(jobs, config, args.jobs, _on_done)
+
+    wall_time = time.monotonic() - start_time
+    print_batch_summary(results, wall_time)
+
+    if args.report:
+        with open(args.report, "w") as file:
+            report = {"wall_time": wall_time, "results": [asdict(r) for r in results]}
+            json.dump(report, file, indent=2)
+
+
 ######
 # MAIN
 ######
@@ -127,7 +315,7 @@ def main():
     parser.add_argument(
         "prompt",
         nargs="*",
-        help="Description of the TUI you want to generate.",
+        help="Description of the TUI you want to generate. Use `termite batch prompts.jsonl` to generate one TUI per line of a file.",
     )
     parser.add_argument(
         "--library",
@@ -148,6 +336,13 @@ def main():
         default=1,
         help="Number of refinement iterations to perform.",
     )
+    parser.add_argument(
+        "--refine-branches",
+        required=False,
+        type=int,
+        default=1,
+        help="Number of refined variants to try in parallel per iteration (the best one is kept).",
+    )
     parser.add_argument(
         "--fix-iters",
         type=int,
@@ -155,34 +350,184 @@ def main():
         default=10,
         help="Max. # of iterations to fix errors.",
     )
+    parser.add_argument(
+        "--fix-mode",
+        type=str,
+        required=False,
+        default="rewrite",
+        choices=["rewrite", "edit"],
+        help="Fix bugs by rewriting the whole script, or with small edits (faster).",
+    )
+    parser.add_argument(
+        "--candidates",
+        type=int,
+        required=False,
+        default=1,
+        help="Generate this many TUIs in parallel and keep the first one that runs.",
+    )
+    parser.add_argument(
+        "--keys",
+        type=str,
+        required=False,
+        default=None,
+        help="Comma-separated keys to press while testing the TUI, e.g. 'r,down,enter' (default: taken from the design, '' to disable).",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Don't reuse cached LLM responses from previous runs.",
+    )
     parser.add_argument(
         "--run-tool",
         type=str,
         default=None,
         help="Run a previously generated TUI. Use --name when creating a TUI to name it.",
     )
+    parser.add_argument(
+        "--list",
+        action="store_true",
+        help="List your previously generated TUIs.",
+    )
+    parser.add_argument(
+        "--seed-venv",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="LOCKFILE",
+        help="Pre-install a requirements lockfile (default: pinned versions of the TUI libraries) into Termite's venv, caching wheels for offline use.",
+    )
+    parser.add_argument(
+        "--trace",
+        type=str,
+        default=None,
+        metavar="FILE",
+        help="Save a timing/token trace of the run (Chrome trace format, open it in ui.perfetto.dev).",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        required=False,
+        default=4,
+        help="Batch mode: max. # of TUIs to generate at once.",
+    )
+    parser.add_argument(
+        "--max-llm-calls",
+        type=int,
+        required=False,
+        default=None,
+        help="Max. # of LLM requests in flight at once (batch mode default: 10).",
+    )
+    parser.add_argument(
+        "--max-validations",
+        type=int,
+        required=False,
+        default=None,
+        help="Max. # of TUIs being tested at once (batch mode default: # of CPUs).",
+    )
+    parser.add_argument(
+        "--rpm",
+        type=int,
+        required=False,
+        default=None,
+        help="Max. LLM requests per minute (default: no limit).",
+    )
+    parser.add_argument(
+        "--tpm",
+        type=int,
+        required=False,
+        default=None,
+        help="Max. LLM tokens per minute (default: no limit).",
+    )
+    parser.add_argument(
+        "--route",
+        type=str,
+        action="append",
+        default=[],
+        metavar="STAGE=[PROVIDER/]MODEL",
+        help="Use a different model for a stage (design, build, fix, refine, import-resolve), e.g. 'fix=anthropic/claude-3-5-haiku-20241022'. Can be repeated.",
+    )
+    parser.add_argument(
+        "--report",
+        type=str,
+        default=None,
+        metavar="FILE",
+        help="Batch mode: also save the summary report as JSON.",
+    )
     args = parser.parse_args()
     config = Config(
         library=args.library,
         should_refine=args.refine,
         refine_iters=args.refine_iters,
+        refine_branches=args.refine_branches,
         fix_iters=args.fix_iters,
+        fix_mode=args.fix_mode,
+        candidates=args.candidates,
+        keystrokes=parse_keys(args.keys) if args.keys is not None else None,
+        use_cache=not args.no_cache,
+        max_llm_calls=args.max_llm_calls,
+        max_validations=args.max_validations,
+        requests_per_minute=args.rpm,
+        tokens_per_minute=args.tpm,
+        routes=parse_routes(args.route),
     )
 
+    if args.seed_venv is not None:
+        failed = seed_venv(args.seed_venv or None)
+        if failed:
+            print(f"[red]Couldn't install: {', '.join(failed)}.[/red]")
+            raise SystemExit(1)
+
+        print("[bright_black]Venv is ready.[/bright_black]")
+        return
+
+    if args.list:
+        print_tools()
+        return
+
     if args.run_tool is not None:
+        # Saved tools are run straight away, from their precompiled bytecode
         tui = load_script(args.run_tool)
-        print_loader(tui)
         run_tui(tui, pseudo=False)
         return
 
+    if args.trace:
+        start_tracing()
+
+    if is_batch(args):
+        if not os.path.isfile(args.prompt[1]):
+            print(f"[red]Error: No prompt file found at '{args.prompt[1]}'.[/red]")
+            print(
+                "[bright_black]To use this as a prompt instead, put it in quotes."
+                "[/bright_black]"
+            )
+            raise SystemExit(1)
+
+        try:
+            run_batch(args.prompt[1], config, args)
+        finally:
+            if args.trace:
+                save_trace(args.trace)
+        return
+
     prompt = get_prompt(args)
     if not prompt or not prompt.strip():
         print("[red]Please provide a non-empty prompt.[/red]")
         return
 
-    tui = termite(prompt, config)
+    # The generation pipeline is only imported when it's needed (not for --run-tool)
+    try:
+        from termite.termite import termite
+    except ImportError:
+        from termite import termite
+
+    try:
+        tui = termite(prompt, config)
+    finally:
+        if args.trace:
+            save_trace(args.trace)
+
     tool_name = get_tool_name(prompt, args)
-    save_to_library(tui, tool_name)
+    save_to_library(tui, tool_name, prompt, config.library)
     print_loader(tui)
 
     if not tui.stderr:
@@ -0,0 +1,133 @@
+# Standard library
+import json
+import time
+import asyncio
+from dataclasses import replace
+from typing import Callable, Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+
+# Local
+try:
+    from termite.termite import atermite
+    from termite.shared import aclose_clients
+    from termite.shared.utils import span
+    from termite.dtos import Script, Config, BatchResult
+except ImportError:
+    from termite import atermite
+    from shared import aclose_clients
+    from shared.utils import span
+    from dtos import Script, Config, BatchResult
+
+
+#########
+# HELPERS
+#########
+
+
+THREADS_PER_JOB = 4  # Warm-up, import installs, fixing/refining
+
+
+async def run_job(
+    job: Dict[str, str],
+    config: Config,
+    semaphore: asyncio.Semaphore,
+    on_done: Callable[[BatchResult, Optional[Script]], None],
+) -> BatchResult:
+    async with semaphore:
+        config = replace(config, library=job.get("library", config.library))
+        result = BatchResult(name=job["name"], prompt=job["prompt"])
+        script = None
+
+        start_time = time.monotonic()
+        with span("batch job", "batch", tool=job["name"]) as curr_span:
+            try:
+                script = await atermite(job["prompt"], config)
+            except Exception as e:
+                result.error = f"{type(e).__name__}: {e}"
+
+        result.wall_time = time.monotonic() - start_time
+        result.input_tokens = curr_span.args.get("input_tokens", 0)
+        result.output_tokens = curr_span.args.get("output_tokens", 0)
+        result.llm_calls = curr_span.args.get("llm_calls", 0)
+        if script:
+            result.success = not script.stderr
+            if script.fix_report:
+                result.fix_attempts = len(script.fix_report.steps)
+                result.stop_reason = script.fix_report.stop_reason
+
+        try:
+            on_done(result, script)
+        except Exception as e:  # Don't lose the other jobs' results over one
+            result.success = False
+            result.error = result.error or f"{type(e).__name__}: {e}"
+
+        return result
+
+
+######
+# MAIN
+######
+
+
+def load_jobs(path: str) -> List[Dict[str, str]]:
+    """
+    Reads a JSONL prompt file. Each line is either a prompt string or an object
+    with a "prompt" and, optionally, a "name" and a "library".
+    """
+
+    jobs = []
+    with open(path) as file:
+        for line_num, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+
+            try:
+                job = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(
+                    f"Line {line_num} of {path} is not valid JSON: {e}"
+                ) from e
+
+            job = {"prompt": job} if isinstance(job, str) else job
+            if not isinstance(job, dict) or not str(job.get("prompt", "")).strip():
+                raise ValueError(f"Line {line_num} of {path} has no prompt.")
+
+            jobs.append(job)
+
+    return jobs
+
+
+async def abatch(
+    jobs: List[Dict[str, str]],
+    config: Config,
+    max_jobs: int,
+    on_done: Callable[[BatchResult, Optional[Script]], None],
+) -> List[BatchResult]:
+    """
+    Runs up to `max_jobs` pipelines at once in one event loop. They share the
+    LLM clients, validation workers and the `config.max_llm_calls` and
+    `config.max_validations` limits. `on_done` is called as each one finishes.
+    """
+
+    config = replace(config, quiet=True)
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=max_jobs * THREADS_PER_JOB)
+    loop.set_default_executor(executor)
+
+    semaphore = asyncio.Semaphore(max_jobs)
+    try:
+        return await asyncio.gather(
+            *(run_job(job, config, semaphore, on_done) for job in jobs)
+        )
+    finally:
+        await aclose_clients()
+        executor.shutdown(wait=False)  # Jobs are done; don't block the loop
+
+
+def batch(
+    jobs: List[Dict[str, str]],
+    config: Config,
+    max_jobs: int,
+    on_done: Callable[[BatchResult, Optional[Script]], None],
+) -> List[BatchResult]:
+    return asyncio.run(abatch(jobs, config, max_jobs, on_done))
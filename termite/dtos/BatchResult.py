@@ -0,0 +1,18 @@
+# Standard library
+from typing import Optional
+from dataclasses import dataclass
+
+
+@dataclass
+class BatchResult:
+    name: str
+    prompt: str
+    success: bool = False  # The final script ran without errors
+    fix_attempts: int = 0
+    stop_reason: Optional[str] = None  # Why the fix loop ended (see FixReport)
+    wall_time: float = 0.0  # Seconds
+    input_tokens: int = 0  # Sent to the LLM (cached responses don't count)
+    output_tokens: int = 0
+    llm_calls: int = 0
+    path: Optional[str] = None  # Where the script was saved in the library
+    error: Optional[str] = None  # Exception that stopped the pipeline, if any
@@ -1,5 +1,6 @@
 # Standard library
-from dataclasses import dataclass
+from typing import Dict, List, Optional
+from dataclasses import dataclass, field
 
 
 @dataclass
@@ -7,4 +8,41 @@ class Config:
     library: str = "urwid"
     should_refine: bool = False
     refine_iters: int = 1
+    refine_branches: int = 1  # Variants to refine in parallel per iteration (best wins)
+    refine_context_tokens: int = 16000  # Prompt budget for the refine history
     fix_iters: int = 10
+    fix_mode: str = "rewrite"  # "rewrite" (full script) or "edit" (SEARCH/REPLACE hunks)
+    candidates: int = 1  # Scripts to generate in parallel in build_tui
+    build_retries: int = 1  # Times to re-issue a build that streams broken code
+    validate_timeout: float = 5.0  # Max. seconds to watch a TUI during validation
+    settle_time: float = 1.0  # Seconds of quiet after rendering before a TUI is healthy
+    keystrokes: Optional[List[str]] = None  # Keys to type during validation (None: from design)
+    key_delay: float = 0.3  # Seconds for the screen to settle after each keystroke
+    preflight: bool = True  # Statically check scripts before running them
+    speculate: bool = True  # Install a fix's new imports while it's still streaming
+    pool_size: int = 2  # Warm validation workers to keep booted (0 to disable)
+    cpu_limit: int = 30  # Max. CPU seconds a script can use during validation
+    # RLIMIT_AS caps virtual address space, not RSS, so thread-heavy libraries
+    # (e.g. OpenBLAS) can hit it while using far less memory. Off by default
+    memory_limit_mb: Optional[int] = None
+    max_open_files: int = 512
+    max_procs: Optional[int] = None  # RLIMIT_NPROC (counts all of the user's processes)
+    use_cache: bool = True  # Replay identical LLM calls from ~/.termite
+    cache_size_mb: int = 100
+    llm_pool_size: int = 10  # Max. pooled HTTP connections per LLM provider
+    llm_timeout: float = 600.0  # Seconds before an LLM request times out
+    ollama_keep_alive: str = "30m"  # How long Ollama keeps the model loaded after a call
+    ollama_num_ctx: Optional[int] = 16384  # Context window (Ollama's default truncates)
+    ollama_num_predict: Optional[int] = None  # Max. output tokens (None: MAX_TOKENS)
+    max_llm_calls: Optional[int] = None  # LLM requests in flight at once
+    max_validations: Optional[int] = None  # TUIs being validated at once
+    quiet: bool = False  # Hide the progress bars and stage logs (e.g. in batch mode)
+    requests_per_minute: Optional[int] = None  # LLM request budget per provider
+    tokens_per_minute: Optional[int] = None  # Input + output tokens, per provider
+    llm_retries: int = 5  # Retries for throttled (429) or transient LLM errors
+    retry_base_delay: float = 1.0  # Seconds; doubles with each retry
+    retry_max_delay: float = 60.0
+
+    # Stage ("design", "build", "fix", "refine" or "import-resolve") to
+    # "[provider/]model". Unlisted stages use the env's provider and its defaults
+    routes: Dict[str, str] = field(default_factory=dict)
@@ -0,0 +1,15 @@
+# Standard library
+from typing import List, Optional
+from dataclasses import dataclass, field
+
+# Local
+try:
+    from termite.dtos.FixStep import FixStep
+except ImportError:
+    from dtos.FixStep import FixStep
+
+
+@dataclass
+class FixReport:
+    steps: List[FixStep] = field(default_factory=list)
+    stop_reason: Optional[str] = None  # "fixed", "stuck" or "max_iters"
@@ -0,0 +1,15 @@
+# Standard library
+from typing import Optional
+from dataclasses import dataclass
+
+
+@dataclass
+class FixStep:
+    iteration: int
+    strategy: str  # "edit", "rewrite" or "regenerate"
+    temperature: Optional[float]  # None for the provider default
+    error: str  # Last line of the error being fixed
+    error_hash: str  # Hash of the normalized error
+    code_hash: str  # Hash of the script being fixed
+    outcome: Optional[str] = None  # "fixed", "new_error", "same_error", "no_op", "cycle"
+    duration: float = 0.0  # Seconds spent generating the fix
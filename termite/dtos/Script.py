@@ -2,11 +2,22 @@
 from typing import Optional
 from dataclasses import dataclass
 
+# Local
+try:
+    from termite.dtos.FixReport import FixReport
+except ImportError:
+    from dtos.FixReport import FixReport
+
 
 @dataclass
 class Script:
     code: str
     stdout: Optional[str] = None
     stderr: Optional[str] = None
-    # snapshot: Optional[str] = None
+    snapshot: Optional[str] = None  # Text on the (emulated) screen after validation
     reflection: Optional[str] = None
+    tokens_saved: int = 0  # Est. output tokens saved by edit-mode fixes so far
+    max_rss_mb: Optional[float] = None  # Peak memory of the last validation run
+    cpu_time: Optional[float] = None  # CPU seconds used by the last validation run
+    fix_report: Optional[FixReport] = None  # How the last fix_errors loop went
+    path: Optional[str] = None  # Where the script is saved in the library, if it is
@@ -1,6 +1,12 @@
 try:
     from termite.dtos.Script import Script
     from termite.dtos.Config import Config
+    from termite.dtos.FixStep import FixStep
+    from termite.dtos.FixReport import FixReport
+    from termite.dtos.BatchResult import BatchResult
 except ImportError:
     from dtos.Script import Script
     from dtos.Config import Config
+    from dtos.FixStep import FixStep
+    from dtos.FixReport import FixReport
+    from dtos.BatchResult import BatchResult
@@ -0,0 +1,221 @@
+# Standard library
+import os
+import sys
+import json
+import time
+import hashlib
+import difflib
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Local
+try:
+    from termite.dtos import Script
+    from termite.shared.utils.bytecode import compile_script
+    from termite.shared.utils.fix_imports import collect_imports
+except ImportError:
+    from dtos import Script
+    from shared.utils.bytecode import compile_script
+    from shared.utils.fix_imports import collect_imports
+
+
+#########
+# HELPERS
+#########
+
+
+INDEX_FILE = "index.json"
+STDLIB_MODULES = frozenset(sys.builtin_module_names) | frozenset(
+    getattr(sys, "stdlib_module_names", ())  # Python 3.10+
+)
+
+
+def get_hash(code: str) -> str:
+    return hashlib.sha256(code.encode()).hexdigest()
+
+
+def get_dependencies(code: str) -> List[str]:
+    try:
+        modules = collect_imports(code)
+    except SyntaxError:
+        return []
+
+    return [module for module in modules if module not in STDLIB_MODULES]
+
+
+def get_index_path() -> Path:
+    return get_library_home() / INDEX_FILE
+
+
+def get_file_entry(file_path: Path) -> Dict:
+    # For scripts that were put in the library by hand (or before the index)
+    code = file_path.read_text()
+    return {
+        "name": file_path.stem,
+        "file": file_path.name,
+        "prompt": None,
+        "library": None,
+        "dependencies": get_dependencies(code),
+        "hash": get_hash(code),
+        "created_at": file_path.stat().st_mtime,
+        "last_run_at": None,
+    }
+
+
+def reconcile_index(tools: Dict[str, Dict]) -> bool:
+    """
+    Brings the index in line with the scripts in the library directory: new
+    files are added and deleted ones dropped. Returns whether anything changed.
+    """
+
+    files = {path.name: path for path in get_library_home().glob("*.py")}
+    tracked = {tool["file"] for tool in tools.values()}
+
+    changed = False
+    for file_name, file_path in files.items():
+        if file_name not in tracked and file_path.stem not in tools:
+            tools[file_path.stem] = get_file_entry(file_path)
+            changed = True
+
+    for name in [name for name, tool in tools.items() if tool["file"] not in files]:
+        del tools[name]
+        changed = True
+
+    return changed
+
+
+def load_index() -> Dict[str, Dict]:
+    tools = {}
+    try:
+        with open(get_index_path()) as file:
+            tools = json.load(file)["tools"]
+    except (OSError, ValueError, KeyError):
+        pass  # Missing or corrupted, so start over from the saved scripts
+
+    if reconcile_index(tools) or not get_index_path().exists():
+        save_index(tools)
+
+    return tools
+
+
+def save_index(tools: Dict[str, Dict]):
+    # Write then rename, so a concurrent reader never sees half an index
+    index_path = get_index_path()
+    with tempfile.NamedTemporaryFile(
+        mode="w", dir=index_path.parent, suffix=".tmp", delete=False
+    ) as temp_file:
+        json.dump({"tools": tools}, temp_file, indent=2)
+
+    os.replace(temp_file.name, index_path)
+
+
+######
+# MAIN
+######
+
+
+def get_library_home() -> Path:
+    config_home = os.getenv("XDG_CONFIG_HOME", None)
+    if config_home:
+        library_dir = Path(config_home) / "termite"
+    else:
+        library_dir = Path.home() / ".termite"
+
+    library_dir.mkdir(parents=True, exist_ok=True)
+
+    return library_dir
+
+
+def save_tool(
+    tui: Script, name: str, prompt: Optional[str] = None, library: Optional[str] = None
+) -> Path:
+    """
+    Saves a script to the library, compiles it ahead of time and records it in
+    the index.
+    """
+
+    file_path = get_library_home() / f"{name}.py"
+    with open(file_path, "w") as file:
+        file.write(tui.code)
+
+    compile_script(str(file_path))
+
+    tools = load_index()
+    tools[name] = {
+        "name": name,
+        "file": file_path.name,
+        "prompt": prompt,
+        "library": library,
+        "dependencies": get_dependencies(tui.code),
+        "hash": get_hash(tui.code),
+        "created_at": time.time(),
+        "last_run_at": None,
+    }
+    save_index(tools)
+
+    tui.path = str(file_path)
+    return file_path
+
+
+def list_tools() -> List[Dict]:
+    """
+    Returns the index's entries, most recently used first.
+    """
+
+    tools = load_index().values()
+    return sorted(
+        tools, key=lambda tool: tool["last_run_at"] or tool["created_at"], reverse=True
+    )
+
+
+def find_tool(name: str) -> Optional[Dict]:
+    """
+    Looks a tool up by name, falling back to a case-insensitive match. Nothing
+    fuzzier, since whatever is found gets run.
+    """
+
+    tools = load_index()
+    if name in tools:
+        return tools[name]
+
+    lowered = {tool_name.lower(): tool_name for tool_name in tools}
+    if name.lower() in lowered:
+        return tools[lowered[name.lower()]]
+
+    return None
+
+
+def suggest_tools(name: str) -> List[str]:
+    """
+    Names of tools that `name` might be a typo or part of, closest first.
+    """
+
+    tool_names = list(load_index())
+    lowered = {tool_name.lower(): tool_name for tool_name in tool_names}
+    closest = difflib.get_close_matches(name.lower(), lowered, n=3, cutoff=0.6)
+    partial = [t for t in lowered if name.lower() in t and t not in closest]
+    return [lowered[tool_name] for tool_name in closest + partial]
+
+
+def load_tool(tool: Dict) -> Optional[Script]:
+    file_path = get_library_home() / tool["file"]
+    if not file_path.exists():
+        return None
+
+    # The script is read from disk (not the index), so it can be edited by hand
+    return Script(code=file_path.read_text(), path=str(file_path))
+
+
+def mark_run(tool: Dict, tui: Script):
+    tools = load_index()
+    if tool["name"] not in tools:
+        return
+
+    entry = tools[tool["name"]]
+    entry["last_run_at"] = time.time()
+    if entry["hash"] != (code_hash := get_hash(tui.code)):
+        entry["hash"] = code_hash
+        entry["dependencies"] = get_dependencies(tui.code)
+
+    save_index(tools)
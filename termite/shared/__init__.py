@@ -1,6 +1,8 @@
 try:
     from termite.shared.run_tui import run_tui
-    from termite.shared.call_llm import call_llm, MAX_TOKENS
+    from termite.shared.call_llm import call_llm, acall_llm, aclose_clients, MAX_TOKENS
+    from termite.shared.stream_collector import StreamCollector, track_progress
 except ImportError:
     from shared.run_tui import run_tui
-    from shared.call_llm import call_llm, MAX_TOKENS
+    from shared.call_llm import call_llm, acall_llm, aclose_clients, MAX_TOKENS
+    from shared.stream_collector import StreamCollector, track_progress
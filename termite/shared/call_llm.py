@@ -1,11 +1,64 @@
 # Standard library
 import os
-from typing import Union, Generator, Dict, List
+import asyncio
+import weakref
+import itertools
+import threading
+from typing import Any, AsyncGenerator, Union, Generator, Dict, List, Optional, Tuple
 
-# Third party
-from ollama import chat
-from openai import OpenAI
-from anthropic import Anthropic
+# Local
+try:
+    from termite.dtos import Config
+    from termite.shared.utils.llm_cache import (
+        is_cache_disabled,
+        get_cache_key,
+        get_cached_response,
+        cache_response,
+        replay_response,
+        record_response,
+        areplay_response,
+        arecord_response,
+    )
+    from termite.shared.utils.count_tokens import count_tokens
+    from termite.shared.utils.slots import acquire_slot, aacquire_slot
+    from termite.shared.utils.rate_limiter import (
+        get_rate_limiter,
+        send_with_retries,
+        asend_with_retries,
+    )
+    from termite.shared.utils.tracing import (
+        Span,
+        start_span,
+        record_output,
+        trace_stream,
+        atrace_stream,
+    )
+except ImportError:
+    from dtos import Config
+    from shared.utils.llm_cache import (
+        is_cache_disabled,
+        get_cache_key,
+        get_cached_response,
+        cache_response,
+        replay_response,
+        record_response,
+        areplay_response,
+        arecord_response,
+    )
+    from shared.utils.count_tokens import count_tokens
+    from shared.utils.slots import acquire_slot, aacquire_slot
+    from shared.utils.rate_limiter import (
+        get_rate_limiter,
+        send_with_retries,
+        asend_with_retries,
+    )
+    from shared.utils.tracing import (
+        Span,
+        start_span,
+        record_output,
+        trace_stream,
+        atrace_stream,
+    )
 
 
 #########
@@ -14,6 +67,29 @@ from anthropic import Anthropic
 
 
 MAX_TOKENS = 8192
+PROVIDERS = ("openai", "anthropic", "ollama")
+STAGES = ("design", "build", "fix", "refine", "import-resolve")
+
+# Models used for each stage unless Config.routes says otherwise. Looking up
+# package names doesn't need a big model. (Ollama uses $OLLAMA_MODEL.)
+DEFAULT_MODELS = {
+    "openai": {"default": "gpt-4o", "import-resolve": "gpt-4o-mini"},
+    "anthropic": {
+        "default": "claude-3-5-sonnet-20241022",
+        "import-resolve": "claude-3-5-haiku-20241022",
+    },
+}
+
+# Provider clients are created once per process and shared across threads so
+# that every call reuses the same connection pool (and TLS sessions)
+_clients: Dict[str, Any] = {}
+_clients_lock = threading.Lock()
+
+# Async clients are bound to the event loop they were created in
+_async_clients = weakref.WeakKeyDictionary()
+
+# Retries are handled by send_with_retries, not by the SDKs
+SDK_MAX_RETRIES = 0
 
 
 def get_llm_provider():
@@ -31,10 +107,96 @@ def get_llm_provider():
     )
 
 
+def get_route(stage: Optional[str], config: Config) -> Tuple[str, Optional[str]]:
+    """
+    Picks the provider and model for a pipeline stage. Routes look like
+    "anthropic/claude-3-5-haiku-20241022", or just a model name to use the
+    provider from the environment.
+    """
+
+    route = config.routes.get(stage, "") if stage else ""
+    provider, _, model = route.partition("/")
+    if provider not in PROVIDERS:
+        provider, model = "", route
+
+    provider = provider or get_llm_provider()
+    if not model and provider == "ollama":
+        model = os.getenv("OLLAMA_MODEL", None)
+    elif not model:
+        models = DEFAULT_MODELS[provider]
+        model = models.get(stage, models["default"])
+
+    return provider, model
+
+
+def create_client(provider: str, config: Config, is_async: bool = False) -> Any:
+    # Provider SDKs are slow to import, so only load the one that's being used
+    from httpx import Limits
+
+    limits = Limits(
+        max_connections=config.llm_pool_size,
+        max_keepalive_connections=config.llm_pool_size,
+    )
+    if provider == "openai":
+        import openai
+
+        if is_async:
+            http_client = openai.DefaultAsyncHttpxClient(
+                limits=limits, timeout=config.llm_timeout
+            )
+            return openai.AsyncOpenAI(
+                http_client=http_client, max_retries=SDK_MAX_RETRIES
+            )
+
+        http_client = openai.DefaultHttpxClient(limits=limits, timeout=config.llm_timeout)
+        return openai.OpenAI(http_client=http_client, max_retries=SDK_MAX_RETRIES)
+    elif provider == "anthropic":
+        import anthropic
+
+        if is_async:
+            http_client = anthropic.DefaultAsyncHttpxClient(
+                limits=limits, timeout=config.llm_timeout
+            )
+            return anthropic.AsyncAnthropic(
+                http_client=http_client, max_retries=SDK_MAX_RETRIES
+            )
+
+        http_client = anthropic.DefaultHttpxClient(
+            limits=limits, timeout=config.llm_timeout
+        )
+        return anthropic.Anthropic(http_client=http_client, max_retries=SDK_MAX_RETRIES)
+    elif provider == "ollama":
+        import ollama
+
+        client = ollama.AsyncClient if is_async else ollama.Client
+        return client(limits=limits, timeout=config.llm_timeout)
+
+
+def get_client(provider: str, config: Config) -> Any:
+    with _clients_lock:
+        if provider not in _clients:
+            _clients[provider] = create_client(provider, config)
+
+        return _clients[provider]
+
+
+def get_async_client(provider: str, config: Config) -> Any:
+    clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    if provider not in clients:
+        clients[provider] = create_client(provider, config, is_async=True)
+
+    return clients[provider]
+
+
+def get_openai_extras(**kwargs) -> Dict[str, Any]:
+    # Predicted outputs are OpenAI-only; other providers ignore the kwarg
+    return {"prediction": kwargs["prediction"]} if "prediction" in kwargs else {}
+
+
 def call_openai(
-    system: str, messages: List[Dict[str, str]], **kwargs
+    system: str, messages: List[Dict[str, str]], config: Config, **kwargs
 ) -> Union[str, Generator[str, None, None]]:
-    openai = OpenAI()
+    openai = get_client("openai", config)
     stream = False if "stream" not in kwargs else kwargs["stream"]
     response = openai.chat.completions.create(
         messages=[{"role": "system", "content": system}, *messages],
@@ -42,25 +204,36 @@ def call_openai(
         temperature=0.7 if "temperature" not in kwargs else kwargs["temperature"],
         stream=stream,
         max_tokens=MAX_TOKENS,
+        **get_openai_extras(**kwargs),
     )
 
     if not stream:
         return response.choices[0].message.content
 
-    response = (e.choices[0] for e in response)
-    response = (e for e in response if e.finish_reason != "stop" and e.delta.content)
-    response = (e.delta.content for e in response)
+    # Closing the generator early also closes the HTTP stream
+    def _stream():
+        try:
+            for e in response:
+                e = e.choices[0]
+                if e.finish_reason != "stop" and e.delta.content:
+                    yield e.delta.content
+        finally:
+            response.close()
 
-    return response
+    return _stream()
 
 
 def call_anthropic(
-    system: str, messages: List[Dict[str, str]], **kwargs
+    system: str, messages: List[Dict[str, str]], config: Config, **kwargs
 ) -> Union[str, Generator[str, None, None]]:
-    anthropic = Anthropic()
+    anthropic = get_client("anthropic", config)
     stream = False if "stream" not in kwargs else kwargs["stream"]
     response = anthropic.messages.create(
-        model="claude-3-5-sonnet-20241022",
+        model=(
+            DEFAULT_MODELS["anthropic"]["default"]
+            if "model" not in kwargs
+            else kwargs["model"]
+        ),
         max_tokens=MAX_TOKENS,
         system=system,
         messages=messages,
@@ -71,18 +244,350 @@ def call_anthropic(
     if not stream:
         return response.content[0].text
 
-    response = (e for e in response if e.type == "content_block_delta")
-    response = (e.delta.text for e in response)
+    def _stream():
+        try:
+            for e in response:
+                if e.type == "content_block_delta":
+                    yield e.delta.text
+        finally:
+            response.close()
 
-    return response
+    return _stream()
+
+
+def get_ollama_options(config: Config, **kwargs) -> Dict[str, Any]:
+    # num_ctx has to stay the same from call to call, or Ollama reloads the model
+    options = {
+        "temperature": 0.7 if "temperature" not in kwargs else kwargs["temperature"],
+        "num_predict": config.ollama_num_predict or MAX_TOKENS,
+    }
+    if config.ollama_num_ctx:
+        options["num_ctx"] = config.ollama_num_ctx
 
+    return options
 
-def call_ollama(system: str, messages: List[Dict[str, str]]) -> str:
-    response = chat(
-        model=os.getenv("OLLAMA_MODEL", None),
+
+def call_ollama(
+    system: str, messages: List[Dict[str, str]], config: Config, **kwargs
+) -> Union[str, Generator[str, None, None]]:
+    ollama = get_client("ollama", config)
+    stream = False if "stream" not in kwargs else kwargs["stream"]
+    response = ollama.chat(
+        model=kwargs.get("model", None) or os.getenv("OLLAMA_MODEL", None),
+        messages=[{"role": "system", "content": system}, *messages],
+        options=get_ollama_options(config, **kwargs),
+        keep_alive=config.ollama_keep_alive,
+        stream=stream,
+    )
+
+    if not stream:
+        return response.message.content
+
+    # The client only sends the request once the stream is read, so read the
+    # first chunk here, where errors can still be retried
+    first_chunk = next(response, None)
+
+    def _stream():
+        try:
+            for e in itertools.chain([first_chunk] if first_chunk else [], response):
+                if e.message.content:
+                    yield e.message.content
+        finally:
+            response.close()
+
+    return _stream()
+
+
+def call_provider(
+    provider: str,
+    system: str,
+    messages: List[Dict[str, str]],
+    config: Config,
+    **kwargs,
+) -> Union[str, Generator[str, None, None]]:
+    if provider == "openai":
+        return call_openai(system, messages, config, **kwargs)
+    elif provider == "anthropic":
+        return call_anthropic(system, messages, config, **kwargs)
+    elif provider == "ollama":
+        return call_ollama(system, messages, config, **kwargs)
+
+
+async def acall_openai(
+    system: str, messages: List[Dict[str, str]], config: Config, **kwargs
+) -> Union[str, AsyncGenerator[str, None]]:
+    openai = get_async_client("openai", config)
+    stream = False if "stream" not in kwargs else kwargs["stream"]
+    response = await openai.chat.completions.create(
         messages=[{"role": "system", "content": system}, *messages],
+        model="gpt-4o" if "model" not in kwargs else kwargs["model"],
+        temperature=0.7 if "temperature" not in kwargs else kwargs["temperature"],
+        stream=stream,
+        max_tokens=MAX_TOKENS,
+        **get_openai_extras(**kwargs),
     )
-    return response.message.content
+
+    if not stream:
+        return response.choices[0].message.content
+
+    async def _stream():
+        try:
+            async for e in response:
+                e = e.choices[0]
+                if e.finish_reason != "stop" and e.delta.content:
+                    yield e.delta.content
+        finally:
+            await response.close()
+
+    return _stream()
+
+
+async def acall_anthropic(
+    system: str, messages: List[Dict[str, str]], config: Config, **kwargs
+) -> Union[str, AsyncGenerator[str, None]]:
+    anthropic = get_async_client("anthropic", config)
+    stream = False if "stream" not in kwargs else kwargs["stream"]
+    response = await anthropic.messages.create(
+        model=(
+            DEFAULT_MODELS["anthropic"]["default"]
+            if "model" not in kwargs
+            else kwargs["model"]
+        ),
+        max_tokens=MAX_TOKENS,
+        system=system,
+        messages=messages,
+        temperature=0.7 if "temperature" not in kwargs else kwargs["temperature"],
+        stream=stream,
+    )
+
+    if not stream:
+        return response.content[0].text
+
+    async def _stream():
+        try:
+            async for e in response:
+                if e.type == "content_block_delta":
+                    yield e.delta.text
+        finally:
+            await response.close()
+
+    return _stream()
+
+
+async def acall_ollama(
+    system: str, messages: List[Dict[str, str]], config: Config, **kwargs
+) -> Union[str, AsyncGenerator[str, None]]:
+    ollama = get_async_client("ollama", config)
+    stream = False if "stream" not in kwargs else kwargs["stream"]
+    response = await ollama.chat(
+        model=kwargs.get("model", None) or os.getenv("OLLAMA_MODEL", None),
+        messages=[{"role": "system", "content": system}, *messages],
+        options=get_ollama_options(config, **kwargs),
+        keep_alive=config.ollama_keep_alive,
+        stream=stream,
+    )
+
+    if not stream:
+        return response.message.content
+
+    try:
+        first_chunk = await response.__anext__()
+    except StopAsyncIteration:
+        first_chunk = None
+
+    async def _stream():
+        try:
+            if first_chunk and first_chunk.message.content:
+                yield first_chunk.message.content
+
+            async for e in response:
+                if e.message.content:
+                    yield e.message.content
+        finally:
+            await response.aclose()
+
+    return _stream()
+
+
+async def acall_provider(
+    provider: str,
+    system: str,
+    messages: List[Dict[str, str]],
+    config: Config,
+    **kwargs,
+) -> Union[str, AsyncGenerator[str, None]]:
+    if provider == "openai":
+        return await acall_openai(system, messages, config, **kwargs)
+    elif provider == "anthropic":
+        return await acall_anthropic(system, messages, config, **kwargs)
+    elif provider == "ollama":
+        return await acall_ollama(system, messages, config, **kwargs)
+
+
+def count_input_tokens(system: str, messages: List[Dict[str, str]]) -> int:
+    return count_tokens(system) + sum(count_tokens(m["content"]) for m in messages)
+
+
+def start_llm_span(
+    provider: str, system: str, messages: List[Dict[str, str]], cached: bool, **kwargs
+) -> Span:
+    curr_span = start_span(
+        "llm",
+        "llm",
+        provider=provider,
+        model=kwargs.get("model", None),
+        stage=kwargs.get("stage", None),
+        stream=kwargs.get("stream", False),
+        cached=cached,
+    )
+    num_tokens = count_input_tokens(system, messages)
+    if cached:
+        curr_span.set(input_tokens=num_tokens)
+    else:
+        curr_span.add(input_tokens=num_tokens, llm_calls=1)
+
+    return curr_span
+
+
+def send_request(
+    provider: str,
+    system: str,
+    messages: List[Dict[str, str]],
+    config: Config,
+    curr_span: Span,
+    **kwargs,
+) -> Union[str, Generator[str, None, None]]:
+    return send_with_retries(
+        lambda: call_provider(provider, system, messages, config, **kwargs),
+        provider,
+        curr_span.args.get("input_tokens", 0),
+        config,
+        curr_span,
+    )
+
+
+async def asend_request(
+    provider: str,
+    system: str,
+    messages: List[Dict[str, str]],
+    config: Config,
+    curr_span: Span,
+    **kwargs,
+) -> Union[str, AsyncGenerator[str, None]]:
+    return await asend_with_retries(
+        lambda: acall_provider(provider, system, messages, config, **kwargs),
+        provider,
+        curr_span.args.get("input_tokens", 0),
+        config,
+        curr_span,
+    )
+
+
+def charge_output(provider: str, config: Config, output: str):
+    # Output tokens count against the budget too, but only once they're known
+    get_rate_limiter(provider, config).charge(count_tokens(output))
+
+
+def stream_provider(
+    provider: str,
+    system: str,
+    messages: List[Dict[str, str]],
+    config: Config,
+    curr_span: Span,
+    **kwargs,
+) -> Generator[str, None, None]:
+    # The request only goes out once a slot is free, and the slot is held until
+    # the stream is finished (or closed)
+    with acquire_slot("llm", config.max_llm_calls) as queued:
+        curr_span.set(queued=round(queued, 3))
+        response = send_request(
+            provider, system, messages, config, curr_span, **kwargs
+        )
+        chunks = []
+        try:
+            for chunk in response:
+                chunks.append(chunk)
+                yield chunk
+        finally:
+            if hasattr(response, "close"):
+                response.close()
+
+            charge_output(provider, config, "".join(chunks))
+
+
+async def astream_provider(
+    provider: str,
+    system: str,
+    messages: List[Dict[str, str]],
+    config: Config,
+    curr_span: Span,
+    **kwargs,
+) -> AsyncGenerator[str, None]:
+    async with aacquire_slot("llm", config.max_llm_calls) as queued:
+        curr_span.set(queued=round(queued, 3))
+        response = await asend_request(
+            provider, system, messages, config, curr_span, **kwargs
+        )
+        chunks = []
+        try:
+            async for chunk in response:
+                chunks.append(chunk)
+                yield chunk
+        finally:
+            if hasattr(response, "aclose"):
+                await response.aclose()
+
+            charge_output(provider, config, "".join(chunks))
+
+
+def fetch_response(
+    provider: str,
+    system: str,
+    messages: List[Dict[str, str]],
+    config: Config,
+    **kwargs,
+) -> Union[str, Generator[str, None, None]]:
+    curr_span = start_llm_span(provider, system, messages, False, **kwargs)
+    if kwargs.get("stream", False):
+        output = stream_provider(
+            provider, system, messages, config, curr_span, **kwargs
+        )
+        return trace_stream(output, curr_span)
+
+    with acquire_slot("llm", config.max_llm_calls) as queued:
+        curr_span.set(queued=round(queued, 3))
+        response = send_request(
+            provider, system, messages, config, curr_span, **kwargs
+        )
+
+    charge_output(provider, config, response)
+    record_output(curr_span, response)
+    return response
+
+
+async def afetch_response(
+    provider: str,
+    system: str,
+    messages: List[Dict[str, str]],
+    config: Config,
+    **kwargs,
+) -> Union[str, AsyncGenerator[str, None]]:
+    curr_span = start_llm_span(provider, system, messages, False, **kwargs)
+    if kwargs.get("stream", False):
+        output = astream_provider(
+            provider, system, messages, config, curr_span, **kwargs
+        )
+        return atrace_stream(output, curr_span)
+
+    async with aacquire_slot("llm", config.max_llm_calls) as queued:
+        curr_span.set(queued=round(queued, 3))
+        response = await asend_request(
+            provider, system, messages, config, curr_span, **kwargs
+        )
+
+    charge_output(provider, config, response)
+    record_output(curr_span, response)
+    return response
 
 
 ######
@@ -91,12 +596,75 @@ def call_ollama(system: str, messages: List[Dict[str, str]]) -> str:
 
 
 def call_llm(
-    system: str, messages: List[Dict[str, str]], **kwargs
+    system: str,
+    messages: List[Dict[str, str]],
+    config: Optional[Config] = None,
+    **kwargs,
 ) -> Union[str, Generator[str, None, None]]:
-    provider = get_llm_provider()
-    if provider == "openai":
-        return call_openai(system, messages, **kwargs)
-    elif provider == "anthropic":
-        return call_anthropic(system, messages, **kwargs)
-    elif provider == "ollama":
-        return call_ollama(system, messages)
+    config = config or Config()
+    provider, model = get_route(kwargs.get("stage", None), config)
+    kwargs.setdefault("model", model)
+    if not config.use_cache or is_cache_disabled():
+        return fetch_response(provider, system, messages, config, **kwargs)
+
+    stream = False if "stream" not in kwargs else kwargs["stream"]
+    max_bytes = config.cache_size_mb * 1024 * 1024
+    key = get_cache_key(provider, system, messages, **kwargs)
+
+    response = get_cached_response(key)
+    if response is not None:
+        curr_span = start_llm_span(provider, system, messages, True, **kwargs)
+        if stream:
+            return trace_stream(replay_response(response), curr_span)
+
+        record_output(curr_span, response)
+        return response
+
+    response = fetch_response(provider, system, messages, config, **kwargs)
+    if stream:
+        return record_response(response, key, max_bytes)
+
+    cache_response(key, response, max_bytes)
+    return response
+
+
+async def acall_llm(
+    system: str,
+    messages: List[Dict[str, str]],
+    config: Optional[Config] = None,
+    **kwargs,
+) -> Union[str, AsyncGenerator[str, None]]:
+    config = config or Config()
+    provider, model = get_route(kwargs.get("stage", None), config)
+    kwargs.setdefault("model", model)
+    if not config.use_cache or is_cache_disabled():
+        return await afetch_response(provider, system, messages, config, **kwargs)
+
+    stream = False if "stream" not in kwargs else kwargs["stream"]
+    max_bytes = config.cache_size_mb * 1024 * 1024
+    key = get_cache_key(provider, system, messages, **kwargs)
+
+    response = get_cached_response(key)
+    if response is not None:
+        curr_span = start_llm_span(provider, system, messages, True, **kwargs)
+        if stream:
+            return atrace_stream(areplay_response(response), curr_span)
+
+        record_output(curr_span, response)
+        return response
+
+    response = await afetch_response(provider, system, messages, config, **kwargs)
+    if stream:
+        return arecord_response(response, key, max_bytes)
+
+    cache_response(key, response, max_bytes)
+    return response
+
+
+async def aclose_clients():
+    """Closes the async clients created in the running event loop."""
+
+    clients = _async_clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        if hasattr(client, "close"):
+            await client.close()
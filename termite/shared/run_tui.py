@@ -4,17 +4,52 @@ import re
 import ast
 import time
 import tempfile
-from typing import Tuple
-from subprocess import TimeoutExpired, DEVNULL, PIPE, run as run_cmd
+import selectors
+from typing import List, Optional, Tuple
+from subprocess import Popen, PIPE, run as run_cmd
 
 
 # Local
 try:
-    from termite.dtos import Script
-    from termite.shared.utils import fix_any_import_errors, get_python_executable
+    from termite.dtos import Script, Config
+    from termite.shared.utils import (
+        check_imports,
+        fix_any_import_errors,
+        fix_missing_imports,
+        get_python_executable,
+        get_worker_pool,
+        install_modules,
+        preflight,
+    )
+    from termite.shared.utils.vterm import Screen
+    from termite.shared.utils.keystrokes import encode_key
+    from termite.shared.utils.limits import (
+        get_runner_env,
+        has_exited,
+        kill_process_tree,
+    )
+    from termite.shared.utils.run_pty import SCREEN_SIZE
+    from termite.shared.utils.bytecode import get_runnable_path
+    from termite.shared.utils.slots import acquire_slot
+    from termite.shared.utils.tracing import span, traced
 except ImportError as e:
-    from dtos import Script
-    from shared.utils import fix_any_import_errors, get_python_executable
+    from dtos import Script, Config
+    from shared.utils import (
+        check_imports,
+        fix_any_import_errors,
+        fix_missing_imports,
+        get_python_executable,
+        get_worker_pool,
+        install_modules,
+        preflight,
+    )
+    from shared.utils.vterm import Screen
+    from shared.utils.keystrokes import encode_key
+    from shared.utils.limits import get_runner_env, has_exited, kill_process_tree
+    from shared.utils.run_pty import SCREEN_SIZE
+    from shared.utils.bytecode import get_runnable_path
+    from shared.utils.slots import acquire_slot
+    from shared.utils.tracing import span, traced
 
 
 #########
@@ -22,6 +57,13 @@ except ImportError as e:
 #########
 
 
+POLL_INTERVAL = 0.05
+TRACEBACK_GRACE = 0.25  # Quiet period after a traceback before we call it a crash
+TRACEBACK_PATTERN = re.compile(
+    r"^Traceback \(most recent call last\):\n(?:(?:[ \t].*)?\n)*\S.*\n", re.MULTILINE
+)
+
+
 def save_script_to_file(script: Script) -> str:
     with tempfile.NamedTemporaryFile(mode="w", suffix=".py", delete=False) as temp_file:
         temp_file.write(script.code)
@@ -61,40 +103,189 @@ def strip_ansi_escape_sequences(data: str) -> str:
     return ansi_escape.sub("", data)
 
 
-def run_in_pseudo_terminal(script: Script, timeout: int = 5) -> Tuple[str, str]:
+def has_complete_traceback(stderr: str) -> bool:
+    return bool(TRACEBACK_PATTERN.search(stderr.replace("\r", "")))
+
+
+def send_key(proc: Popen, key: str, screen: Screen) -> bool:
+    try:
+        proc.stdin.write(encode_key(key, screen.app_cursor_keys))
+        proc.stdin.flush()
+    except (BrokenPipeError, ValueError):
+        return False
+
+    return True
+
+
+def watch_process(
+    proc: Popen,
+    timeout: float,
+    settle_time: float,
+    keys: Optional[List[str]] = None,
+    key_delay: float = 0.3,
+) -> Tuple[str, str, str, bool, int]:
+    """
+    Watches the runner's output streams (a TUI can draw on either) until the TUI
+    either crashes or renders and then its screen stays the same for
+    `settle_time` seconds. Then each of `keys` is typed in turn, waiting for the
+    screen to settle in between.
+    Returns (stdout, stderr, snapshot, exited, # of keys sent).
+    """
+
+    chunks = {proc.stdout.fileno(): [], proc.stderr.fileno(): []}
+    selector = selectors.DefaultSelector()
+    for fd in chunks:
+        os.set_blocking(fd, False)
+        selector.register(fd, selectors.EVENT_READ)
+
+    keys = keys or []
+    screen = Screen(*SCREEN_SIZE)
+    start = last_output = last_change = time.monotonic()
+    rendered, stderr, num_sent = False, "", 0
+    step_settle, step_timeout = settle_time, timeout
+    try:
+        while selector.get_map():
+            for key, _ in selector.select(timeout=POLL_INTERVAL):
+                try:
+                    data = os.read(key.fd, 4096)
+                except BlockingIOError:
+                    continue
+
+                if not data:
+                    selector.unregister(key.fd)
+                    continue
+
+                chunks[key.fd].append(data)
+                last_output = time.monotonic()
+                if key.fd == proc.stderr.fileno():
+                    stderr = b"".join(chunks[key.fd]).decode(errors="replace")
+
+                # Both streams are the TUI's terminal (e.g. textual draws on stderr)
+                version = screen.version
+                screen.feed(data)
+                if not rendered or screen.version != version:
+                    last_change = last_output
+
+                rendered = True
+
+            now = time.monotonic()
+            quiet_for = now - last_output
+            stable_for = now - last_change  # Redraws of the same frame don't count
+
+            if has_complete_traceback(stderr) and quiet_for >= TRACEBACK_GRACE:
+                break  # Crashed
+            if has_exited(proc) and quiet_for >= TRACEBACK_GRACE:
+                break  # Exited, but something is still holding the pipes open
+            settled = rendered and stable_for >= step_settle
+            if not (settled or now - start >= step_timeout):
+                continue
+            # Warnings on stderr don't stop the replay, only a crash does
+            crashed = has_complete_traceback(stderr)
+            if not rendered or crashed or num_sent == len(keys):
+                break  # Healthy (or timed out)
+
+            # Type the next key, then give the TUI a moment to react
+            if not send_key(proc, keys[num_sent], screen):
+                break
+            num_sent += 1
+            start = last_change = now
+            step_timeout = settle_time
+            # Give the last key as long as the first render, e.g. for textual's
+            # error screen and shutdown after a crash
+            step_settle = key_delay if num_sent < len(keys) else settle_time
+        # Both streams hit EOF, so the runner is on its way out
+        deadline = time.monotonic() + TRACEBACK_GRACE
+        while not selector.get_map() and not has_exited(proc):
+            if time.monotonic() >= deadline:
+                break
+            time.sleep(POLL_INTERVAL / 5)
+    finally:
+        selector.close()
+
+    stdout = b"".join(chunks[proc.stdout.fileno()]).decode(errors="replace")
+    return stdout, stderr, screen.get_text(), has_exited(proc), num_sent
+
+
+def terminate_process(proc: Popen) -> Optional[Tuple[float, float]]:
+    usage = kill_process_tree(proc)
+    for stream in (proc.stdin, proc.stdout, proc.stderr):
+        if stream:
+            stream.close()
+
+    return usage
+
+
+def start_runner(tui_file: str, config: Config) -> Popen:
+    if config.pool_size > 0:
+        pool = get_worker_pool(config.library, config.pool_size, config)
+        return pool.run(tui_file)
+
     python_exe = get_python_executable()
-    tui_file = save_script_to_file(script)
     runner_file = os.path.join(os.path.dirname(__file__), "utils", "run_pty.py")
+    return Popen(
+        [python_exe, runner_file, tui_file],
+        stdin=PIPE,  # Keystrokes to replay
+        stdout=PIPE,
+        stderr=PIPE,
+        env=get_runner_env(config),
+        start_new_session=True,  # So the whole process tree can be killed
+    )
 
-    stdout, stderr = "", ""
-    try:
-        result = run_cmd(
-            [
-                python_exe,
-                runner_file,
-                tui_file,
-            ],
-            stdout=DEVNULL,
-            stderr=PIPE,
-            text=True,
-            timeout=timeout,
+
+def run_in_pseudo_terminal(script: Script, config: Config) -> Tuple[str, str, str]:
+    tui_file = save_script_to_file(script)
+    keys = config.keystrokes or []
+    with acquire_slot("pty", config.max_validations) as queued:
+        with span("pty", "pty", queued=round(queued, 3)) as curr_span:
+            proc = start_runner(tui_file, config)
+            try:
+                stdout, stderr, snapshot, exited, num_sent = watch_process(
+                    proc,
+                    config.validate_timeout,
+                    config.settle_time,
+                    keys,
+                    config.key_delay,
+                )
+            finally:
+                usage = terminate_process(proc)
+                os.remove(tui_file)
+
+            curr_span.set(exited=exited, keys_sent=num_sent)
+            if usage:
+                script.max_rss_mb, script.cpu_time = usage
+                rss_mb, cpu_time = usage
+                curr_span.set(max_rss_mb=round(rss_mb, 1), cpu_time=round(cpu_time, 3))
+
+    if exited:
+        if not stderr.strip() and proc.returncode:
+            stderr = f"Process exited with code {proc.returncode}"
+    elif not has_complete_traceback(stderr):
+        stderr = ""  # Still running and no crash, so the TUI is healthy
+
+    if stderr and num_sent:
+        pressed = ", ".join(repr(key) for key in keys[:num_sent])
+        stderr = (
+            f"Crashed after pressing {keys[num_sent - 1]!r} "
+            f"(keystroke {num_sent} of {len(keys)}; pressed so far: {pressed})\n\n"
+            f"{stderr}"
         )
-        time.sleep(3)
-        stdout = result.stdout if result.stdout else ""
-        stderr = result.stderr if result.stderr else ""
-    except TimeoutExpired:
-        stdout, stderr = "", ""
-    finally:
-        os.remove(tui_file)
 
-    stderr = strip_ansi_escape_sequences(stderr)
-    return stdout.strip(), stderr.strip()
+    stdout = strip_ansi_escape_sequences(stdout).replace("\r\n", "\n")
+    stderr = strip_ansi_escape_sequences(stderr).replace("\r\n", "\n")
+    return stdout.strip(), stderr.strip(), snapshot
 
 
 def run_in_subprocess(script: Script):
     python_exe = get_python_executable()
+    if script.path:
+        run_cmd([python_exe, get_runnable_path(script.path)])
+        return
+
     script_file = save_script_to_file(script)
-    run_cmd([python_exe, script_file])
+    try:
+        run_cmd([python_exe, script_file])
+    finally:
+        os.remove(script_file)
 
 
 ######
@@ -102,22 +293,44 @@ def run_in_subprocess(script: Script):
 ######
 
 
-def run_tui(script: Script, pseudo=True):
+@traced("run_tui", "validate")
+def run_tui(script: Script, pseudo=True, config: Optional[Config] = None):
+    config = config or Config()
     if not pseudo:
         run_in_subprocess(script)
         return
 
-    stdout, stderr = "", ""
+    stdout, stderr, snapshot = "", "", None
     try:
         # Check for valid syntax before executing
         ast.parse(script.code)
 
+        # Install all of the script's missing imports in one go. The venv is
+        # only asked once, and the answer is reused by the first preflight
+        missing = None
+        try:
+            if config.preflight:
+                missing = check_imports(script.code, config.library)
+                install_modules(missing, config)
+                missing = []
+            else:
+                fix_missing_imports(script.code, config)
+        except ImportError:
+            pass  # Fall back to installing them one at a time below
+
         # Execute the script, iteratively fixing any import errors
         retry = True
         while retry:
-            stdout, stderr = run_in_pseudo_terminal(script)
+            # Skip the PTY run if the errors can be found statically
+            stderr = ""
+            if config.preflight:
+                stderr = preflight(script.code, config.library, missing)
+                missing = None  # Imports may have been installed since
+            if not stderr:
+                stdout, stderr, snapshot = run_in_pseudo_terminal(script, config)
+
             try:
-                retry = fix_any_import_errors(stderr)
+                retry = fix_any_import_errors(stderr, config)
             except ImportError as e:
                 retry = False
                 stderr = str(e)
@@ -126,6 +339,4 @@ def run_tui(script: Script, pseudo=True):
 
     script.stdout = stdout
     script.stderr = stderr
-
-
-# TODO: The PTY process is not being killed
+    script.snapshot = snapshot
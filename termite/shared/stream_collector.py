@@ -0,0 +1,135 @@
+# Standard library
+import time
+from typing import AsyncIterable, Callable, Iterable, List, Optional
+
+# Third party
+from rich.progress import Progress, TaskID
+
+
+#########
+# HELPERS
+#########
+
+
+UPDATE_INTERVAL = 0.1  # Min. seconds between progress bar updates
+
+
+def track_progress(
+    p_bar: Progress, task: TaskID, scale: float = 1.0
+) -> Callable[..., None]:
+    """
+    Returns an `incr_p_bar(n=1, **fields)` callback that advances a task.
+    """
+
+    def _incr_p_bar(n: int = 1, **fields):
+        p_bar.update(task, advance=n * scale, **fields)
+
+    return _incr_p_bar
+
+
+######
+# MAIN
+######
+
+
+class StreamCollector:
+    """
+    Accumulates a streamed LLM response in linear time. Progress bar updates are
+    batched so the bar is repainted at most every `update_interval` seconds.
+    """
+
+    def __init__(
+        self,
+        incr_p_bar: Optional[Callable[..., None]] = None,
+        update_interval: float = UPDATE_INTERVAL,
+    ):
+        self.incr_p_bar = incr_p_bar
+        self.update_interval = update_interval
+        self.chunks: List[str] = []
+        self.line: List[str] = []  # Chunks of the line that's still streaming
+        self.num_tokens = 0
+        self.pending = 0  # Tokens not reported to the progress bar yet
+        self.start = self.last_update = time.monotonic()
+        self.first_token_at = None
+        self.end = None
+
+    @property
+    def text(self) -> str:
+        if len(self.chunks) > 1:
+            self.chunks = ["".join(self.chunks)]
+
+        return self.chunks[0] if self.chunks else ""
+
+    @property
+    def ttft(self) -> Optional[float]:
+        if self.first_token_at is None:
+            return None
+
+        return self.first_token_at - self.start
+
+    @property
+    def tokens_per_sec(self) -> Optional[float]:
+        if self.first_token_at is None:
+            return None
+
+        elapsed = (self.end or time.monotonic()) - self.first_token_at
+        return self.num_tokens / elapsed if elapsed > 0 else None
+
+    def get_stats(self) -> str:
+        if self.ttft is None:
+            return ""
+
+        stats = f"{self.ttft:.1f}s to first token"
+        if tokens_per_sec := self.tokens_per_sec:
+            stats += f" • {tokens_per_sec:.0f} tok/s"
+
+        return stats
+
+    def flush(self):
+        if self.incr_p_bar and self.pending:
+            self.incr_p_bar(self.pending, stats=self.get_stats())
+
+        self.pending = 0
+        self.last_update = time.monotonic()
+
+    def add(self, token: str) -> List[str]:
+        """
+        Adds a streamed token and returns any lines it completed.
+        """
+
+        now = time.monotonic()
+        if self.first_token_at is None:
+            self.first_token_at = now
+
+        self.chunks.append(token)
+        self.num_tokens += 1
+        self.pending += 1
+        if now - self.last_update >= self.update_interval:
+            self.flush()
+
+        if "\n" not in token:
+            self.line.append(token)
+            return []
+
+        lines = token.split("\n")
+        lines[0] = "".join(self.line) + lines[0]
+        rest = lines.pop()  # Start of the next line (empty if the token ends one)
+        self.line = [rest] if rest else []
+        return [line + "\n" for line in lines]
+
+    def finish(self) -> str:
+        self.end = time.monotonic()
+        self.flush()
+        return self.text
+
+    def collect(self, stream: Iterable[str]) -> str:
+        for token in stream:
+            self.add(token)
+
+        return self.finish()
+
+    async def acollect(self, stream: AsyncIterable[str]) -> str:
+        async for token in stream:
+            self.add(token)
+
+        return self.finish()
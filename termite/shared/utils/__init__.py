@@ -1,6 +1,50 @@
 try:
-    from termite.shared.utils.fix_imports import fix_any_import_errors
+    from termite.shared.utils.fix_imports import (
+        fix_any_import_errors,
+        fix_missing_imports,
+        fix_missing_modules,
+        install_modules,
+        scan_imports,
+    )
     from termite.shared.utils.python_exe import get_python_executable
+    from termite.shared.utils.count_tokens import count_tokens
+    from termite.shared.utils.keystrokes import get_design_keys, parse_keys
+    from termite.shared.utils.worker_pool import get_worker_pool
+    from termite.shared.utils.preflight import check_imports, preflight
+    from termite.shared.utils.wheelhouse import seed_venv
+    from termite.shared.utils.slots import acquire_slot, aacquire_slot
+    from termite.shared.utils.rate_limiter import get_llm_metrics
+    from termite.shared.utils.tracing import (
+        span,
+        start_span,
+        traced,
+        trace_stream,
+        atrace_stream,
+        start_tracing,
+        save_trace,
+    )
 except ImportError:
-    from shared.utils.fix_imports import fix_any_import_errors
+    from shared.utils.fix_imports import (
+        fix_any_import_errors,
+        fix_missing_imports,
+        fix_missing_modules,
+        install_modules,
+        scan_imports,
+    )
     from shared.utils.python_exe import get_python_executable
+    from shared.utils.count_tokens import count_tokens
+    from shared.utils.keystrokes import get_design_keys, parse_keys
+    from shared.utils.worker_pool import get_worker_pool
+    from shared.utils.preflight import check_imports, preflight
+    from shared.utils.wheelhouse import seed_venv
+    from shared.utils.slots import acquire_slot, aacquire_slot
+    from shared.utils.rate_limiter import get_llm_metrics
+    from shared.utils.tracing import (
+        span,
+        start_span,
+        traced,
+        trace_stream,
+        atrace_stream,
+        start_tracing,
+        save_trace,
+    )
@@ -0,0 +1,79 @@
+# Standard library
+import os
+import sys
+import py_compile
+import importlib.util
+from typing import Optional
+
+# Local
+try:
+    from termite.shared.utils.python_exe import get_termite_home
+except ImportError:
+    from shared.utils.python_exe import get_termite_home
+
+
+#########
+# HELPERS
+#########
+
+
+def get_venv_version() -> Optional[str]:
+    try:
+        config = (get_termite_home() / "pyvenv.cfg").read_text()
+    except OSError:
+        return None
+
+    for line in config.split("\n"):
+        key, _, value = line.partition("=")
+        if key.strip() == "version":
+            return value.strip()
+
+    return None
+
+
+def is_venv_compatible() -> bool:
+    # Bytecode only runs on the Python version that compiled it
+    version = get_venv_version()
+    if not version:
+        return False
+
+    return version.split(".")[:2] == [str(v) for v in sys.version_info[:2]]
+
+
+######
+# MAIN
+######
+
+
+def compile_script(path: str) -> Optional[str]:
+    """
+    Compiles a script to a .pyc in the __pycache__ next to it. Returns the .pyc's
+    path, or None if the script doesn't compile.
+    """
+
+    try:
+        return py_compile.compile(path, doraise=True)
+    except (py_compile.PyCompileError, OSError):
+        return None
+
+
+def get_runnable_path(path: str) -> str:
+    """
+    Returns the script's cached bytecode, (re)compiling it if the script has
+    changed since, so it can be run without being compiled again. Falls back to
+    the script itself if the venv's Python can't run the bytecode.
+    """
+
+    if not is_venv_compatible():
+        return path
+
+    bytecode_path = importlib.util.cache_from_source(path)
+    try:
+        is_fresh = os.path.getmtime(bytecode_path) >= os.path.getmtime(path)
+    except OSError:
+        is_fresh = False
+
+    if not is_fresh:
+        bytecode_path = compile_script(path)
+
+    return bytecode_path or path
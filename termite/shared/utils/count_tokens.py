@@ -0,0 +1,39 @@
+# Standard library
+from functools import lru_cache
+
+
+#########
+# HELPERS
+#########
+
+
+CHARS_PER_TOKEN = 4  # Rough average for English prose and Python code
+
+
+@lru_cache(maxsize=1)
+def get_encoding():
+    # tiktoken is an optional extra (pip install termite-ai[tokens])
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:  # Not installed, or the encoding couldn't be downloaded
+        return None
+
+
+######
+# MAIN
+######
+
+
+def count_tokens(text: str) -> int:
+    """
+    Counts a text's tokens with tiktoken, if it's installed. Otherwise (or if
+    its encoding can't be downloaded, e.g. on an air-gapped host) the count is
+    estimated from the text's length.
+    """
+
+    if encoding := get_encoding():
+        return len(encoding.encode(text, disallowed_special=()))
+
+    return len(text) // CHARS_PER_TOKEN
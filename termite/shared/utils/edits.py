@@ -0,0 +1,102 @@
+# Standard library
+import re
+from typing import List, Optional, Tuple
+
+
+#########
+# HELPERS
+#########
+
+
+EDIT_PATTERN = re.compile(
+    r"^<{5,} ?SEARCH[^\n]*\n(.*?)^={5,}[^\n]*\n(.*?)^>{5,} ?REPLACE[^\n]*$",
+    re.MULTILINE | re.DOTALL,
+)
+
+
+def find_unique(haystack: List[str], needle: List[str]) -> Optional[int]:
+    matches = [
+        i
+        for i in range(len(haystack) - len(needle) + 1)
+        if haystack[i : i + len(needle)] == needle
+    ]
+    if len(matches) > 1:
+        raise ValueError(f"SEARCH block matches {len(matches)} places:\n" + "\n".join(needle))
+
+    return matches[0] if matches else None
+
+
+def get_indent(line: str) -> str:
+    return line[: len(line) - len(line.lstrip())]
+
+
+def reindent(lines: List[str], old_indent: str, new_indent: str) -> List[str]:
+    reindented = []
+    for line in lines:
+        if line.strip() and line.startswith(old_indent):
+            line = new_indent + line[len(old_indent) :]
+        elif line.strip():
+            line = new_indent + line.lstrip()
+        reindented.append(line)
+
+    return reindented
+
+
+def apply_edit(code: str, search: str, replace: str) -> str:
+    if not search.strip():
+        raise ValueError("Empty SEARCH block")
+
+    # 1. Exact match
+    if code.count(search) == 1:
+        return code.replace(search, replace)
+
+    lines = code.split("\n")
+    search_lines = search.rstrip("\n").split("\n")
+    replace_lines = replace.rstrip("\n").split("\n") if replace.strip() else []
+
+    # 2. Ignore trailing whitespace
+    stripped = [line.rstrip() for line in lines]
+    index = find_unique(stripped, [line.rstrip() for line in search_lines])
+    if index is not None:
+        lines[index : index + len(search_lines)] = replace_lines
+        return "\n".join(lines)
+
+    # 3. Ignore indentation, then shift the replacement to the script's indentation
+    dedented = [line.strip() for line in lines]
+    index = find_unique(dedented, [line.strip() for line in search_lines])
+    if index is not None:
+        first = next(i for i, line in enumerate(search_lines) if line.strip())
+        old_indent = get_indent(search_lines[first])
+        new_indent = get_indent(lines[index + first])
+        lines[index : index + len(search_lines)] = reindent(
+            replace_lines, old_indent, new_indent
+        )
+        return "\n".join(lines)
+
+    raise ValueError("SEARCH block not found in the script:\n" + search)
+
+
+######
+# MAIN
+######
+
+
+def parse_edits(output: str) -> List[Tuple[str, str]]:
+    edits = []
+    for match in EDIT_PATTERN.finditer(output):
+        search, replace = match.group(1), match.group(2)
+        edits.append((search, replace))
+
+    return edits
+
+
+def apply_edits(code: str, edits: List[Tuple[str, str]]) -> str:
+    """
+    Applies SEARCH/REPLACE edits in order. Raises a ValueError if any edit can't
+    be matched to exactly one place in the script.
+    """
+
+    for search, replace in edits:
+        code = apply_edit(code, search, replace)
+
+    return code
@@ -1,15 +1,23 @@
 # Standard library
 import re
-from subprocess import CalledProcessError, run as run_cmd
+import ast
+from typing import Dict, List, Optional
+from subprocess import CalledProcessError
 
 
 # Local
 try:
+    from termite.dtos import Config
     from termite.shared.call_llm import call_llm
-    from termite.shared.utils.python_exe import get_python_executable
+    from termite.shared.utils.preflight import introspect
+    from termite.shared.utils.wheelhouse import install_packages
+    from termite.shared.utils.tracing import traced
 except ImportError:
+    from dtos import Config
     from shared.call_llm import call_llm
-    from shared.utils.python_exe import get_python_executable
+    from shared.utils.preflight import introspect
+    from shared.utils.wheelhouse import install_packages
+    from shared.utils.tracing import traced
 
 
 #########
@@ -17,43 +25,103 @@ except ImportError:
 #########
 
 
-PROMPT = """You are an expert Python programmer. 
-Your job is to respond with the name of the package on PyPI that corresponds to the given import statement.
+PROMPT = """You are an expert Python programmer.
+Your job is to respond with the name of the package on PyPI that corresponds to each of the given import statements.
 
 You MUST follow these rules at all times:
-- Respond with only the name of the package on PyPI and nothing else.
+- Respond with only the names of the packages on PyPI and nothing else.
+- Put each package name on its own line, in the same order as the import statements.
 - If you are unsure, respond with the original import name.
-- Your output should be a single word (the package name).
+- Each line should be a single word (the package name).
 
 ## Examples
 
 Input: \"import numpy\"
 Output: \"numpy\"
 
-Input: \"import sklearn\"
-Output: \"scikit-learn\"
-
-Input: \"import yaml\"
-Output: \"PyYAML\""""
-
-
-def get_package_name(module: str) -> str:
-    return call_llm(
+Input: \"import sklearn\nimport yaml\"
+Output: \"scikit-learn\nPyYAML\""""
+
+MULTILINE_IMPORT_PATTERN = re.compile(r"^\s*from\s+([\w.]+)\s+import\s*\(")
+
+# Common cases where the import name doesn't match the PyPI package name
+PACKAGE_NAMES = {
+    "attr": "attrs",
+    "bs4": "beautifulsoup4",
+    "cv2": "opencv-python",
+    "Crypto": "pycryptodome",
+    "dateutil": "python-dateutil",
+    "docx": "python-docx",
+    "dotenv": "python-dotenv",
+    "fitz": "PyMuPDF",
+    "git": "GitPython",
+    "jwt": "PyJWT",
+    "magic": "python-magic",
+    "MySQLdb": "mysqlclient",
+    "OpenSSL": "pyOpenSSL",
+    "PIL": "Pillow",
+    "psycopg2": "psycopg2-binary",
+    "serial": "pyserial",
+    "skimage": "scikit-image",
+    "sklearn": "scikit-learn",
+    "usb": "pyusb",
+    "websocket": "websocket-client",
+    "yaml": "PyYAML",
+    "zmq": "pyzmq",
+}
+
+
+def get_package_names(modules: List[str], config: Config) -> Dict[str, str]:
+    packages = {m: PACKAGE_NAMES[m] for m in modules if m in PACKAGE_NAMES}
+    unknown = [module for module in modules if module not in packages]
+    if not unknown:
+        return packages
+
+    output = call_llm(
         PROMPT,
-        [{"role": "user", "content": f"import {module}"}],
-        model="gpt-4o-mini",  # TODO: oai_model="gpt-4o-mini", anthropic_model="..."
+        [{"role": "user", "content": "\n".join(f"import {m}" for m in unknown)}],
+        config=config,
+        stage="import-resolve",  # A small model is enough for this
         temperature=0.1,
     )
+    names = [line.strip().strip("\"'") for line in output.strip().split("\n")]
+    names = [name for name in names if name]
+    if len(names) != len(unknown):
+        names = unknown  # Couldn't line the answers up, so guess the import names
 
+    packages.update(zip(unknown, names))
+    return packages
 
-def install_package(package: str) -> bool:
-    python_executable = get_python_executable()
-    result = run_cmd(
-        [python_executable, "-m", "pip", "install", package],
-        capture_output=True,
-        check=True,
-    )
-    return result.returncode == 0
+
+def collect_imports(code: str) -> List[str]:
+    modules = []
+    for node in ast.walk(ast.parse(code)):
+        if isinstance(node, ast.Import):
+            modules += [alias.name.split(".")[0] for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            modules.append(node.module.split(".")[0])
+
+    return sorted(set(modules))
+
+
+def scan_imports(partial_code: str) -> List[str]:
+    """
+    Like collect_imports, but for code that's still streaming in (and so won't
+    parse as a whole). Only complete import lines are considered.
+    """
+
+    modules = []
+    for line in partial_code.split("\n"):
+        if match := MULTILINE_IMPORT_PATTERN.match(line):
+            modules.append(match.group(1).split(".")[0])
+            continue
+
+        try:
+            modules += collect_imports(line.strip())
+        except SyntaxError:
+            continue
+
+    return sorted(set(modules))
 
 
 ######
@@ -61,7 +129,40 @@ def install_package(package: str) -> bool:
 ######
 
 
-def fix_any_import_errors(stderr: str) -> bool:
+@traced("fix_missing_modules", "imports")
+def fix_missing_modules(modules: List[str], config: Optional[Config] = None) -> bool:
+    """
+    Installs every one of the given modules that isn't in the venv yet, using
+    one LLM call (at most) and one pip call.
+    """
+
+    return install_modules(introspect(modules, []), config)
+
+
+def install_modules(missing: List[str], config: Optional[Config] = None) -> bool:
+    """
+    Installs modules that are already known to be missing from the venv.
+    """
+
+    config = config or Config()
+    if not missing:
+        return False
+
+    packages = get_package_names(missing, config)
+    try:
+        return install_packages([packages[module] for module in missing])
+    except CalledProcessError:
+        packages = ", ".join(packages[module] for module in missing)
+        raise ImportError(f"Failed to install packages: {packages}.")
+
+
+def fix_missing_imports(code: str, config: Optional[Config] = None) -> bool:
+    return fix_missing_modules(collect_imports(code), config)
+
+
+@traced("fix_any_import_errors", "imports")
+def fix_any_import_errors(stderr: str, config: Optional[Config] = None) -> bool:
+    config = config or Config()
     package = ""
     try:
         match = re.search(
@@ -74,7 +175,7 @@ def fix_any_import_errors(stderr: str) -> bool:
         # TODO: Ask user if it's okay to install package to the venv
 
         module = match.group(1)
-        package = get_package_name(module)
-        return install_package(package)
+        package = get_package_names([module], config)[module]
+        return install_packages([package])
     except CalledProcessError:
         raise ImportError(f"Failed to install package: {package}. Use a different one.")
@@ -0,0 +1,113 @@
+import sys
+import json
+import difflib
+import inspect
+import importlib
+import importlib.util
+
+
+#########
+# HELPERS
+#########
+
+
+def find_missing_modules(modules):
+    missing = []
+    for module in modules:
+        try:
+            if importlib.util.find_spec(module) is None:
+                missing.append(module)
+        except (ImportError, ValueError):
+            missing.append(module)
+
+    return missing
+
+
+def get_signature(obj):
+    try:
+        signature = inspect.signature(obj)
+    except (TypeError, ValueError):
+        return None
+
+    names, positional, required = [], [], []
+    has_varargs = has_varkw = False
+    for param in signature.parameters.values():
+        if param.kind == param.VAR_POSITIONAL:
+            has_varargs = True
+        elif param.kind == param.VAR_KEYWORD:
+            has_varkw = True
+        else:
+            if param.kind != param.POSITIONAL_ONLY:
+                names.append(param.name)
+            if param.kind != param.KEYWORD_ONLY:
+                positional.append(param.name)
+            if param.default is param.empty:
+                required.append(param.name)
+
+    return {
+        "names": names,
+        "positional": positional,
+        "required": required,
+        "varargs": has_varargs,
+        "varkw": has_varkw,
+    }
+
+
+def resolve_path(path):
+    """
+    Resolves a dotted path like "textual.app.App" the same way the interpreter
+    would, importing submodules as needed.
+    """
+
+    parts = path.split(".")
+    try:
+        obj = importlib.import_module(parts[0])
+    except Exception:
+        return None  # Missing modules are reported separately
+
+    for i, part in enumerate(parts[1:], start=1):
+        if hasattr(obj, part):
+            obj = getattr(obj, part)
+            continue
+
+        if inspect.ismodule(obj):
+            try:
+                obj = importlib.import_module(".".join(parts[: i + 1]))
+                continue
+            except ImportError:
+                pass
+
+        if inspect.ismodule(obj):
+            kind = "module"
+        elif inspect.isclass(obj):
+            kind = "class"
+        else:
+            kind = type(obj).__name__
+
+        suggestions = difflib.get_close_matches(part, dir(obj), n=1)
+        return {
+            "ok": False,
+            "owner": ".".join(parts[:i]),
+            "kind": kind,
+            "attr": part,
+            "suggestion": suggestions[0] if suggestions else None,
+        }
+
+    return {
+        "ok": True,
+        "signature": get_signature(obj) if callable(obj) else None,
+    }
+
+
+######
+# MAIN
+######
+
+
+if __name__ == "__main__":
+    request = json.load(sys.stdin)
+    response = {
+        "missing_modules": find_missing_modules(request.get("modules", [])),
+        "paths": {path: resolve_path(path) for path in request.get("paths", [])},
+    }
+    json.dump(response, sys.stdout)
@@ -0,0 +1,138 @@
+# Standard library
+import re
+from typing import List
+
+
+#########
+# HELPERS
+#########
+
+
+MAX_KEYSTROKES = 8
+
+# Escape sequences an xterm sends for named keys
+KEY_CODES = {
+    "up": "\x1b[A",
+    "down": "\x1b[B",
+    "right": "\x1b[C",
+    "left": "\x1b[D",
+    "home": "\x1b[H",
+    "end": "\x1b[F",
+    "pageup": "\x1b[5~",
+    "pagedown": "\x1b[6~",
+    "enter": "\r",
+    "tab": "\t",
+    "space": " ",
+    "backspace": "\x7f",
+    "escape": "\x1b",
+}
+KEY_ALIASES = {
+    "return": "enter",
+    "esc": "escape",
+    "page up": "pageup",
+    "page down": "pagedown",
+    "spacebar": "space",
+}
+
+# Keys that quit or signal the TUI, so there'd be nothing left to test
+EXIT_WORDS = ("quit", "exit", "close")
+SIGNAL_KEYS = ("c", "d", "z", "\\")
+
+# Validation runs on the user's machine, so keys that act on the outside world
+# (e.g. "k to kill the selected process") are never pressed
+DESTRUCTIVE_PATTERN = re.compile(
+    r"""
+    \b(?:delet|remov|kill|terminat|drop|send|sent|submit|eras|wip|purg|destroy
+    |overwrit|uninstall|shut\s*down|reboot|restart|signal|push|commit|sav|writ
+    |renam|trash|rm\b|unlink|truncat)
+    """,
+    re.IGNORECASE | re.VERBOSE,
+)
+
+KEY_PATTERN = re.compile(
+    r"""
+    (?:ctrl|control)\s*[-+]\s*(?P<ctrl>\S)   # Ctrl+R
+    | ['"`](?P<char>[^'"`\s])['"`]           # 'r'
+    | (?P<arrows>arrow\s+keys)               # Arrow keys
+    | \b(?P<name>up|down|left|right|home|end|page\s?up|page\s?down
+        |enter|return|tab|space(?:bar)?|backspace)\b
+    """,
+    re.IGNORECASE | re.VERBOSE,
+)
+
+
+def get_inputs_section(design: str) -> List[str]:
+    lines, in_section = [], False
+    for line in design.split("\n"):
+        if re.match(r"^\s*[•\-*]?\s*(?:\*\*)?user inputs?\b", line, re.IGNORECASE):
+            in_section = True
+        elif in_section and line.strip() and not line[0].isspace():
+            break  # The next top-level bullet
+        elif in_section:
+            lines.append(line)
+
+    return lines
+
+
+######
+# MAIN
+######
+
+
+def parse_keys(keys: str) -> List[str]:
+    """
+    Parses a comma-separated keystroke list, e.g. "r,down,down,enter".
+    """
+
+    keys = [key.strip() for key in keys.split(",")]
+    keys = [KEY_ALIASES.get(key.lower(), key) for key in keys if key]
+    return [key.lower() if key.lower() in KEY_CODES else key for key in keys]
+
+
+def get_design_keys(design: str) -> List[str]:
+    """
+    Picks the keystrokes to replay from the "User inputs" section of a design
+    document, skipping any that quit the TUI or could change anything outside
+    of it.
+    """
+
+    keys = []
+    for line in get_inputs_section(design):
+        for clause in re.split(r"[,;]", line):
+            if any(word in clause.lower() for word in EXIT_WORDS):
+                continue
+            if DESTRUCTIVE_PATTERN.search(clause):
+                continue
+
+            keys += get_clause_keys(clause)
+
+    keys = list(dict.fromkeys(keys))  # Each key once, in order
+    return keys[:MAX_KEYSTROKES]
+
+
+def get_clause_keys(clause: str) -> List[str]:
+    keys = []
+    for match in KEY_PATTERN.finditer(clause):
+        if ctrl := match.group("ctrl"):
+            if ctrl.lower() not in SIGNAL_KEYS:
+                keys.append(f"ctrl+{ctrl.lower()}")
+        elif char := match.group("char"):
+            keys.append(char)
+        elif match.group("arrows"):
+            keys += ["down", "up"]
+        else:
+            name = re.sub(r"\s+", " ", match.group("name").lower())
+            keys.append(KEY_ALIASES.get(name, name.replace(" ", "")))
+
+    return keys
+
+
+def encode_key(key: str, app_cursor_keys: bool = False) -> bytes:
+    if key.startswith("ctrl+") and len(key) == 6:
+        return bytes([ord(key[-1].lower()) & 0x1F])
+
+    code = KEY_CODES.get(key, key)
+    if app_cursor_keys and key in ("up", "down", "right", "left", "home", "end"):
+        code = code.replace("\x1b[", "\x1bO")  # What curses (keypad mode) expects
+
+    return code.encode()
@@ -0,0 +1,129 @@
+# Standard library
+import os
+import sys
+import time
+import signal
+from typing import Dict, Optional, Tuple
+from subprocess import Popen
+
+# Local
+try:
+    from termite.dtos import Config
+except ImportError:
+    from dtos import Config
+
+
+#########
+# HELPERS
+#########
+
+
+# Read (and applied to the script) by run_pty.py
+LIMIT_VARS = (
+    "TERMITE_CPU_LIMIT",
+    "TERMITE_MEMORY_LIMIT",
+    "TERMITE_NOFILE_LIMIT",
+    "TERMITE_NPROC_LIMIT",
+)
+
+
+def signal_group(proc: Popen, sig: int):
+    try:
+        os.killpg(proc.pid, sig)  # Runners lead their own process group
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def get_max_rss_mb(usage) -> float:
+    # ru_maxrss is in bytes on macOS, and kilobytes everywhere else
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return usage.ru_maxrss / scale
+
+
+def reap(proc: Popen, block: bool = False) -> Optional[Tuple[float, float]]:
+    # Like Popen.poll()/wait(), but also returns (max. RSS in MB, CPU seconds)
+    # for the runner and everything it waited for (i.e. the script)
+    if proc.returncode is not None:
+        return None
+
+    try:
+        pid, status, usage = os.wait4(proc.pid, 0 if block else os.WNOHANG)
+    except ChildProcessError:
+        proc.poll()
+        return None
+
+    if pid == 0:
+        return None
+
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    return get_max_rss_mb(usage), usage.ru_utime + usage.ru_stime
+
+
+######
+# MAIN
+######
+
+
+def get_runner_env(config: Config) -> Dict[str, str]:
+    """
+    Environment for run_pty.py, which applies these limits to the script.
+    """
+
+    env = dict(os.environ)
+    env["TERMITE_CPU_LIMIT"] = str(int(config.cpu_limit))
+    env["TERMITE_NOFILE_LIMIT"] = str(config.max_open_files)
+    if config.memory_limit_mb:
+        env["TERMITE_MEMORY_LIMIT"] = str(config.memory_limit_mb * 1024 * 1024)
+    if config.max_procs:
+        env["TERMITE_NPROC_LIMIT"] = str(config.max_procs)
+
+    return env
+
+
+def has_exited(proc: Popen) -> bool:
+    """
+    Checks whether the runner has exited *without* reaping it, so that its
+    resource usage can still be collected by kill_process_tree.
+    """
+
+    if proc.returncode is not None:
+        return True
+
+    if not hasattr(os, "waitid"):  # E.g. macOS before Python 3.13
+        # Can't peek without reaping, so reap now and keep the usage for later
+        proc.termite_usage = reap(proc)
+        return proc.returncode is not None
+
+    try:
+        flags = os.WEXITED | os.WNOHANG | os.WNOWAIT
+        return os.waitid(os.P_PID, proc.pid, flags) is not None
+    except ChildProcessError:
+        return proc.poll() is not None
+
+
+def kill_process_tree(
+    proc: Popen, timeout: float = 2.0
+) -> Optional[Tuple[float, float]]:
+    """
+    Stops the runner, the script and anything the script started, then reaps
+    the runner. Returns the resources they used as (max. RSS in MB, CPU seconds).
+    """
+
+    usage = reap(proc) or getattr(proc, "termite_usage", None)
+    if proc.returncode is None:
+        signal_group(proc, signal.SIGTERM)  # The runner stops the script itself
+
+        deadline = time.monotonic() + timeout
+        while True:
+            usage = reap(proc)
+            if proc.returncode is not None or time.monotonic() >= deadline:
+                break
+
+            time.sleep(0.01)
+
+    if proc.returncode is None:
+        signal_group(proc, signal.SIGKILL)
+        usage = reap(proc, block=True)
+
+    signal_group(proc, signal.SIGKILL)  # Whatever the script left behind
+    return usage
@@ -0,0 +1,164 @@
+# Standard library
+import os
+import json
+import time
+import sqlite3
+import hashlib
+from typing import (
+    AsyncGenerator,
+    AsyncIterable,
+    Dict,
+    Generator,
+    Iterable,
+    List,
+    Optional,
+)
+
+# Local
+try:
+    from termite.shared.utils.python_exe import get_termite_home
+except ImportError:
+    from shared.utils.python_exe import get_termite_home
+
+
+#########
+# HELPERS
+#########
+
+
+REPLAY_CHUNK_SIZE = 4  # Roughly one token per chunk, so progress bars still move
+
+
+def get_cache_path() -> str:
+    cache_dir = get_termite_home()
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    return str(cache_dir / "llm_cache.sqlite3")
+
+
+def connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(get_cache_path(), timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS responses ("
+        "key TEXT PRIMARY KEY, response TEXT, size INTEGER, last_used REAL)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)"
+    )
+    return conn
+
+
+def evict(conn: sqlite3.Connection, max_bytes: int):
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+    if total <= max_bytes:
+        return
+
+    rows = conn.execute("SELECT key, size FROM responses ORDER BY last_used")
+    stale = []
+    for key, size in rows:
+        if total <= max_bytes:
+            break
+
+        stale.append((key,))
+        total -= size
+
+    conn.executemany("DELETE FROM responses WHERE key = ?", stale)
+
+
+######
+# MAIN
+######
+
+
+def is_cache_disabled() -> bool:
+    return bool(os.getenv("TERMITE_NO_CACHE", None))
+
+
+def get_cache_key(
+    provider: str, system: str, messages: List[Dict[str, str]], **kwargs
+) -> str:
+    payload = json.dumps(
+        {
+            "provider": provider,
+            "model": kwargs.get("model", None),
+            "system": system,
+            "messages": messages,
+            "temperature": kwargs.get("temperature", None),
+            "candidate": kwargs.get("candidate", None),
+            "attempt": kwargs.get("attempt", None),
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def get_cached_response(key: str) -> Optional[str]:
+    conn = connect()
+    try:
+        with conn:
+            row = conn.execute(
+                "SELECT response FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row:
+                conn.execute(
+                    "UPDATE responses SET last_used = ? WHERE key = ?",
+                    (time.time(), key),
+                )
+    finally:
+        conn.close()
+
+    return row[0] if row else None
+
+
+def cache_response(key: str, response: str, max_bytes: int):
+    conn = connect()
+    try:
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (key, response, len(response.encode()), time.time()),
+            )
+            evict(conn, max_bytes)
+    finally:
+        conn.close()
+
+
+def replay_response(response: str) -> Generator[str, None, None]:
+    for i in range(0, len(response), REPLAY_CHUNK_SIZE):
+        yield response[i : i + REPLAY_CHUNK_SIZE]
+
+
+def record_response(
+    stream: Iterable[str], key: str, max_bytes: int
+) -> Generator[str, None, None]:
+    # Only fully consumed streams are cached; cancelled ones are not
+    chunks = []
+    try:
+        for chunk in stream:
+            chunks.append(chunk)
+            yield chunk
+    finally:
+        if hasattr(stream, "close"):
+            stream.close()
+
+    cache_response(key, "".join(chunks), max_bytes)
+
+
+async def areplay_response(response: str) -> AsyncGenerator[str, None]:
+    for chunk in replay_response(response):
+        yield chunk
+
+
+async def arecord_response(
+    stream: AsyncIterable[str], key: str, max_bytes: int
+) -> AsyncGenerator[str, None]:
+    chunks = []
+    try:
+        async for chunk in stream:
+            chunks.append(chunk)
+            yield chunk
+    finally:
+        if hasattr(stream, "aclose"):
+            await stream.aclose()
+
+    cache_response(key, "".join(chunks), max_bytes)
@@ -0,0 +1,392 @@
+# Standard library
+import os
+import ast
+import json
+import builtins
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+from subprocess import TimeoutExpired, run as run_cmd
+
+# Local
+try:
+    from termite.shared.utils.python_exe import get_python_executable
+except ImportError:
+    from shared.utils.python_exe import get_python_executable
+
+
+#########
+# HELPERS
+#########
+
+
+INTROSPECT_FILE = os.path.join(os.path.dirname(__file__), "introspect.py")
+LIBRARY_MODULES = {"urwid": "urwid", "rich": "rich", "textual": "textual"}
+MAX_FINDINGS = 5
+GUARD_NODES = (ast.If, ast.Try, *([ast.TryStar] if hasattr(ast, "TryStar") else []))
+IMPLICIT_NAMES = set(dir(builtins)) | {
+    "__file__",
+    "__name__",
+    "__doc__",
+    "__spec__",
+    "__loader__",
+    "__package__",
+    "__builtins__",
+    "__annotations__",
+    "__cached__",
+    "__class__",
+    "__module__",  # In class bodies
+    "__qualname__",
+}
+
+# Resolved library paths (e.g. "urwid.Columns") are stable for the life of the
+# process, so the venv only gets asked about each one once
+_path_cache: Dict[str, dict] = {}
+_path_cache_lock = threading.Lock()
+
+
+def introspect(modules: List[str], paths: List[str]) -> List[str]:
+    """
+    Asks the venv interpreter which modules are missing and resolves any paths
+    that aren't cached yet. Returns the missing modules.
+    """
+
+    with _path_cache_lock:
+        uncached = [path for path in paths if path not in _path_cache]
+
+    if not modules and not uncached:
+        return []
+
+    try:
+        result = run_cmd(
+            [get_python_executable(), INTROSPECT_FILE],
+            input=json.dumps({"modules": modules, "paths": uncached}),
+            capture_output=True,
+            text=True,
+            timeout=30,
+        )
+        response = json.loads(result.stdout)
+    except (TimeoutExpired, ValueError):
+        return []  # Never block validation on the analyzer itself
+
+    with _path_cache_lock:
+        for path, info in response["paths"].items():
+            if info is not None:  # None means the module is missing (for now)
+                _path_cache[path] = info
+
+    return response["missing_modules"]
+
+
+def get_parents(tree: ast.AST) -> Dict[ast.AST, ast.AST]:
+    return {
+        child: node for node in ast.walk(tree) for child in ast.iter_child_nodes(node)
+    }
+
+
+def is_guarded(node: ast.AST, parents: Dict[ast.AST, ast.AST]) -> bool:
+    # E.g. `if sys.platform == "win32": import msvcrt`, or try/except ImportError
+    while node in parents:
+        node = parents[node]
+        if isinstance(node, GUARD_NODES):
+            return True
+
+    return False
+
+
+def get_bound_names(tree: ast.AST) -> Set[str]:
+    names = set(IMPLICIT_NAMES)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load):
+            names.add(node.id)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, ast.arg):
+            names.add(node.arg)
+        elif isinstance(node, ast.alias):
+            names.add((node.asname or node.name).split(".")[0])
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            names.add(node.name)
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            names.update(node.names)
+        elif isinstance(node, (ast.MatchAs, ast.MatchStar)) and node.name:
+            names.add(node.name)
+        elif isinstance(node, ast.MatchMapping) and node.rest:
+            names.add(node.rest)
+
+    return names
+
+
+def get_imports(tree: ast.AST) -> Tuple[Dict[str, str], List[Tuple[ast.AST, str]]]:
+    """
+    Returns a map of local names to the dotted paths they're bound to, and the
+    top-level module of every absolute import.
+    """
+
+    aliases, modules = {}, []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                if alias.asname:
+                    aliases[alias.asname] = alias.name
+                else:
+                    root = alias.name.split(".")[0]
+                    aliases[root] = root
+                modules.append((node, alias.name.split(".")[0]))
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            for alias in node.names:
+                if alias.name != "*":
+                    aliases[alias.asname or alias.name] = f"{node.module}.{alias.name}"
+            modules.append((node, node.module.split(".")[0]))
+
+    return aliases, modules
+
+
+def get_required_imports(
+    imports: List[Tuple[ast.AST, str]], parents: Dict[ast.AST, ast.AST]
+) -> List[Tuple[ast.AST, str]]:
+    # Imports that only run on some platforms (or have a fallback) may be missing
+    return [(node, module) for node, module in imports if not is_guarded(node, parents)]
+
+
+def get_references(
+    tree: ast.AST,
+    parents: Dict[ast.AST, ast.AST],
+    aliases: Dict[str, str],
+    library_root: str,
+) -> Tuple[List[Tuple[ast.AST, str, bool]], List[Tuple[ast.Call, str, Optional[str]]]]:
+    """
+    Collects the script's references to the TUI library (e.g. "urwid.Colums"),
+    as (node, path, is_import), and its call sites to check.
+    """
+
+    references: List[Tuple[ast.AST, str, bool]] = []
+    calls: List[Tuple[ast.Call, str, Optional[str]]] = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            for alias in node.names:
+                if alias.name != "*":
+                    references.append((node, f"{node.module}.{alias.name}", True))
+        elif isinstance(node, ast.Attribute) and isinstance(node.ctx, ast.Load):
+            if not isinstance(parents.get(node), ast.Attribute):
+                path = get_attribute_path(node, aliases)
+                if path:
+                    references.append((node, path, False))
+        elif isinstance(node, ast.Call):
+            if isinstance(node.func, ast.Name):
+                calls.append((node, node.func.id, aliases.get(node.func.id, None)))
+            elif isinstance(node.func, ast.Attribute):
+                path = get_attribute_path(node.func, aliases)
+                calls.append((node, node.func.attr, path))
+
+    references = [ref for ref in references if ref[1].split(".")[0] == library_root]
+    return references, calls
+
+
+def get_attribute_path(node: ast.Attribute, aliases: Dict[str, str]) -> Optional[str]:
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+
+    if not isinstance(node, ast.Name) or node.id not in aliases:
+        return None
+
+    return ".".join([aliases[node.id], *reversed(parts)])
+
+
+def get_local_signature(node: ast.FunctionDef) -> dict:
+    args = node.args
+    positional = [arg.arg for arg in [*args.posonlyargs, *args.args]]
+    num_required = len(positional) - len(args.defaults)
+    required = positional[:num_required]
+    required += [
+        arg.arg
+        for arg, default in zip(args.kwonlyargs, args.kw_defaults)
+        if default is None
+    ]
+    return {
+        "names": [arg.arg for arg in [*args.args, *args.kwonlyargs]],
+        "positional": positional,
+        "required": required,
+        "varargs": args.vararg is not None,
+        "varkw": args.kwarg is not None,
+    }
+
+
+def get_local_signatures(tree: ast.Module) -> Dict[str, dict]:
+    # Only module-level functions that are bound exactly once and not decorated
+    definitions = {}
+    for node in tree.body:
+        if isinstance(node, ast.FunctionDef) and not node.decorator_list:
+            definitions.setdefault(node.name, []).append(node)
+
+    rebound = {
+        node.id
+        for node in ast.walk(tree)
+        if isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load)
+    }
+    rebound |= {node.arg for node in ast.walk(tree) if isinstance(node, ast.arg)}
+    return {
+        name: get_local_signature(nodes[0])
+        for name, nodes in definitions.items()
+        if len(nodes) == 1 and name not in rebound
+    }
+
+
+def check_call(call: ast.Call, name: str, signature: dict) -> Optional[str]:
+    if any(isinstance(arg, ast.Starred) for arg in call.args):
+        return None
+    if any(keyword.arg is None for keyword in call.keywords):
+        return None
+
+    num_positional = len(call.args)
+    keywords = [keyword.arg for keyword in call.keywords]
+    max_positional = len(signature["positional"])
+    if not signature["varargs"] and num_positional > max_positional:
+        return f"TypeError: {name}() takes {max_positional} positional arguments but {num_positional} were given"
+
+    if not signature["varkw"]:
+        for keyword in keywords:
+            if keyword not in signature["names"]:
+                return f"TypeError: {name}() got an unexpected keyword argument '{keyword}'"
+
+    covered = set(signature["positional"][:num_positional]) | set(keywords)
+    missing = [arg for arg in signature["required"] if arg not in covered]
+    if missing:
+        missing = ", ".join(f"'{arg}'" for arg in missing)
+        return f"TypeError: {name}() missing required arguments: {missing}"
+
+    return None
+
+
+def format_missing_path(path: str, info: dict, is_import: bool) -> str:
+    owner, attr = info["owner"], info["attr"]
+    if is_import and path == f"{owner}.{attr}":
+        message = f"ImportError: cannot import name '{attr}' from '{owner}'"
+    elif info["kind"] == "module":
+        message = f"AttributeError: module '{owner}' has no attribute '{attr}'"
+    elif info["kind"] == "class":
+        name = owner.split(".")[-1]
+        message = f"AttributeError: type object '{name}' has no attribute '{attr}'"
+    else:
+        message = f"AttributeError: '{info['kind']}' object has no attribute '{attr}'"
+
+    if info["suggestion"]:
+        message += f". Did you mean: '{info['suggestion']}'?"
+
+    return message
+
+
+def format_traceback(
+    node: ast.AST, message: str, lines: List[str], parents: Dict[ast.AST, ast.AST]
+) -> str:
+    scope, parent = "<module>", parents.get(node)
+    while parent:
+        if isinstance(parent, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            scope = parent.name
+            break
+        parent = parents.get(parent)
+
+    line = lines[node.lineno - 1].strip() if node.lineno <= len(lines) else ""
+    return "\n".join(
+        [
+            "Traceback (most recent call last):",
+            f'  File "<string>", line {node.lineno}, in {scope}',
+            f"    {line}",
+            message,
+        ]
+    )
+
+
+######
+# MAIN
+######
+
+
+def check_imports(code: str, library: str) -> List[str]:
+    """
+    Asks the venv which of the script's imports are missing. The library paths
+    the script uses are resolved in the same venv call, so a preflight of the
+    script afterwards (given this list) doesn't have to start the venv again.
+    """
+
+    tree = ast.parse(code)
+    parents = get_parents(tree)
+    aliases, imports = get_imports(tree)
+    library_root = LIBRARY_MODULES.get(library, library)
+
+    references, _ = get_references(tree, parents, aliases, library_root)
+    modules = {module for _, module in get_required_imports(imports, parents)}
+    return introspect(sorted(modules), sorted({ref[1] for ref in references}))
+
+
+def preflight(
+    code: str, library: str, missing_modules: Optional[List[str]] = None
+) -> str:
+    """
+    Statically checks a script for missing imports, undefined names, misspelled
+    library attributes and wrong-arity calls. Findings are reported as Python
+    tracebacks (the same shape as a real crash), or an empty string if none.
+    Pass the script's `missing_modules` if they're already known.
+    """
+
+    tree = ast.parse(code)
+    lines = code.split("\n")
+    parents = get_parents(tree)
+    aliases, imports = get_imports(tree)
+    library_root = LIBRARY_MODULES.get(library, library)
+
+    references, calls = get_references(tree, parents, aliases, library_root)
+    imports = get_required_imports(imports, parents)
+    top_modules = sorted({module for _, module in imports})
+    paths = sorted({ref[1] for ref in references})
+    if missing_modules is None:
+        missing_modules = introspect(top_modules, paths)
+    else:
+        introspect([], paths)  # Only starts the venv if a path isn't cached yet
+        missing_modules = [m for m in missing_modules if m in top_modules]
+
+    findings: List[Tuple[ast.AST, str]] = []
+
+    # Missing imports
+    for node, module in imports:
+        if module in missing_modules:
+            findings.append((node, f"ModuleNotFoundError: No module named '{module}'"))
+            missing_modules.remove(module)
+
+    # Misspelled library attributes
+    for node, path, is_import in references:
+        info = _path_cache.get(path, None)
+        if info and not info["ok"]:
+            findings.append((node, format_missing_path(path, info, is_import)))
+
+    # Undefined names
+    if not any(
+        isinstance(node, ast.ImportFrom) and any(a.name == "*" for a in node.names)
+        for node in ast.walk(tree)
+    ):
+        bound_names, reported = get_bound_names(tree), set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load):
+                if node.id not in bound_names and node.id not in reported:
+                    findings.append((node, f"NameError: name '{node.id}' is not defined"))
+                    reported.add(node.id)
+
+    # Wrong-arity calls to library callables and the script's own functions
+    local_signatures = get_local_signatures(tree)
+    for node, name, path in calls:
+        signature = None
+        if path and path.split(".")[0] == library_root:
+            info = _path_cache.get(path, None)
+            signature = info["signature"] if info and info["ok"] else None
+        elif not path and isinstance(node.func, ast.Name):
+            signature = local_signatures.get(name, None)
+
+        if signature and (message := check_call(node, name, signature)):
+            findings.append((node, message))
+
+    findings.sort(key=lambda finding: finding[0].lineno)
+    tracebacks = [
+        format_traceback(node, message, lines, parents)
+        for node, message in findings[:MAX_FINDINGS]
+    ]
+    return "\n\n".join(tracebacks)
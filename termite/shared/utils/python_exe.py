@@ -1,28 +1,129 @@
 # Standard library
+import os
+import re
 import sys
 import platform
+import threading
 from pathlib import Path
+from typing import List
 from subprocess import DEVNULL, run as run_cmd
 
 
+#########
+# HELPERS
+#########
+
+
+# TUI libraries every generated script needs; pre-installed into new venvs
+SEED_REQUIREMENTS = ["urwid", "rich", "textual"]
+SEED_LOCKFILE = os.path.join(os.path.dirname(__file__), "seed_requirements.txt")
+REQUIREMENT_NAME_PATTERN = re.compile(r"^\s*([A-Za-z0-9][A-Za-z0-9._-]*)")
+
+_venv_lock = threading.Lock()
+
+
+def get_termite_home() -> Path:
+    return Path.home() / ".termite"
+
+
+def get_wheelhouse_dir() -> Path:
+    wheelhouse = get_termite_home() / "wheelhouse"
+    wheelhouse.mkdir(parents=True, exist_ok=True)
+    return wheelhouse
+
+
+def read_requirements(path: str) -> List[str]:
+    # Skips comments, blank lines and pip options (e.g. --hash, -r, -e)
+    requirements = []
+    with open(path) as file:
+        for line in file:
+            line = line.split("#")[0].split(" --")[0].strip()
+            if line and not line.startswith("-"):
+                requirements.append(line)
+
+    return requirements
+
+
+def get_requirement_name(requirement: str) -> str:
+    # E.g. "textual==8.2.8; python_version >= '3.9'" -> "textual"
+    match = REQUIREMENT_NAME_PATTERN.match(requirement)
+    return match.group(1) if match else requirement
+
+
+def get_seed_requirements() -> List[str]:
+    try:
+        return read_requirements(SEED_LOCKFILE)
+    except OSError:
+        return SEED_REQUIREMENTS  # E.g. a source checkout without the lockfile
+
+
+def install_offline(executable: str, requirements: List[str]) -> bool:
+    result = run_cmd(
+        [
+            executable,
+            *("-m", "pip", "install", "--no-index"),
+            *("--find-links", str(get_wheelhouse_dir())),
+            *requirements,
+        ],
+        stdout=DEVNULL,
+        stderr=DEVNULL,
+    )
+    return result.returncode == 0
+
+
+def seed_from_wheelhouse(executable: str) -> List[str]:
+    """
+    Installs the pinned seed packages from the wheelhouse, without the network.
+    If that fails as a whole, each package is installed on its own, at any
+    version the wheelhouse has if its pin isn't there. Returns the packages
+    that couldn't be installed at all.
+    """
+
+    requirements = get_seed_requirements()
+    if install_offline(executable, requirements):
+        return []
+
+    failed = []
+    for requirement in requirements:
+        name = get_requirement_name(requirement)
+        candidates = dict.fromkeys([requirement, name])  # Pinned, then any version
+        if not any(install_offline(executable, [c]) for c in candidates):
+            failed.append(name)
+
+    return failed
+
+
 ######
 # MAIN
 ######
 
 
 def get_python_executable() -> str:
-    venv_dir = Path.home() / ".termite"
+    venv_dir = get_termite_home()
     if platform.system() == "Windows":
         executable = venv_dir / "Scripts" / "python"
     else:
         executable = venv_dir / "bin" / "python"
 
-    if not venv_dir.exists():
-        run_cmd(
-            [sys.executable, "-m", "venv", str(venv_dir)],
-            stdout=DEVNULL,
-            stderr=DEVNULL,
-            check=True,
-        )
+    # Other termite state lives in this directory too, so check for the interpreter
+    with _venv_lock:
+        if not executable.exists():
+            run_cmd(
+                [sys.executable, "-m", "venv", str(venv_dir)],
+                stdout=DEVNULL,
+                stderr=DEVNULL,
+                check=True,
+            )
+
+            # Seed the new venv from previously downloaded wheels, if there are any
+            if any(get_wheelhouse_dir().glob("*.whl")):
+                failed = seed_from_wheelhouse(str(executable))
+                if failed:
+                    print(
+                        f"Couldn't install {', '.join(failed)} from the wheelhouse "
+                        f"({get_wheelhouse_dir()}). They'll be downloaded when a "
+                        "script needs them. Run `termite --seed-venv` to fix this.",
+                        file=sys.stderr,
+                    )
 
     return str(executable)
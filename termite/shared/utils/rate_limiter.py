@@ -0,0 +1,272 @@
+# Standard library
+import time
+import random
+import asyncio
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+# Local
+try:
+    from termite.dtos import Config
+    from termite.shared.utils.tracing import Span
+except ImportError:
+    from dtos import Config
+    from shared.utils.tracing import Span
+
+
+#########
+# HELPERS
+#########
+
+
+T = TypeVar("T")
+
+# 529 is Anthropic's "overloaded"
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+RETRYABLE_ERRORS = (  # Matched by name, so the provider SDKs needn't be imported
+    "APIConnectionError",  # Also covers APITimeoutError (OpenAI, Anthropic)
+    "TransportError",  # httpx (Ollama)
+    "ConnectionError",
+    "TimeoutError",
+)
+
+_limiters: Dict[Tuple[str, Optional[int], Optional[int]], "RateLimiter"] = {}
+_limiters_lock = threading.Lock()
+
+
+class TokenBucket:
+    """
+    Refills at `per_minute / 60` units a second, up to `per_minute`. Requests
+    can take more than what's left, leaving the bucket in debt, and are told
+    how long to wait for it to be paid off.
+    """
+
+    def __init__(self, per_minute: int):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        with self.lock:
+            self.refill()
+            self.level -= min(amount, self.capacity)
+            return max(0.0, -self.level / self.rate)
+
+    def charge(self, amount: float):
+        # For usage that's only known after the fact (e.g. output tokens)
+        with self.lock:
+            self.refill()
+            self.level -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute budgets for one provider, shared
+    by every thread and event loop in the process.
+    """
+
+    def __init__(self, rpm: Optional[int], tpm: Optional[int]):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.lock = threading.Lock()
+        self.metrics = {
+            "requests": 0,
+            "retries": 0,
+            "throttled": 0,  # 429s
+            "queue_depth": 0,  # Requests waiting on the budget or a backoff
+            "max_queue_depth": 0,
+            "wait_time": 0.0,  # Seconds spent waiting on the budget
+            "backoff_time": 0.0,  # Seconds spent backing off before retries
+        }
+
+    def reserve(self, num_tokens: int) -> float:
+        delay = 0.0
+        if self.requests:
+            delay = self.requests.reserve(1)
+        if self.tokens:
+            delay = max(delay, self.tokens.reserve(num_tokens))
+
+        with self.lock:
+            self.metrics["requests"] += 1
+            self.metrics["wait_time"] += delay
+
+        return delay
+
+    def charge(self, num_tokens: int):
+        if self.tokens:
+            self.tokens.charge(num_tokens)
+
+    def record_retry(self, error: Exception, delay: float):
+        with self.lock:
+            self.metrics["retries"] += 1
+            self.metrics["throttled"] += getattr(error, "status_code", None) == 429
+            self.metrics["backoff_time"] += delay
+
+    def enter_queue(self):
+        with self.lock:
+            self.metrics["queue_depth"] += 1
+            self.metrics["max_queue_depth"] = max(
+                self.metrics["max_queue_depth"], self.metrics["queue_depth"]
+            )
+
+    def leave_queue(self):
+        with self.lock:
+            self.metrics["queue_depth"] -= 1
+
+    def wait(self, delay: float):
+        if delay <= 0:
+            return
+
+        self.enter_queue()
+        try:
+            time.sleep(delay)
+        finally:
+            self.leave_queue()
+
+    async def await_delay(self, delay: float):
+        if delay <= 0:
+            return
+
+        self.enter_queue()
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            self.leave_queue()
+
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        if value := headers.get("retry-after-ms"):  # OpenAI
+            return float(value) / 1000
+
+        if value := headers.get("retry-after"):
+            try:
+                return float(value)
+            except ValueError:  # An HTTP date
+                return parsedate_to_datetime(value).timestamp() - time.time()
+    except (TypeError, ValueError):
+        pass
+
+    return None
+
+
+def is_retryable(error: Exception) -> bool:
+    status_code = getattr(error, "status_code", None)
+    if isinstance(status_code, int):
+        return status_code in RETRYABLE_STATUS_CODES
+
+    return any(cls.__name__ in RETRYABLE_ERRORS for cls in type(error).__mro__)
+
+
+def get_retry_delay(error: Exception, attempt: int, config: Config) -> Optional[float]:
+    """
+    Seconds to wait before retrying a failed request, or None if it shouldn't
+    be retried. The server's Retry-After wins over exponential backoff.
+    """
+
+    if attempt >= config.llm_retries or not is_retryable(error):
+        return None
+
+    retry_after = get_retry_after(error)
+    if retry_after is not None:
+        retry_after = min(max(retry_after, 0.0), config.retry_max_delay)
+        return retry_after * random.uniform(1.0, 1.1)
+
+    # "Equal jitter", so threads that failed together don't retry together
+    delay = min(config.retry_max_delay, config.retry_base_delay * 2**attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+######
+# MAIN
+######
+
+
+def get_rate_limiter(provider: str, config: Config) -> RateLimiter:
+    key = (provider, config.requests_per_minute, config.tokens_per_minute)
+    with _limiters_lock:
+        if key not in _limiters:
+            _limiters[key] = RateLimiter(*key[1:])
+
+        return _limiters[key]
+
+
+def get_llm_metrics() -> Dict[str, Dict[str, float]]:
+    """
+    Scheduler metrics (requests, retries, queue depth, wait times) by provider.
+    """
+
+    metrics = {}
+    with _limiters_lock:
+        for (provider, *_), limiter in _limiters.items():
+            totals = metrics.setdefault(provider, {})
+            for name, value in limiter.metrics.items():
+                totals[name] = totals.get(name, 0) + value
+
+    return metrics
+
+
+def send_with_retries(
+    send: Callable[[], T],
+    provider: str,
+    num_tokens: int,
+    config: Config,
+    curr_span: Optional[Span] = None,
+) -> T:
+    """
+    Waits for room in the provider's budget, then sends the request, retrying
+    throttled and transient failures with backoff.
+    """
+
+    limiter = get_rate_limiter(provider, config)
+    attempt = 0
+    while True:
+        limiter.wait(limiter.reserve(num_tokens))
+        try:
+            return send()
+        except Exception as e:
+            delay = get_retry_delay(e, attempt, config)
+            if delay is None:
+                raise
+
+            limiter.record_retry(e, delay)
+            if curr_span:
+                curr_span.set(retries=attempt + 1)
+
+            limiter.wait(delay)
+            attempt += 1
+
+
+async def asend_with_retries(
+    send: Callable[[], Awaitable[T]],
+    provider: str,
+    num_tokens: int,
+    config: Config,
+    curr_span: Optional[Span] = None,
+) -> T:
+    limiter = get_rate_limiter(provider, config)
+    attempt = 0
+    while True:
+        await limiter.await_delay(limiter.reserve(num_tokens))
+        try:
+            return await send()
+        except Exception as e:
+            delay = get_retry_delay(e, attempt, config)
+            if delay is None:
+                raise
+
+            limiter.record_retry(e, delay)
+            if curr_span:
+                curr_span.set(retries=attempt + 1)
+
+            await limiter.await_delay(delay)
+            attempt += 1
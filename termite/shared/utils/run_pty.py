@@ -1,67 +1,241 @@
 import os
 import pty
 import sys
+import time
 import errno
+import fcntl
+import types
+import struct
+import termios
+import atexit
+import signal
+import builtins
+import resource
+import importlib
+import traceback
 from select import select, error as SelectError
-from subprocess import Popen, TimeoutExpired
 
-try:
-    from termite.shared.utils.python_exe import get_python_executable
-except ImportError:
-    from python_exe import get_python_executable
+PRELOAD_MODULES = {
+    "urwid": ["urwid"],
+    "rich": ["rich.console", "rich.live", "rich.layout", "rich.table", "rich.panel"],
+    "textual": ["textual.app", "textual.widgets", "textual.containers"],
+    "curses": ["curses"],
+}
+SCREEN_SIZE = (30, 100)  # Rows, columns of the PTY (and the validator's screen)
 
+# Resource limits for the script, set by the validator through the environment
+LIMITS = {
+    "TERMITE_CPU_LIMIT": resource.RLIMIT_CPU,  # Seconds
+    "TERMITE_MEMORY_LIMIT": resource.RLIMIT_AS,  # Bytes
+    "TERMITE_NOFILE_LIMIT": resource.RLIMIT_NOFILE,
+    "TERMITE_NPROC_LIMIT": resource.RLIMIT_NPROC,
+}
 
-def run_pty(command: str):
-    python_exe = get_python_executable()
-    masters, slaves = zip(pty.openpty(), pty.openpty())
-    proc = Popen(
-        [python_exe, command],
-        stdin=slaves[0],
-        stdout=slaves[0],
-        stderr=slaves[1],
-    )
+
+#########
+# HELPERS
+#########
+
+
+def preload(library: str):
+    for module in PRELOAD_MODULES.get(library, [library]):
+        try:
+            importlib.import_module(module)
+        except Exception:
+            pass  # Missing packages get installed (and imported) later
+
+
+def read_script_path() -> str:
+    # Read byte-by-byte so nothing after the newline is consumed from stdin
+    path = b""
+    while not path.endswith(b"\n"):
+        byte = os.read(0, 1)
+        if not byte:
+            return ""
+        path += byte
+
+    return path.decode().strip()
+
+
+def exec_script(path: str) -> int:
+    module = types.ModuleType("__main__")
+    module.__file__ = path
+    module.__builtins__ = builtins
+    sys.modules["__main__"] = module
+    sys.argv = [path]
+    sys.path[0] = os.path.dirname(path)
 
     try:
-        for fd in slaves:
+        with open(path) as file:
+            code = compile(file.read(), path, "exec")
+        exec(code, module.__dict__)
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            return e.code or 0
+        print(e.code, file=sys.stderr)
+        return 1
+    except BaseException as e:
+        # Skip this frame so the traceback looks like the script was run directly
+        traceback.print_exception(type(e), e, e.__traceback__.tb_next)
+        return 1
+
+    return 0
+
+
+def apply_limits():
+    for name, limit in LIMITS.items():
+        value = os.environ.pop(name, None)
+        if not value:
+            continue
+
+        value = int(value)
+        _, hard = resource.getrlimit(limit)
+        if hard != resource.RLIM_INFINITY:
+            value = min(value, hard)
+
+        # For CPU time, the soft limit sends SIGXCPU and the hard one SIGKILL
+        soft = value
+        if limit == resource.RLIMIT_CPU and hard == resource.RLIM_INFINITY:
+            hard = value + 1
+        else:
+            hard = value
+
+        try:
+            resource.setrlimit(limit, (soft, hard))
+        except (ValueError, OSError):
+            pass  # E.g. already over the limit; the outer timeout still applies
+
+
+def set_window_size(fd: int, rows: int, cols: int):
+    fcntl.ioctl(fd, termios.TIOCSWINSZ, struct.pack("HHHH", rows, cols, 0, 0))
+
+
+def fork_script(path: str, masters, slaves) -> int:
+    pid = os.fork()
+    if pid != 0:
+        return pid
+
+    # Child: run the script with the PTYs as its standard streams
+    code = 1
+    try:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        os.environ["TERM"] = "xterm-256color"  # What the validator's screen emulates
+        os.environ.pop("LINES", None)
+        os.environ.pop("COLUMNS", None)
+        os.dup2(slaves[0], 0)
+        os.dup2(slaves[0], 1)
+        os.dup2(slaves[1], 2)
+        for fd in (*masters, *slaves):
             os.close(fd)
 
-        readable = {
-            masters[0]: sys.stdout.buffer,
-            masters[1]: sys.stderr.buffer,
-        }
+        sys.stdin = sys.__stdin__ = open(0, "r", closefd=False)
+        sys.stdout = sys.__stdout__ = open(1, "w", buffering=1, closefd=False)
+        sys.stderr = sys.__stderr__ = open(2, "w", buffering=1, closefd=False)
+
+        importlib.invalidate_caches()  # Pick up packages installed since the preload
+        apply_limits()
+        code = exec_script(path)
+        atexit._run_exitfuncs()
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(code)
+
 
-        # Keep reading until EOF from both stdout/stderr or the process ends
-        while True:
-            if not readable:
-                break
+def wait_for_child(pid: int, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if os.waitpid(pid, os.WNOHANG)[0] != 0:
+            return True
+        time.sleep(0.01)
+
+    return False
+
+
+def forward_input(master: int) -> bool:
+    # Keystrokes sent by the validator are typed into the TUI's terminal
+    try:
+        data = os.read(0, 1024)
+        if data:
+            os.write(master, data)
+    except OSError:
+        return False
+
+    return bool(data)
+
+
+def relay(masters):
+    readable = {
+        masters[0]: sys.stdout.buffer,
+        masters[1]: sys.stderr.buffer,
+    }
+    forwarding = True
+
+    # Keep reading until EOF from both stdout/stderr or the process ends
+    while True:
+        if not readable:
+            break
+
+        try:
+            rlist, _, _ = select([*readable, *([0] if forwarding else [])], [], [])
+        except SelectError:
+            break
+
+        for fd in rlist:
+            if fd == 0:
+                forwarding = forward_input(masters[0])
+                continue
 
             try:
-                rlist, _, _ = select(readable, [], [])
-            except SelectError:
-                break
-
-            for fd in rlist:
-                try:
-                    data = os.read(fd, 1024)
-                except OSError as e:
-                    if e.errno != errno.EIO:
-                        raise
+                data = os.read(fd, 1024)
+            except OSError as e:
+                if e.errno != errno.EIO:
+                    raise
+                del readable[fd]
+            else:
+                if not data:
                     del readable[fd]
                 else:
-                    if not data:
-                        del readable[fd]
-                    else:
-                        readable[fd].write(data)
-                        readable[fd].flush()
+                    readable[fd].write(data)
+                    readable[fd].flush()
+
+
+######
+# MAIN
+######
+
 
+def run_pty(command: str) -> int:
+    masters, slaves = zip(pty.openpty(), pty.openpty())
+    for fd in slaves:
+        set_window_size(fd, *SCREEN_SIZE)  # Renders the same on every machine
+
+    pid = fork_script(command, masters, slaves)
+    status = None
+
+    try:
+        for fd in slaves:
+            os.close(fd)
+
+        relay(masters)
+        _, status = os.waitpid(pid, 0)
+        if os.WIFSIGNALED(status):
+            name = signal.Signals(os.WTERMSIG(status)).name
+            if os.WTERMSIG(status) == signal.SIGXCPU:
+                name += " (exceeded the CPU time limit)"
+            print(f"Process was killed by {name}", file=sys.stderr, flush=True)
     finally:
         # Once we've finished reading or an error occurred, close the child process.
-        if proc.poll() is None:
-            proc.terminate()
+        if status is None:
             try:
-                proc.wait(timeout=2)
-            except TimeoutExpired:
-                proc.kill()
+                os.kill(pid, signal.SIGTERM)
+                if not wait_for_child(pid, timeout=2):
+                    os.kill(pid, signal.SIGKILL)
+                    os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
 
         for fd in masters:
             try:
@@ -69,9 +243,23 @@ def run_pty(command: str):
             except OSError:
                 pass
 
+    return os.waitstatus_to_exitcode(status)
+
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
         sys.exit(1)
-    command = sys.argv[1]
-    run_pty(command)
+
+    # Make sure the child is cleaned up when the validator stops watching
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(1))
+
+    if sys.argv[1] == "--preload":
+        # Warm worker: import the TUI library now, then wait for a script to run
+        preload(sys.argv[2])
+        command = read_script_path()
+        if not command:
+            sys.exit(0)
+    else:
+        command = sys.argv[1]
+
+    sys.exit(run_pty(command))
@@ -0,0 +1,69 @@
+# Standard library
+import time
+import asyncio
+import threading
+from typing import AsyncIterator, Dict, Iterator, Optional, Tuple
+from contextlib import asynccontextmanager, contextmanager
+
+
+#########
+# HELPERS
+#########
+
+
+POLL_INTERVAL = 0.05
+
+# Shared by every pipeline in the process (e.g. in batch mode)
+_semaphores: Dict[Tuple[str, int], threading.BoundedSemaphore] = {}
+_semaphores_lock = threading.Lock()
+
+
+def get_semaphore(name: str, size: int) -> threading.BoundedSemaphore:
+    with _semaphores_lock:
+        if (name, size) not in _semaphores:
+            _semaphores[(name, size)] = threading.BoundedSemaphore(size)
+
+        return _semaphores[(name, size)]
+
+
+######
+# MAIN
+######
+
+
+@contextmanager
+def acquire_slot(name: str, size: Optional[int]) -> Iterator[float]:
+    """
+    Caps how many threads can be doing `name` (e.g. "llm") at once. Yields how
+    long the caller waited for a slot. A size of None means no limit.
+    """
+
+    if not size:
+        yield 0.0
+        return
+
+    semaphore = get_semaphore(name, size)
+    start_time = time.monotonic()
+    semaphore.acquire()
+    try:
+        yield time.monotonic() - start_time
+    finally:
+        semaphore.release()
+
+
+@asynccontextmanager
+async def aacquire_slot(name: str, size: Optional[int]) -> AsyncIterator[float]:
+    # Shares its slots with acquire_slot, but waits without blocking the loop
+    if not size:
+        yield 0.0
+        return
+
+    semaphore = get_semaphore(name, size)
+    start_time = time.monotonic()
+    while not semaphore.acquire(blocking=False):
+        await asyncio.sleep(POLL_INTERVAL)
+
+    try:
+        yield time.monotonic() - start_time
+    finally:
+        semaphore.release()
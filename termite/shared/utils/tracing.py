@@ -0,0 +1,217 @@
+# Standard library
+import json
+import time
+import asyncio
+import inspect
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+# Local
+try:
+    from termite.shared.utils.count_tokens import count_tokens
+except ImportError:
+    from shared.utils.count_tokens import count_tokens
+
+
+#########
+# HELPERS
+#########
+
+
+_events: Optional[List[Dict[str, Any]]] = None  # None while tracing is off
+_lanes: Dict[tuple, int] = {}
+_lock = threading.Lock()
+_current_span = contextvars.ContextVar("termite_span", default=None)
+_epoch = time.perf_counter()
+
+
+def get_lane() -> int:
+    # Concurrent asyncio tasks share a thread, but their spans don't nest, so
+    # each task gets its own row in the trace viewer
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+
+    thread = threading.current_thread()
+    key = (thread.ident, id(task) if task else None)
+    with _lock:
+        if key not in _lanes:
+            _lanes[key] = len(_lanes) + 1
+            name = task.get_name() if task else thread.name
+            _events.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": 1,
+                    "tid": _lanes[key],
+                    "args": {"name": name},
+                }
+            )
+
+        return _lanes[key]
+
+
+class Span:
+    """
+    A timed unit of work. Counters added to a span (tokens, etc.) also roll up
+    into every span that encloses it.
+    """
+
+    def __init__(self, name: str, category: str, args: Dict[str, Any]):
+        self.name, self.category, self.args = name, category, dict(args)
+        self.parent = _current_span.get()
+        self.lane = get_lane() if _events is not None else 0
+        self.start = time.perf_counter()
+        self.end = None
+
+    @property
+    def duration(self) -> float:
+        return (self.end or time.perf_counter()) - self.start
+
+    def set(self, **args):
+        self.args.update(args)
+
+    def add(self, **counts: float):
+        with _lock:
+            curr_span = self
+            while curr_span:
+                for name, count in counts.items():
+                    curr_span.args[name] = curr_span.args.get(name, 0) + count
+                curr_span = curr_span.parent
+
+    def finish(self):
+        if self.end is not None:
+            return
+
+        self.end = time.perf_counter()
+        if _events is None:
+            return
+
+        event = {
+            "name": self.name,
+            "cat": self.category,
+            "ph": "X",
+            "ts": (self.start - _epoch) * 1e6,
+            "dur": (self.end - self.start) * 1e6,
+            "pid": 1,
+            "tid": self.lane,
+            "args": dict(self.args),
+        }
+        with _lock:
+            _events.append(event)
+
+
+######
+# MAIN
+######
+
+
+def start_tracing():
+    global _events
+    with _lock:
+        _events = []
+        _lanes.clear()
+
+
+def save_trace(path: str):
+    """
+    Writes the spans recorded since start_tracing() as a Chrome trace (open it
+    in chrome://tracing or ui.perfetto.dev).
+    """
+
+    with _lock:
+        events = list(_events or [])
+
+    with open(path, "w") as file:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file, default=str)
+
+
+def start_span(name: str, category: str = "termite", **args) -> Span:
+    # For work that doesn't fit in a with block, e.g. a streamed response
+    return Span(name, category, args)
+
+
+@contextmanager
+def span(name: str, category: str = "termite", **args) -> Iterator[Span]:
+    curr_span = Span(name, category, args)
+    token = _current_span.set(curr_span)
+    try:
+        yield curr_span
+    except BaseException as e:
+        curr_span.set(error=type(e).__name__)
+        raise
+    finally:
+        _current_span.reset(token)
+        curr_span.finish()
+
+
+def traced(name: str, category: str = "tool"):
+    """
+    Decorator that runs a function (or coroutine function) inside a span.
+    """
+
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name, category):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, category):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def record_output(curr_span: Span, output: str):
+    num_tokens = count_tokens(output)
+    if curr_span.args.get("cached"):
+        curr_span.set(output_tokens=num_tokens)  # Not billed, so not rolled up
+    else:
+        curr_span.add(output_tokens=num_tokens)
+
+    curr_span.finish()
+
+
+def trace_stream(stream: Iterator[str], curr_span: Span) -> Iterator[str]:
+    # Records time-to-first-token and output tokens for a streamed response
+    chunks = []
+    try:
+        for chunk in stream:
+            if not chunks:
+                curr_span.set(ttft=round(curr_span.duration, 3))
+            chunks.append(chunk)
+            yield chunk
+    finally:
+        if hasattr(stream, "close"):
+            stream.close()  # Closing early has to reach the HTTP stream
+
+        record_output(curr_span, "".join(chunks))
+
+
+async def atrace_stream(
+    stream: AsyncIterator[str], curr_span: Span
+) -> AsyncIterator[str]:
+    chunks = []
+    try:
+        async for chunk in stream:
+            if not chunks:
+                curr_span.set(ttft=round(curr_span.duration, 3))
+            chunks.append(chunk)
+            yield chunk
+    finally:
+        if hasattr(stream, "aclose"):
+            await stream.aclose()
+
+        record_output(curr_span, "".join(chunks))
@@ -0,0 +1,311 @@
+# Standard library
+import codecs
+import unicodedata
+from typing import List
+
+
+#########
+# HELPERS
+#########
+
+
+# Escape sequences that don't affect what's on screen (colors, modes, titles,
+# etc.) are parsed and then ignored
+ESC, CSI_START, OSC_START = "\x1b", "[", "]"
+
+
+def get_char_width(char: str) -> int:
+    if unicodedata.combining(char):
+        return 0
+
+    return 2 if unicodedata.east_asian_width(char) in ("W", "F") else 1
+
+
+def get_params(params: str, default: int = 1) -> List[int]:
+    values = []
+    for param in params.lstrip("?>=").split(";"):
+        param = param.split(":")[0]
+        values.append(int(param) if param.isdigit() else default)
+
+    return values
+
+
+######
+# MAIN
+######
+
+
+class Screen:
+    """
+    A minimal VT100/xterm screen buffer. Feed it the bytes a program writes to
+    its terminal and it rebuilds the text that would be on screen (no colors).
+    """
+
+    def __init__(self, rows: int, cols: int):
+        self.rows, self.cols = rows, cols
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.pending = ""  # Incomplete escape sequence from the last feed
+        self.version = 0  # Bumped whenever the screen's contents change
+        self.app_cursor_keys = False  # Arrow keys are sent as ESC O A, not ESC [ A
+        self.reset()
+
+    def reset(self):
+        self.buffer = [[" "] * self.cols for _ in range(self.rows)]
+        self.x = self.y = 0
+        self.saved = (0, 0)
+        self.top, self.bottom = 0, self.rows - 1  # Scrolling region
+        self.wrap_next = False
+
+    # Cursor movement and scrolling
+
+    def move_to(self, y: int, x: int):
+        self.y = min(max(y, 0), self.rows - 1)
+        self.x = min(max(x, 0), self.cols - 1)
+        self.wrap_next = False
+
+    def scroll_up(self, n: int = 1):
+        for _ in range(n):
+            del self.buffer[self.top]
+            self.buffer.insert(self.bottom, [" "] * self.cols)
+
+    def scroll_down(self, n: int = 1):
+        for _ in range(n):
+            del self.buffer[self.bottom]
+            self.buffer.insert(self.top, [" "] * self.cols)
+
+    def line_feed(self):
+        if self.y == self.bottom:
+            self.scroll_up()
+        else:
+            self.y = min(self.y + 1, self.rows - 1)
+
+        self.wrap_next = False
+
+    def reverse_line_feed(self):
+        if self.y == self.top:
+            self.scroll_down()
+        else:
+            self.y = max(self.y - 1, 0)
+
+    # Editing
+
+    def draw(self, char: str):
+        width = get_char_width(char)
+        if width == 0:
+            return
+
+        if self.wrap_next:
+            self.x = 0
+            self.line_feed()
+
+        if self.x + width > self.cols:
+            self.x = self.cols - width
+
+        self.buffer[self.y][self.x] = char
+        if width == 2:
+            self.buffer[self.y][self.x + 1] = ""
+
+        if self.x + width >= self.cols:
+            self.wrap_next = True
+        else:
+            self.x += width
+
+    def erase_in_display(self, mode: int):
+        if mode == 0:
+            self.erase_in_line(0)
+            rows = range(self.y + 1, self.rows)
+        elif mode == 1:
+            self.erase_in_line(1)
+            rows = range(0, self.y)
+        else:
+            rows = range(self.rows)
+
+        for y in rows:
+            self.buffer[y] = [" "] * self.cols
+
+    def erase_in_line(self, mode: int):
+        line = self.buffer[self.y]
+        start, end = {0: (self.x, self.cols), 1: (0, self.x + 1)}.get(
+            mode, (0, self.cols)
+        )
+        line[start:end] = [" "] * (end - start)
+
+    def insert_lines(self, n: int):
+        if self.top <= self.y <= self.bottom:
+            for _ in range(n):
+                del self.buffer[self.bottom]
+                self.buffer.insert(self.y, [" "] * self.cols)
+
+    def delete_lines(self, n: int):
+        if self.top <= self.y <= self.bottom:
+            for _ in range(n):
+                del self.buffer[self.y]
+                self.buffer.insert(self.bottom, [" "] * self.cols)
+
+    def insert_chars(self, n: int):
+        line = self.buffer[self.y]
+        line[self.x : self.x] = [" "] * n
+        del line[self.cols :]
+
+    def delete_chars(self, n: int):
+        line = self.buffer[self.y]
+        del line[self.x : self.x + n]
+        line.extend([" "] * (self.cols - len(line)))
+
+    def erase_chars(self, n: int):
+        line = self.buffer[self.y]
+        end = min(self.x + n, self.cols)
+        line[self.x : end] = [" "] * (end - self.x)
+
+    # Escape sequences
+
+    def handle_csi(self, params: str, final: str):
+        args = get_params(params)
+        n = max(args[0], 1)
+        if params.startswith("?"):
+            modes = set(get_params(params, 0))
+            if final in "hl" and 1 in modes:
+                self.app_cursor_keys = final == "h"
+
+            # Switching to/from the alternate screen starts with a blank one
+            if final in "hl" and {47, 1047, 1049} & modes:
+                self.erase_in_display(2)
+                self.move_to(0, 0)
+        elif final in "Hf":
+            row, col = (args + [1, 1])[:2]
+            self.move_to(row - 1, col - 1)
+        elif final == "A":
+            self.move_to(self.y - n, self.x)
+        elif final in "Be":
+            self.move_to(self.y + n, self.x)
+        elif final in "Ca":
+            self.move_to(self.y, self.x + n)
+        elif final == "D":
+            self.move_to(self.y, self.x - n)
+        elif final == "E":
+            self.move_to(self.y + n, 0)
+        elif final == "F":
+            self.move_to(self.y - n, 0)
+        elif final in "G`":
+            self.move_to(self.y, n - 1)
+        elif final == "d":
+            self.move_to(n - 1, self.x)
+        elif final == "J":
+            self.erase_in_display(get_params(params, 0)[0])
+        elif final == "K":
+            self.erase_in_line(get_params(params, 0)[0])
+        elif final == "L":
+            self.insert_lines(n)
+        elif final == "M":
+            self.delete_lines(n)
+        elif final == "@":
+            self.insert_chars(n)
+        elif final == "P":
+            self.delete_chars(n)
+        elif final == "X":
+            self.erase_chars(n)
+        elif final == "S":
+            self.scroll_up(n)
+        elif final == "T":
+            self.scroll_down(n)
+        elif final == "r":
+            top, bottom = (get_params(params, 0) + [0, 0])[:2]
+            self.top = max(top - 1, 0)
+            self.bottom = min(bottom - 1, self.rows - 1) if bottom else self.rows - 1
+            self.move_to(0, 0)
+        elif final == "s":
+            self.saved = (self.y, self.x)
+        elif final == "u":
+            self.move_to(*self.saved)
+
+    def parse_escape(self, data: str, i: int) -> int:
+        """
+        Handles the escape sequence starting at data[i]. Returns the index just
+        past it, or -1 if the sequence is incomplete.
+        """
+
+        if i + 1 >= len(data):
+            return -1
+
+        kind = data[i + 1]
+        if kind == CSI_START:
+            j = i + 2
+            while j < len(data) and not ("@" <= data[j] <= "~"):
+                j += 1
+            if j >= len(data):
+                return -1
+
+            self.handle_csi(data[i + 2 : j], data[j])
+            return j + 1
+
+        if kind in OSC_START + "PX^_":
+            # Strings end with BEL (OSC only) or ST (ESC \)
+            for j in range(i + 2, len(data)):
+                if data[j] == "\x07" and kind == OSC_START:
+                    return j + 1
+                if data[j] == ESC and data[j + 1 : j + 2] == "\\":
+                    return j + 2
+
+            return -1
+
+        if kind in "()*+#%":
+            return i + 3 if i + 2 < len(data) else -1  # Charset selection, etc.
+
+        if kind == "7":
+            self.saved = (self.y, self.x)
+        elif kind == "8":
+            self.move_to(*self.saved)
+        elif kind == "D":
+            self.line_feed()
+        elif kind == "E":
+            self.x = 0
+            self.line_feed()
+        elif kind == "M":
+            self.reverse_line_feed()
+        elif kind == "c":
+            self.reset()
+
+        return i + 2
+
+    def feed(self, data: bytes):
+        text = self.pending + self.decoder.decode(data)
+        self.pending = ""
+        before = self.buffer_hash()
+
+        i = 0
+        while i < len(text):
+            char = text[i]
+            if char == ESC:
+                end = self.parse_escape(text, i)
+                if end == -1:
+                    self.pending = text[i:]
+                    break
+                i = end
+                continue
+
+            if char == "\r":
+                self.x = 0
+                self.wrap_next = False
+            elif char in "\n\x0b\x0c":
+                self.line_feed()
+            elif char == "\b":
+                self.move_to(self.y, self.x - 1)
+            elif char == "\t":
+                self.move_to(self.y, (self.x // 8 + 1) * 8)
+            elif char >= " " and char != "\x7f":
+                self.draw(char)
+
+            i += 1
+
+        if self.buffer_hash() != before:
+            self.version += 1
+
+    def buffer_hash(self) -> int:
+        return hash(tuple(tuple(line) for line in self.buffer))
+
+    def get_text(self) -> str:
+        lines = ["".join(line).rstrip() for line in self.buffer]
+        while lines and not lines[-1]:
+            lines.pop()
+
+        return "\n".join(lines)
@@ -0,0 +1,112 @@
+# Standard library
+import threading
+from typing import List, Optional
+from subprocess import CalledProcessError, run as run_cmd
+
+# Local
+try:
+    from termite.shared.utils.python_exe import (
+        get_python_executable,
+        get_requirement_name,
+        get_seed_requirements,
+        get_wheelhouse_dir,
+        read_requirements,
+    )
+    from termite.shared.utils.tracing import span
+except ImportError:
+    from shared.utils.python_exe import (
+        get_python_executable,
+        get_requirement_name,
+        get_seed_requirements,
+        get_wheelhouse_dir,
+        read_requirements,
+    )
+    from shared.utils.tracing import span
+
+
+#########
+# HELPERS
+#########
+
+
+_pip_lock = threading.Lock()  # Concurrent pip runs in one venv step on each other
+
+
+def run_pip(*args: str):
+    run_cmd(
+        [get_python_executable(), "-m", "pip", *args],
+        capture_output=True,
+        check=True,
+    )
+
+
+def install_from_wheelhouse(requirements: List[str]):
+    wheelhouse = str(get_wheelhouse_dir())
+    run_pip("install", "--no-index", "--find-links", wheelhouse, *requirements)
+
+
+def download_to_wheelhouse(requirements: List[str]):
+    # Builds/downloads wheels for the requirements *and* their dependencies
+    wheelhouse = str(get_wheelhouse_dir())
+    run_pip(
+        "wheel", "--wheel-dir", wheelhouse, "--find-links", wheelhouse, *requirements
+    )
+
+
+######
+# MAIN
+######
+
+
+def install_packages(requirements: List[str]) -> bool:
+    """
+    Installs packages into the venv from the local wheelhouse. Anything that
+    isn't in the wheelhouse yet gets downloaded into it first, so every package
+    is only ever fetched from the network once.
+    """
+
+    with span("pip install", "pip", packages=" ".join(requirements)) as curr_span:
+        with _pip_lock:
+            try:
+                install_from_wheelhouse(requirements)
+            except CalledProcessError:
+                curr_span.set(downloaded=True)
+                download_to_wheelhouse(requirements)
+                install_from_wheelhouse(requirements)
+
+    return True
+
+
+def seed_venv(lockfile: Optional[str] = None) -> List[str]:
+    """
+    Installs a lockfile (or the pinned TUI libraries) into the venv, e.g. to
+    prepare a build host or an air-gapped machine. If that fails as a whole,
+    each package is installed on its own, at any version if its pin can't be.
+    Returns the packages that couldn't be installed at all.
+    """
+
+    if lockfile:
+        requirements = read_requirements(lockfile)
+        bulk = ["-r", lockfile]  # Keeps pip options like --hash
+    else:
+        requirements = bulk = get_seed_requirements()
+
+    try:
+        install_packages(bulk)
+        return []
+    except CalledProcessError:
+        pass
+
+    failed = []
+    for requirement in requirements:
+        name = get_requirement_name(requirement)
+        for candidate in dict.fromkeys([requirement, name]):  # Pinned, then any
+            try:
+                install_packages([candidate])
+                break
+            except CalledProcessError:
+                continue
+        else:
+            failed.append(name)
+
+    return failed
@@ -0,0 +1,113 @@
+# Standard library
+import os
+import atexit
+import threading
+from typing import Dict, List, Optional
+from subprocess import Popen, TimeoutExpired, PIPE
+
+# Local
+try:
+    from termite.dtos import Config
+    from termite.shared.utils.limits import LIMIT_VARS, get_runner_env
+    from termite.shared.utils.python_exe import get_python_executable
+except ImportError:
+    from dtos import Config
+    from shared.utils.limits import LIMIT_VARS, get_runner_env
+    from shared.utils.python_exe import get_python_executable
+
+
+#########
+# HELPERS
+#########
+
+
+RUNNER_FILE = os.path.join(os.path.dirname(__file__), "run_pty.py")
+
+
+class WorkerPool:
+    """
+    Keeps a few `run_pty.py --preload <library>` interpreters booted and waiting
+    for a script. Each worker runs exactly one script (forked under a fresh PTY)
+    and is replaced as soon as it's handed out, so the interpreter boot and the
+    heavy library imports happen off the critical path.
+    """
+
+    def __init__(self, library: str, size: int, env: Optional[Dict[str, str]] = None):
+        self.library = library
+        self.size = size
+        self.env = env
+        self._idle: List[Popen] = []
+        self._lock = threading.Lock()
+
+    def _spawn(self) -> Popen:
+        return Popen(
+            [get_python_executable(), RUNNER_FILE, "--preload", self.library],
+            stdin=PIPE,
+            stdout=PIPE,
+            stderr=PIPE,
+            env=self.env,
+            start_new_session=True,  # So the whole process tree can be killed
+        )
+
+    def _fill(self):
+        self._idle = [worker for worker in self._idle if worker.poll() is None]
+        while len(self._idle) < self.size:
+            self._idle.append(self._spawn())
+
+    def warm(self):
+        with self._lock:
+            self._fill()
+
+    def run(self, script_path: str) -> Popen:
+        with self._lock:
+            self._fill()
+            worker = self._idle.pop(0)
+            self._fill()  # Start booting the replacement right away
+
+        worker.stdin.write(f"{script_path}\n".encode())
+        worker.stdin.flush()
+        return worker
+
+    def shutdown(self):
+        with self._lock:
+            workers, self._idle = self._idle, []
+
+        for worker in workers:
+            worker.stdin.close()  # Idle workers exit on EOF
+            try:
+                worker.wait(timeout=1)
+            except TimeoutExpired:
+                worker.kill()
+            worker.stdout.close()
+            worker.stderr.close()
+
+
+_pools: Dict[tuple, WorkerPool] = {}
+_pools_lock = threading.Lock()
+
+
+def _shutdown_pools():
+    for pool in _pools.values():
+        pool.shutdown()
+
+
+atexit.register(_shutdown_pools)
+
+
+######
+# MAIN
+######
+
+
+def get_worker_pool(
+    library: str, size: int, config: Optional[Config] = None
+) -> WorkerPool:
+    env = get_runner_env(config or Config())
+    # Limits that aren't set are missing from env, so key on (name, value) pairs
+    limits = tuple((name, env[name]) for name in LIMIT_VARS if name in env)
+    key = (library, limits)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = WorkerPool(library, size, env)
+
+        return _pools[key]
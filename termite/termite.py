@@ -1,21 +1,42 @@
+# Standard library
+import asyncio
+from dataclasses import replace
+
 # Third party
+from rich.text import Text
 from rich.console import Console
 from rich.progress import (
     BarColumn,
     Progress,
+    ProgressColumn,
+    Task,
     TextColumn,
     TimeElapsedColumn,
 )
 
 # Local
 try:
-    from termite.shared import MAX_TOKENS
+    from termite.shared import aclose_clients, track_progress
+    from termite.shared.utils import (
+        count_tokens,
+        get_design_keys,
+        get_python_executable,
+        get_worker_pool,
+        span,
+    )
     from termite.dtos import Script, Config
-    from termite.tools import design_tui, build_tui, fix_errors, refine
+    from termite.tools import adesign_tui, abuild_tui, fix_errors, refine
 except ImportError:
-    from shared import MAX_TOKENS
+    from shared import aclose_clients, track_progress
+    from shared.utils import (
+        count_tokens,
+        get_design_keys,
+        get_python_executable,
+        get_worker_pool,
+        span,
+    )
     from dtos import Script, Config
-    from tools import design_tui, build_tui, fix_errors, refine
+    from tools import adesign_tui, abuild_tui, fix_errors, refine
 
 console = Console(log_time=False, log_path=False)
 
@@ -25,49 +46,77 @@ console = Console(log_time=False, log_path=False)
 #########
 
 
-def _get_progress_bar() -> Progress:
+class StreamStatsColumn(ProgressColumn):
+    # Time-to-first-token and throughput, as reported by StreamCollector
+    def render(self, task: Task) -> Text:
+        stats = task.fields.get("stats", "")
+        return Text(f"• {stats}" if stats else "", style="progress.data.speed")
+
+
+def _log(message: str, config: Config):
+    if not config.quiet:
+        console.log(message)
+
+
+def _get_progress_bar(config: Config) -> Progress:
     return Progress(
         BarColumn(),
         TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
         TextColumn("•"),
         TimeElapsedColumn(),
+        StreamStatsColumn(),
         transient=False,
+        disable=config.quiet,
     )
 
 
-def _design_tui(prompt: str, config: Config) -> str:
-    console.log("[bold green]Designing the TUI")
-    with _get_progress_bar() as p_bar:
-        design = design_tui(prompt, p_bar, config)
+def _warm_up(config: Config):
+    # Create the venv and boot the validation workers while the LLM is busy
+    get_python_executable()
+    if config.pool_size > 0:
+        get_worker_pool(config.library, config.pool_size, config).warm()
+
+
+async def _design_tui(prompt: str, config: Config) -> str:
+    _log("[bold green]Designing the TUI", config)
+    with _get_progress_bar(config) as p_bar:
+        design = await adesign_tui(prompt, p_bar, config)
         return design
 
 
-def _build_tui(design: str, config: Config) -> Script:
-    console.log("[bold green]Building the TUI")
-    with _get_progress_bar() as p_bar:
-        script = build_tui(design, p_bar, config)
+async def _build_tui(design: str, config: Config) -> Script:
+    _log("[bold green]Building the TUI", config)
+    with _get_progress_bar(config) as p_bar:
+        script = await abuild_tui(design, p_bar, config)
         return script
 
 
 def _fix_errors(script: Script, design: str, config: Config) -> Script:
-    console.log("[bold green]Fixing bugs")
-    with _get_progress_bar() as p_bar:
-        # TODO: Use count_tokens(script.code) instead of MAX_TOKENS // 15
-        progress_limit = config.fix_iters * (MAX_TOKENS // 15)
+    _log("[bold green]Fixing bugs", config)
+    with _get_progress_bar(config) as p_bar:
+        progress_limit = config.fix_iters * count_tokens(script.code)
         task = p_bar.add_task("fix", total=progress_limit)
-        incr_p_bar = lambda: p_bar.update(task, advance=1)
+        incr_p_bar = track_progress(p_bar, task)
         script = fix_errors(script, design, incr_p_bar, config)
         p_bar.update(task, completed=progress_limit)
 
-        return script
+    report = script.fix_report
+    if report and report.stop_reason == "stuck":
+        _log(
+            f"[bright_black]Stopped fixing after {len(report.steps)} attempts: "
+            "the same errors kept coming back",
+            config,
+        )
+
+    return script
 
 
 def _refine(script: Script, design: str, config: Config) -> Script:
     if not config.should_refine:
         return script
 
-    console.log("[bold green]Finishing touches")
-    with _get_progress_bar() as p_bar:
+    _log("[bold green]Finishing touches", config)
+    with _get_progress_bar(config) as p_bar:
         script = refine(script, design, p_bar, config)
         return script
 
@@ -77,7 +126,7 @@ def _refine(script: Script, design: str, config: Config) -> Script:
 ######
 
 
-def termite(prompt: str, config: Config) -> Script:
+async def atermite(prompt: str, config: Config) -> Script:
     """
     1. Generate a design document.
     2. Implement the TUI.
@@ -85,9 +134,37 @@ def termite(prompt: str, config: Config) -> Script:
     4. (Optional) Refine the TUI.
     """
 
-    design = _design_tui(prompt, config)
-    script = _build_tui(design, config)
-    script = _fix_errors(script, design, config)
-    script = _refine(script, design, config)
+    with span("termite", "pipeline", library=config.library):
+        warm_up = asyncio.create_task(asyncio.to_thread(_warm_up, config))
+        try:
+            design = await _design_tui(prompt, config)
+            if config.keystrokes is None:
+                # Exercise the key handlers the design calls for during validation
+                config = replace(config, keystrokes=get_design_keys(design))
+
+            script = await _build_tui(design, config)
+        except BaseException:
+            # A thread can't be cancelled, so wait for the warm-up (without letting
+            # its own error replace this one) rather than leave it running
+            await asyncio.gather(warm_up, return_exceptions=True)
+            raise
+
+        await warm_up
+
+        # Fixing and refining alternate between the LLM and the validator, so
+        # they run in a worker thread to keep the event loop free
+        script = await asyncio.to_thread(_fix_errors, script, design, config)
+        script = await asyncio.to_thread(_refine, script, design, config)
 
     return script
+
+
+def termite(prompt: str, config: Config) -> Script:
+    async def _run() -> Script:
+        try:
+            return await atermite(prompt, config)
+        finally:
+            # Pipelines running in the same loop (e.g. a batch) share clients
+            await aclose_clients()
+
+    return asyncio.run(_run())
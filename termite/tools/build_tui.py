@@ -1,5 +1,11 @@
 # Standard library
-from typing import Optional
+import re
+import ast
+import asyncio
+import threading
+import contextvars
+from typing import Callable, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Third party
 from rich.progress import Progress
@@ -7,10 +13,26 @@ from rich.progress import Progress
 # Local
 try:
     from termite.dtos import Script, Config
-    from termite.shared import call_llm, MAX_TOKENS
+    from termite.shared import (
+        run_tui,
+        call_llm,
+        acall_llm,
+        MAX_TOKENS,
+        StreamCollector,
+        track_progress,
+    )
+    from termite.shared.utils import fix_missing_modules, scan_imports, traced
 except ImportError:
     from dtos import Script, Config
-    from shared import call_llm, MAX_TOKENS
+    from shared import (
+        run_tui,
+        call_llm,
+        acall_llm,
+        MAX_TOKENS,
+        StreamCollector,
+        track_progress,
+    )
+    from shared.utils import fix_missing_modules, scan_imports, traced
 
 
 #########
@@ -19,6 +41,17 @@ except ImportError:
 
 
 PROGRESS_LIMIT = MAX_TOKENS // 15
+CONTINUATION_KEYWORDS = ("else", "elif", "except", "except*", "finally")
+KEYWORD_PATTERN = re.compile(r"\w+\*?")  # E.g. "except*" in "except* ValueError:"
+DEFINITION_KEYWORDS = ("def", "async", "class")  # What a decorator is waiting on
+
+# Syntax errors that only mean a statement hasn't finished streaming yet
+INCOMPLETE_ERRORS = (
+    "was never closed",
+    "unterminated triple-quoted string",
+    "EOF while scanning triple-quoted string",  # Python < 3.10
+    "unexpected EOF",
+)
 PROMPT = """You are an expert Python programmer tasked with building a terminal user interface (TUI).
 You will be given a design document that describes the TUI and its requirements. Your job is to implement the TUI using the {library} library.
 
@@ -80,25 +113,267 @@ def parse_code(output: str) -> str:
     return output
 
 
+def is_statement_start(line: str) -> bool:
+    if not line.strip() or line[0].isspace() or line[0] in "#)]}":
+        return False
+
+    # A match statement's case blocks are always indented, so they never land here
+    keyword = KEYWORD_PATTERN.match(line)
+    return not keyword or keyword.group() not in CONTINUATION_KEYWORDS
+
+
+def is_definition(line: str) -> bool:
+    return line.split()[0].split("(")[0] in DEFINITION_KEYWORDS
+
+
+class CodeStreamChecker:
+    """
+    Syntax checks the code block of a streaming response one top-level
+    statement at a time, so that output which is already broken can be
+    abandoned before it finishes streaming.
+    """
+
+    def __init__(self):
+        self.delimiter = None  # Closes the code block
+        self.segment = []  # Lines since the last statement that parsed
+        self.decorating = False  # Decorators belong to the def/class that follows
+        self.done = False
+        self.error = None
+
+    @property
+    def in_code(self) -> bool:
+        return bool(self.delimiter) and not self.done
+
+    def _check_segment(self):
+        try:
+            ast.parse("".join(self.segment))
+        except SyntaxError as e:
+            if not any(error in e.msg for error in INCOMPLETE_ERRORS):
+                self.error = e.msg
+
+            return
+
+        self.segment = []
+
+    def feed(self, line: str) -> Optional[str]:
+        """
+        Takes the next complete line of the response. Returns a syntax error once
+        the code streamed so far is known to be broken, otherwise None.
+        """
+
+        if self.done or self.error:
+            return self.error
+
+        if not self.delimiter:
+            for opening, closing in (("<code>", "</code>"), ("```", "```")):
+                if opening in line:
+                    self.delimiter = closing
+                    break
+
+            return None
+
+        if self.delimiter in line:
+            self.done = True  # Whatever's left gets checked by run_tui
+            return None
+
+        # A statement is complete once the next top-level one starts
+        if is_statement_start(line):
+            if self.segment and not self.decorating:
+                self._check_segment()
+
+            if line.startswith("@"):
+                self.decorating = True
+            elif is_definition(line):
+                self.decorating = False
+
+        self.segment.append(line)
+        return self.error
+
+
+def close_stream(output):
+    if hasattr(output, "close"):
+        output.close()
+
+
+def generate_script(
+    design: str,
+    incr_p_bar: Callable[..., None],
+    config: Config,
+    cancelled: Optional[threading.Event] = None,
+    candidate: int = 0,
+) -> Optional[Script]:
+    """
+    Streams a script from the LLM. If the code turns out to be broken before
+    it's finished, the request is cut short and re-issued (up to
+    `config.build_retries` times).
+    """
+
+    for attempt in range(config.build_retries + 1):
+        output = call_llm(
+            system=PROMPT.format(library=config.library),
+            messages=[{"role": "user", "content": design}],
+            config=config,
+            stream=True,
+            stage="build",
+            candidate=candidate,  # Keeps parallel candidates distinct in the cache
+            attempt=attempt,
+        )
+        can_retry = attempt < config.build_retries
+        collector, checker = StreamCollector(incr_p_bar), CodeStreamChecker()
+        broken = False
+        for token in output:
+            if cancelled and cancelled.is_set():
+                close_stream(output)
+                return None
+
+            lines = collector.add(token)
+            if can_retry and any(checker.feed(line) for line in lines):
+                close_stream(output)
+                broken = True
+                break
+
+        code = collector.finish()
+        if not broken:
+            break
+
+    return Script(code=parse_code(code))
+
+
+async def agenerate_script(
+    design: str, incr_p_bar: Callable[..., None], config: Config
+) -> Script:
+    """
+    Like generate_script, but installs the script's imports while the rest of
+    it is still streaming in.
+    """
+
+    seen, installs = set(), []
+    for attempt in range(config.build_retries + 1):
+        output = await acall_llm(
+            system=PROMPT.format(library=config.library),
+            messages=[{"role": "user", "content": design}],
+            config=config,
+            stream=True,
+            stage="build",
+            candidate=0,
+            attempt=attempt,
+        )
+        can_retry = attempt < config.build_retries
+        collector, checker = StreamCollector(incr_p_bar), CodeStreamChecker()
+        broken = False
+        async for token in output:
+            for line in collector.add(token):
+                if checker.feed(line) and can_retry:
+                    broken = True
+                    break
+
+                if not checker.in_code:
+                    continue
+
+                modules = [m for m in scan_imports(line) if m not in seen]
+                if modules:
+                    seen.update(modules)
+                    # A task, so the install starts now rather than when gathered
+                    install = asyncio.to_thread(fix_missing_modules, modules, config)
+                    installs.append(asyncio.create_task(install))
+
+            if broken:
+                await output.aclose()
+                break
+
+        code = collector.finish()
+        if not broken:
+            break
+    code = parse_code(code)
+
+    # Failed installs get retried (one by one) when the script is validated
+    await asyncio.gather(*installs, return_exceptions=True)
+    return Script(code=code)
+
+
+def generate_candidates(
+    design: str, incr_p_bar: Callable[..., None], config: Config
+) -> Script:
+    """
+    Generates `config.candidates` scripts in parallel and validates each one as
+    soon as it finishes streaming. The first one that runs cleanly wins and the
+    rest are cancelled. If none run cleanly, the first to finish is returned.
+    """
+
+    cancelled = threading.Event()
+
+    def _generate_and_validate(candidate: int) -> Optional[Script]:
+        script = generate_script(design, incr_p_bar, config, cancelled, candidate)
+        if script and not cancelled.is_set():
+            run_tui(script, config=config)
+
+        return script
+
+    executor = ThreadPoolExecutor(max_workers=config.candidates)
+    futures = [
+        # Each thread inherits the caller's context (e.g. the open trace span)
+        executor.submit(
+            contextvars.copy_context().run, _generate_and_validate, candidate
+        )
+        for candidate in range(config.candidates)
+    ]
+
+    winner, fallback, error = None, None, None
+    try:
+        for future in as_completed(futures):
+            try:
+                script = future.result()
+            except Exception as e:
+                error = error or e
+                continue
+
+            if not script:
+                continue
+
+            fallback = fallback or script
+            if not script.stderr:
+                winner = script
+                break
+    finally:
+        cancelled.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    if not fallback:
+        raise error
+
+    return winner or fallback
+
+
 ######
 # MAIN
 ######
 
 
+@traced("build_tui")
 def build_tui(design: str, p_bar: Progress, config: Config) -> Script:
     task = p_bar.add_task("build", total=PROGRESS_LIMIT)
 
-    output = call_llm(
-        system=PROMPT.format(library=config.library),
-        messages=[{"role": "user", "content": design}],
-        stream=True,
-    )
-    code = ""
-    for token in output:
-        code += token
-        p_bar.update(task, advance=1)
-    code = parse_code(code)
-    script = Script(code=code)
+    if config.candidates > 1:
+        incr_p_bar = track_progress(p_bar, task, scale=1 / config.candidates)
+        script = generate_candidates(design, incr_p_bar, config)
+    else:
+        incr_p_bar = track_progress(p_bar, task)
+        script = generate_script(design, incr_p_bar, config)
+
+    p_bar.update(task, completed=PROGRESS_LIMIT)
+    return script
+
+
+@traced("build_tui")
+async def abuild_tui(design: str, p_bar: Progress, config: Config) -> Script:
+    task = p_bar.add_task("build", total=PROGRESS_LIMIT)
+
+    if config.candidates > 1:
+        incr_p_bar = track_progress(p_bar, task, scale=1 / config.candidates)
+        script = await asyncio.to_thread(generate_candidates, design, incr_p_bar, config)
+    else:
+        incr_p_bar = track_progress(p_bar, task)
+        script = await agenerate_script(design, incr_p_bar, config)
 
     p_bar.update(task, completed=PROGRESS_LIMIT)
     return script
@@ -4,10 +4,24 @@ from rich.progress import Progress
 # Local
 try:
     from termite.dtos import Config
-    from termite.shared import call_llm, MAX_TOKENS
+    from termite.shared import (
+        call_llm,
+        acall_llm,
+        MAX_TOKENS,
+        StreamCollector,
+        track_progress,
+    )
+    from termite.shared.utils import traced
 except ImportError:
     from dtos import Config
-    from shared import call_llm, MAX_TOKENS
+    from shared import (
+        call_llm,
+        acall_llm,
+        MAX_TOKENS,
+        StreamCollector,
+        track_progress,
+    )
+    from shared.utils import traced
 
 
 #########
@@ -66,23 +80,52 @@ Remember, your design should satisfy the user's request while maintaining EXTREM
 # TODO: Make a better <example>
 
 
+def format_design(prompt: str, design: str) -> str:
+    return f"# Design Document\n\n<user_request>\n{prompt}\n</user_request>\n\n<details>\n{design}\n</details>"
+
+
 ######
 # MAIN
 ######
 
 
+@traced("design_tui")
 def design_tui(prompt: str, p_bar: Progress, config: Config) -> str:
     task = p_bar.add_task("design", total=PROGRESS_LIMIT)
 
     messages = [{"role": "user", "content": prompt}]
-    output = call_llm(PROMPT.format(library=config.library), messages, stream=True)
+    output = call_llm(
+        PROMPT.format(library=config.library),
+        messages,
+        config=config,
+        stream=True,
+        stage="design",
+    )
+
+    design = StreamCollector(track_progress(p_bar, task)).collect(output)
+
+    design = format_design(prompt, design)
+    p_bar.update(task, completed=PROGRESS_LIMIT)
+
+    return design
+
+
+@traced("design_tui")
+async def adesign_tui(prompt: str, p_bar: Progress, config: Config) -> str:
+    task = p_bar.add_task("design", total=PROGRESS_LIMIT)
+
+    messages = [{"role": "user", "content": prompt}]
+    output = await acall_llm(
+        PROMPT.format(library=config.library),
+        messages,
+        config=config,
+        stream=True,
+        stage="design",
+    )
 
-    design = ""
-    for token in output:
-        design += token
-        p_bar.update(task, advance=1)
+    design = await StreamCollector(track_progress(p_bar, task)).acollect(output)
 
-    design = f"# Design Document\n\n<user_request>\n{prompt}\n</user_request>\n\n<details>\n{design}\n</details>"
+    design = format_design(prompt, design)
     p_bar.update(task, completed=PROGRESS_LIMIT)
 
     return design
@@ -1,14 +1,43 @@
+# Standard library
+import re
+import ast
+import time
+import hashlib
+import contextvars
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+
 # Third party
 from rich.progress import Progress
 
 # Local
 
 try:
-    from termite.dtos import Script, Config
-    from termite.shared import run_tui, call_llm, MAX_TOKENS
+    from termite.dtos import Script, Config, FixStep, FixReport
+    from termite.shared import run_tui, call_llm, MAX_TOKENS, StreamCollector
+    from termite.shared.utils import (
+        count_tokens,
+        fix_missing_modules,
+        scan_imports,
+        span,
+        start_span,
+        traced,
+    )
+    from termite.shared.utils.edits import parse_edits, apply_edits
+    from termite.tools.build_tui import generate_script
 except ImportError:
-    from dtos import Script, Config
-    from shared import run_tui, call_llm, MAX_TOKENS
+    from dtos import Script, Config, FixStep, FixReport
+    from shared import run_tui, call_llm, MAX_TOKENS, StreamCollector
+    from shared.utils import (
+        count_tokens,
+        fix_missing_modules,
+        scan_imports,
+        span,
+        start_span,
+        traced,
+    )
+    from shared.utils.edits import parse_edits, apply_edits
+    from tools.build_tui import generate_script
 
 
 #########
@@ -31,6 +60,29 @@ Before providing the fixed Python script, think through the debugging process us
 </debugging_process>
 
 Respond with the complete, fixed Python script without any explanations or markdown formatting."""
+EDIT_PROMPT = """You are an expert Python programmer tasked with fixing a terminal user interface (TUI) implementation.
+Your goal is to analyze and debug a broken Python script, then make the smallest edits that make the TUI work without errors.
+
+You MUST follow these rules at all times:
+- Fix the issues that are causing the error. Do NOT rewrite parts of the script that are unrelated to the error.
+- Ensure that the TUI continues to adhere to the original TUI design document.
+- Do NOT use any try/except blocks. All exceptions must ALWAYS be raised.
+- Continue using the {library} library. Do NOT use any other TUI libraries.
+
+Respond ONLY with one or more edits in this format, without any explanations or markdown formatting:
+
+<<<<<<< SEARCH
+lines copied exactly from the current script
+=======
+the lines that should replace them
+>>>>>>> REPLACE
+
+Each SEARCH block must match a contiguous chunk of the current script exactly, including indentation. Include just enough lines to make each SEARCH block unique."""
+
+
+ESCALATED_TEMPERATURE = 1.0
+MAX_SAME_ERROR = 2  # Fixes in a row that hit the same error before escalating
+MAX_SKIP = 40  # Old lines a fix can drop before its output counts as new code
 
 
 def parse_code(output: str) -> str:
@@ -46,45 +98,331 @@ def parse_code(output: str) -> str:
     return code
 
 
+def get_messages(script: Script, design: str) -> List[Dict[str, str]]:
+    return [
+        {"role": "user", "content": design},
+        {"role": "assistant", "content": script.code},
+        {
+            "role": "user",
+            "content": f"<error>\n{script.stderr}\n</error>\n\nFix the error above. Remember: do NOT suppress exceptions.",
+        },
+    ]
+
+
+def get_strategies(config: Config) -> List[Tuple[str, Optional[float]]]:
+    # Each rung is tried until the loop stops making progress, then the next
+    strategies = [("rewrite", None), ("rewrite", ESCALATED_TEMPERATURE)]
+    if config.fix_mode == "edit":
+        strategies.insert(0, ("edit", None))
+
+    return strategies + [("regenerate", None)]
+
+
+def normalize_error(stderr: str) -> str:
+    """
+    Reduces an error to what identifies it: the exception and the functions in
+    its traceback, without file paths, line numbers, source lines or addresses.
+    """
+
+    lines = []
+    for line in stderr.strip().split("\n"):
+        if line.startswith("Crashed after pressing "):
+            continue  # Added by run_tui when a keystroke crashed the TUI
+        elif line.startswith("  File "):
+            line = re.sub(r'File "[^"]*"', "File", line)
+            line = re.sub(r", line \d+", "", line)
+        elif line[:1].isspace():
+            continue  # Source lines and ^^^ markers
+
+        line = re.sub(r"\S*tmp\w+\.py", "<script>", line)
+        line = re.sub(r"0x[0-9a-fA-F]+", "0x?", line)
+        line = re.sub(r"\bline \d+", "line ?", line)
+        if line.strip():
+            lines.append(line.strip())
+
+    return "\n".join(lines)
+
+
+def parses(code: str) -> bool:
+    try:
+        ast.parse(code)
+    except SyntaxError:
+        return False
+
+    return True
+
+
+def get_hash(text: str) -> str:
+    return hashlib.sha1(text.encode()).hexdigest()[:12]
+
+
+def get_code_hash(code: str) -> str:
+    lines = [line.rstrip() for line in code.strip().split("\n")]
+    return get_hash("\n".join(line for line in lines if line))
+
+
+def get_outcome(step: FixStep, error_hash: str, code_hash: str, seen: set) -> str:
+    if code_hash == step.code_hash:
+        return "no_op"
+
+    if code_hash in seen:
+        return "cycle"  # Back to a script that's already been tried
+
+    return "same_error" if error_hash == step.error_hash else "new_error"
+
+
+class DivergenceTracker:
+    """
+    Lines up a fix's output with the script being fixed while it streams. Lines
+    that aren't in the old script are new code, and any imports they add are
+    installed right away, so the fixed script can be run as soon as the stream
+    closes.
+    """
+
+    def __init__(self, code: str, config: Config):
+        self.config = config
+        self.lines = [line.strip() for line in code.split("\n") if line.strip()]
+        self.positions: Dict[str, List[int]] = {}
+        for index, line in enumerate(self.lines):
+            self.positions.setdefault(line, []).append(index)
+
+        self.pos = 0  # Next line of the old script we expect to see
+        self.matched, self.new = 0, 0
+        self.diverged_at = None  # First line of output that wasn't in the old script
+        self.seen = set(scan_imports(code))
+        self.executor = ThreadPoolExecutor(max_workers=1)  # pip runs one at a time
+        self.futures = []
+        self.span = start_span("speculate", "tool")
+
+    @property
+    def coverage(self) -> float:
+        return self.pos / len(self.lines) if self.lines else 1.0
+
+    def _submit(self, fn: Callable, *args):
+        # Runs in the caller's context, so installs show up under the fix's span
+        context = contextvars.copy_context()
+        self.futures.append(self.executor.submit(context.run, fn, *args))
+
+    def _align(self, line: str) -> bool:
+        if self.pos < len(self.lines) and self.lines[self.pos] == line:
+            self.pos += 1
+            return True
+
+        # The fix may have dropped some old lines, so look a little further ahead
+        for index in self.positions.get(line, []):
+            if self.pos < index <= self.pos + MAX_SKIP:
+                self.pos = index + 1
+                return True
+
+        return False
+
+    def feed(self, line: str):
+        line = line.strip()
+        if not line or line.startswith("```"):
+            return
+
+        if self._align(line):
+            self.matched += 1
+        else:
+            self.new += 1
+            self.diverged_at = self.diverged_at or self.matched + self.new
+
+            modules = [m for m in scan_imports(line) if m not in self.seen]
+            if modules:
+                self.seen.update(modules)
+                self._submit(fix_missing_modules, modules, self.config)
+
+    def close(self):
+        for future in self.futures:
+            try:
+                future.result()
+            except Exception:
+                pass  # Failed installs get retried (one by one) during validation
+
+        self.executor.shutdown()
+        self.span.set(
+            matched=self.matched,
+            new_lines=self.new,
+            diverged_at=self.diverged_at,
+            coverage=round(self.coverage, 2),
+        )
+        self.span.finish()
+
+
+def collect_fix(
+    output: Iterable[str], script: Script, incr_p_bar: callable, config: Config
+) -> str:
+    collector = StreamCollector(incr_p_bar)
+    if not config.speculate:
+        return collector.collect(output)
+
+    tracker = DivergenceTracker(script.code, config)
+    try:
+        for token in output:
+            for line in collector.add(token):
+                tracker.feed(line)
+
+        text = collector.finish()
+        tracker.feed(text.rsplit("\n", 1)[-1])  # The last line has no newline
+    finally:
+        tracker.close()
+
+    return text
+
+
+def rewrite_script(
+    script: Script, design: str, incr_p_bar: callable, config: Config, **kwargs
+) -> str:
+    output = call_llm(
+        system=PROMPT.format(library=config.library),
+        messages=get_messages(script, design),
+        config=config,
+        stream=True,
+        stage="fix",
+        prediction={"type": "content", "content": script.code},
+        **kwargs,
+    )
+    return parse_code(collect_fix(output, script, incr_p_bar, config))
+
+
+def edit_script(
+    script: Script, design: str, incr_p_bar: callable, config: Config, **kwargs
+) -> Tuple[Optional[str], str]:
+    """
+    Asks for SEARCH/REPLACE edits and applies them to the script. Returns the
+    patched code (or None if the edits couldn't be applied) and the raw output.
+    """
+
+    output = call_llm(
+        system=EDIT_PROMPT.format(library=config.library),
+        messages=get_messages(script, design),
+        config=config,
+        stream=True,
+        stage="fix",
+        **kwargs,
+    )
+    output = collect_fix(output, script, incr_p_bar, config)
+
+    edits = parse_edits(output)
+    if not edits:
+        return None, output
+
+    try:
+        code = apply_edits(script.code, edits)
+    except ValueError:
+        return None, output
+
+    # Edits can apply cleanly and still break the script (e.g. mixed indentation)
+    if not parses(code) and parses(script.code):
+        return None, output
+
+    return code, output
+
+
+def apply_fix(
+    script: Script,
+    design: str,
+    strategy: str,
+    attempt: int,
+    incr_p_bar: callable,
+    config: Config,
+    **kwargs,
+) -> Script:
+    tokens_saved = script.tokens_saved
+    code = None
+    if strategy == "regenerate":
+        # Start over from the design, as a candidate build_tui didn't try
+        candidate = config.candidates + attempt
+        code = generate_script(design, incr_p_bar, config, candidate=candidate).code
+    elif strategy == "edit":
+        code, output = edit_script(script, design, incr_p_bar, config, **kwargs)
+        if code is not None:
+            tokens_saved += count_tokens(code) - count_tokens(output)
+        else:
+            tokens_saved -= count_tokens(output)  # Wasted on a failed edit
+
+    if code is None:
+        code = rewrite_script(script, design, incr_p_bar, config, **kwargs)
+
+    return Script(code=code, tokens_saved=tokens_saved)
+
+
 ######
 # MAIN
 ######
 
 
+@traced("fix_errors")
 def fix_errors(
     script: Script, design: str, incr_p_bar: callable, config: Config
 ) -> Script:
+    """
+    Validates and fixes the script until it runs cleanly. If fixes stop making
+    progress (the same error keeps coming back, a fix changes nothing, or the
+    script cycles back to an earlier version), escalates to a hotter or
+    different strategy, and stops early once every strategy is exhausted. How
+    the loop went is recorded in the returned script's `fix_report`.
+    """
+
+    strategies = get_strategies(config)
+    report = FixReport()
+    level, same_errors, seen = 0, 0, set()
+
     num_retries = 0
     curr_script = script
     while num_retries < config.fix_iters:
-        run_tui(curr_script)
+        if curr_script.stderr is None:  # Candidates from build_tui are pre-validated
+            run_tui(curr_script, config=config)
 
         if not curr_script.stderr:
-            return curr_script
-
-        messages = [
-            {"role": "user", "content": design},
-            {"role": "assistant", "content": curr_script.code},
-            {
-                "role": "user",
-                "content": f"<error>\n{curr_script.stderr}\n</error>\n\nFix the error above. Remember: do NOT suppress exceptions.",
-            },
-        ]
-        output = call_llm(
-            system=PROMPT.format(library="urwid"),
-            messages=messages,
-            stream=True,
-            prediction={"type": "content", "content": curr_script.code},
+            if report.steps:
+                report.steps[-1].outcome = "fixed"
+            report.stop_reason = "fixed"
+            break
+
+        error_hash = get_hash(normalize_error(curr_script.stderr))
+        code_hash = get_code_hash(curr_script.code)
+        if report.steps:
+            step = report.steps[-1]
+            step.outcome = get_outcome(step, error_hash, code_hash, seen)
+            same_errors = same_errors + 1 if step.outcome == "same_error" else 0
+            if step.strategy == "regenerate":
+                # Fix the fresh script from the bottom rung, but only regenerate once
+                strategies.pop()
+                level, same_errors = 0, 0
+            elif step.outcome in ("no_op", "cycle") or same_errors >= MAX_SAME_ERROR:
+                level, same_errors = level + 1, 0
+
+        if level >= len(strategies):
+            report.stop_reason = "stuck"
+            break
+
+        seen.add(code_hash)
+        strategy, temperature = strategies[level]
+        kwargs = {"temperature": temperature} if temperature is not None else {}
+        step = FixStep(
+            iteration=num_retries + 1,
+            strategy=strategy,
+            temperature=temperature,
+            error=curr_script.stderr.strip().split("\n")[-1],
+            error_hash=error_hash,
+            code_hash=code_hash,
         )
-        code = ""
-        for token in output:
-            code += token
-            incr_p_bar()
-        code = parse_code(code)
-        curr_script = Script(code=code)
+        report.steps.append(step)
+        start_time = time.monotonic()
+
+        with span("fix attempt", "tool", strategy=strategy, iteration=step.iteration):
+            curr_script = apply_fix(
+                curr_script, design, strategy, num_retries, incr_p_bar, config, **kwargs
+            )
+
+        step.duration = time.monotonic() - start_time
 
         num_retries += 1
+    else:
+        report.stop_reason = "max_iters"
 
+    curr_script.fix_report = report
     return curr_script
 
 
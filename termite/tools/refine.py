@@ -1,5 +1,8 @@
 # Standard library
-from typing import Dict, List, Optional
+import re
+import contextvars
+from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
 
 # Third party
 from rich.progress import Progress
@@ -7,11 +10,13 @@ from rich.progress import Progress
 # Local
 try:
     from termite.dtos import Script, Config
-    from termite.shared import call_llm, MAX_TOKENS
+    from termite.shared import run_tui, call_llm, StreamCollector, track_progress
+    from termite.shared.utils import count_tokens, traced
     from termite.tools.fix_errors import fix_errors
 except ImportError:
     from dtos import Script, Config
-    from shared import call_llm, MAX_TOKENS
+    from shared import run_tui, call_llm, StreamCollector, track_progress
+    from shared.utils import count_tokens, traced
     from tools.fix_errors import fix_errors
 
 
@@ -20,6 +25,7 @@ except ImportError:
 #########
 
 
+MAX_SUMMARY_TOKENS = 300  # Per reflection kept in the refine context
 PROMPT = """You are an expert Python programmer tasked with improving a terminal user interface (TUI).
 Your job is to identify issues with a given TUI implementation and rewrite it to address those issues.
 
@@ -80,31 +86,178 @@ def parse_code(output: str) -> str:
     return output
 
 
+def summarize_reflection(output: str) -> str:
+    # Keeps the first few lines of the model's thoughts (its list of issues)
+    if "<thoughts>" not in output:
+        return ""
+
+    thoughts = output.split("<thoughts>")[1].split("</thoughts>")[0]
+
+    lines, num_tokens = [], 0
+    for line in thoughts.strip().split("\n"):
+        num_tokens += count_tokens(line)
+        if num_tokens > MAX_SUMMARY_TOKENS:
+            break
+
+        if line.strip():
+            lines.append(line.rstrip())
+
+    return "\n".join(lines)
+
+
+def get_messages(
+    script: Script, design: str, reflections: List[str], config: Config
+) -> List[Dict[str, str]]:
+    """
+    Builds the refine prompt from the design, the current best script and as
+    many of the latest reflection summaries as fit in the context budget.
+    """
+
+    screen = ""
+    if script.snapshot:
+        screen = (
+            "This is what your TUI renders on startup:\n\n"
+            f"<screen>\n{script.snapshot}\n</screen>\n\n"
+        )
+
+    budget = config.refine_context_tokens
+    budget -= count_tokens(design) + count_tokens(script.code) + count_tokens(screen)
+
+    notes = []
+    for reflection in reversed(reflections):
+        budget -= count_tokens(reflection)
+        if budget < 0:
+            break
+
+        notes.insert(0, reflection)
+
+    content = f"{screen}Reflect on your implementation and make a better one."
+    if notes:
+        notes = "\n\n".join(f"<reflection>\n{note}\n</reflection>" for note in notes)
+        content = f"Issues you addressed in earlier versions:\n\n{notes}\n\n{content}"
+
+    return [
+        {"role": "user", "content": design},
+        {"role": "assistant", "content": script.code},
+        {"role": "user", "content": content},
+    ]
+
+
+@traced("improve_tui")
 def improve_tui(
-    messages: List[Dict[str, str]],
+    script: Script,
+    design: str,
+    reflections: List[str],
     incr_p_bar: callable,
     config: Config,
-) -> Script:
-    messages.append(
-        {
-            "role": "user",
-            "content": "Reflect on your implementation and make a better one.",
-        }
-    )
+    branch: int = 0,
+) -> Tuple[Script, List[str]]:
     output_iter = call_llm(
         system=PROMPT.format(library=config.library),
-        messages=messages,
+        messages=get_messages(script, design, reflections, config),
+        config=config,
         stream=True,
+        stage="refine",
+        candidate=branch,  # Keeps parallel branches distinct in the cache
     )
-    output = ""
-    for token in output_iter:
-        output += token
-        incr_p_bar()
-
-    messages.append({"role": "assistant", "content": output})
+    output = StreamCollector(incr_p_bar).collect(output_iter)
     code = parse_code(output)
 
-    return Script(code=code)
+    return Script(code=code), reflections + [summarize_reflection(output)]
+
+
+def get_design_terms(design: str) -> List[str]:
+    # Quoted keys/labels (e.g. 'q' to quit) and named components (e.g. "- Header:")
+    terms = re.findall(r"'([^'\n]{1,30})'", design)
+    terms += re.findall(r"^[ \t]+[-•*][ \t]*([\w ]{3,30}):", design, re.MULTILINE)
+    return sorted({term.strip().lower() for term in terms if term.strip()})
+
+
+def has_term(term: str, haystack: str) -> bool:
+    if len(term) <= 2:  # Keys like 'q' only count as string literals
+        return f"'{term}'" in haystack or f'"{term}"' in haystack
+
+    return term in haystack
+
+
+def score_script(
+    script: Script, design: str, config: Config
+) -> Tuple[bool, float, int]:
+    """
+    Ranks a refined script by whether it runs cleanly, how much of the design
+    shows up in its code and rendered output, and how much it renders.
+    """
+
+    if script.stderr is None:
+        run_tui(script, config=config)
+
+    screen = script.snapshot or script.stdout or ""
+    terms = get_design_terms(design)
+    haystack = f"{script.code}\n{screen}".lower()
+    coverage = sum(has_term(t, haystack) for t in terms) / len(terms) if terms else 1.0
+    rendered = len([line for line in screen.split("\n") if line.strip()])
+
+    return not script.stderr, coverage, rendered
+
+
+def run_branch(
+    script: Script,
+    design: str,
+    reflections: List[str],
+    incr_p_bar: callable,
+    config: Config,
+    branch: int,
+) -> Tuple[Script, List[str]]:
+    script, reflections = improve_tui(
+        script, design, reflections, incr_p_bar, config, branch
+    )
+    script = fix_errors(script, design, incr_p_bar, config)
+    if script.stderr is None:  # The fix loop ran out of iterations
+        run_tui(script, config=config)
+
+    return script, reflections
+
+
+def refine_branches(
+    script: Script,
+    design: str,
+    reflections: List[str],
+    incr_p_bar: callable,
+    config: Config,
+) -> Tuple[Script, List[str]]:
+    """
+    Improves and fixes `config.refine_branches` variants of the script in
+    parallel, then keeps whichever scores best. The original is only kept if
+    every variant scores worse than it.
+    """
+
+    with ThreadPoolExecutor(max_workers=config.refine_branches) as executor:
+        futures = [
+            executor.submit(
+                contextvars.copy_context().run,
+                run_branch,
+                script,
+                design,
+                reflections,
+                incr_p_bar,
+                config,
+                branch,
+            )
+            for branch in range(config.refine_branches)
+        ]
+
+    results, error = [], None
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            error = error or e
+
+    if not results:
+        raise error
+
+    results.append((script, reflections))  # Ties go to the variants
+    return max(results, key=lambda result: score_script(result[0], design, config))
 
 
 ######
@@ -112,22 +265,29 @@ def improve_tui(
 ######
 
 
+@traced("refine")
 def refine(script: Script, design: str, p_bar: Progress, config: Config) -> Script:
+    # Each iteration rewrites the script once, plus up to `fix_iters` fixes
     progress_limit = config.refine_iters * (
-        (MAX_TOKENS // 15) + (config.fix_iters * (MAX_TOKENS // 15))
+        count_tokens(script.code) * (1 + config.fix_iters)
     )
     task = p_bar.add_task("refine", total=progress_limit)
 
     num_iters = 0
     curr_script = script
-    messages = [
-        {"role": "user", "content": design},
-        {"role": "assistant", "content": script.code},
-    ]
+    reflections = []
     while num_iters < config.refine_iters:
-        incr_p_bar = lambda: p_bar.update(task, advance=1)
-        curr_script = improve_tui(messages, incr_p_bar, config)
-        curr_script = fix_errors(curr_script, design, incr_p_bar, config)
+        if config.refine_branches > 1:
+            incr_p_bar = track_progress(p_bar, task, scale=1 / config.refine_branches)
+            curr_script, reflections = refine_branches(
+                curr_script, design, reflections, incr_p_bar, config
+            )
+        else:
+            incr_p_bar = track_progress(p_bar, task)
+            curr_script, reflections = improve_tui(
+                curr_script, design, reflections, incr_p_bar, config
+            )
+            curr_script = fix_errors(curr_script, design, incr_p_bar, config)
 
         num_iters += 1
 
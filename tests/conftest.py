@@ -0,0 +1,33 @@
+# Third party
+import pytest
+
+# Local
+from tests.helpers import FakeServer, call_llm_module, rate_limiter_module
+
+
+######
+# MAIN
+######
+
+
+@pytest.fixture
+def fake_server():
+    server = FakeServer()
+    yield server
+    server.close()
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    """
+    Keeps tests away from the real ~/.termite and API keys, and from clients
+    and rate limiters left over by other tests.
+    """
+
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.delenv("XDG_CONFIG_HOME", raising=False)
+    for name in ("OPENAI_API_KEY", "ANTHROPIC_API_KEY", "OLLAMA_MODEL"):
+        monkeypatch.delenv(name, raising=False)
+
+    monkeypatch.setattr(call_llm_module, "_clients", {})
+    monkeypatch.setattr(rate_limiter_module, "_limiters", {})
@@ -0,0 +1,112 @@
+# Standard library
+import json
+import time
+import socket
+import importlib
+import threading
+from typing import Callable, Dict, List, Optional
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# The package __init__s re-export functions under their modules' names
+call_llm_module = importlib.import_module("termite.shared.call_llm")
+rate_limiter_module = importlib.import_module("termite.shared.utils.rate_limiter")
+
+Respond = Callable[[BaseHTTPRequestHandler, Dict], None]
+
+
+class FakeServer:
+    """
+    A local HTTP server that plays back scripted responses, one per request
+    (the last one repeats), and records what it was sent and when.
+    """
+
+    def __init__(self):
+        self.responses: List[Respond] = []
+        self.requests: List[Dict] = []
+        self.times: List[float] = []
+        self.connections: List[int] = []  # Client port of each request
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                server.requests.append(json.loads(body))
+                server.times.append(time.monotonic())
+                server.connections.append(self.client_address[1])
+                index = min(len(server.requests), len(server.responses)) - 1
+                server.responses[index](self, server.requests[-1])
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.thread = threading.Thread(
+            target=self.httpd.serve_forever, args=(0.05,), daemon=True
+        )
+        self.thread.start()
+
+    @property
+    def gaps(self) -> List[float]:
+        return [after - before for before, after in zip(self.times, self.times[1:])]
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def send_body(
+    handler: BaseHTTPRequestHandler,
+    status: int,
+    body: bytes,
+    headers: Optional[Dict[str, str]] = None,
+):
+    handler.send_response(status)
+    handler.send_header("Content-Type", "application/json")
+    handler.send_header("Content-Length", str(len(body)))
+    for name, value in (headers or {}).items():
+        handler.send_header(name, value)
+    handler.end_headers()
+    handler.wfile.write(body)
+
+
+def send_chunks(
+    handler: BaseHTTPRequestHandler,
+    content_type: str,
+    chunks: List[bytes],
+    delay: float = 0.0,
+    complete: bool = True,
+):
+    # Chunked, so the client can tell a finished stream from a dropped one
+    handler.send_response(200)
+    handler.send_header("Content-Type", content_type)
+    handler.send_header("Transfer-Encoding", "chunked")
+    handler.end_headers()
+    try:
+        for chunk in chunks:
+            handler.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            handler.wfile.flush()
+            time.sleep(delay)
+
+        if complete:
+            handler.wfile.write(b"0\r\n\r\n")
+        else:
+            handler.close_connection = True
+    except (BrokenPipeError, ConnectionResetError):
+        handler.close_connection = True  # The client closed the stream early
+
+
+def error(status: int, headers: Optional[Dict[str, str]] = None) -> Respond:
+    def respond(handler: BaseHTTPRequestHandler, body: Dict):
+        payload = {"error": {"message": "Try again later", "type": "rate_limit"}}
+        send_body(handler, status, json.dumps(payload).encode(), headers)
+
+    return respond
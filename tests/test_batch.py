@@ -0,0 +1,100 @@
+# Standard library
+import sys
+import asyncio
+import argparse
+import importlib
+import subprocess
+from pathlib import Path
+
+# Third party
+import pytest
+
+# Local
+from termite.dtos import Script, Config
+
+
+#########
+# HELPERS
+#########
+
+
+batch_module = importlib.import_module("termite.batch")
+main_module = importlib.import_module("termite.__main__")
+
+REPO_DIR = Path(__file__).resolve().parents[1]
+
+
+async def fake_atermite(prompt: str, config: Config) -> Script:
+    if prompt == "crash":
+        raise RuntimeError("Pipeline failed")
+
+    return Script(code=f"print({prompt!r})", stderr="")
+
+
+######
+# MAIN
+######
+
+
+def test_failing_callback_only_fails_its_own_job(monkeypatch):
+    monkeypatch.setattr(batch_module, "atermite", fake_atermite)
+    jobs = [
+        {"name": "a", "prompt": "a"},
+        {"name": "b/c", "prompt": "b"},
+        {"name": "d", "prompt": "crash"},
+    ]
+
+    def on_done(result, script):
+        if "/" in result.name:
+            raise FileNotFoundError(f"Can't save {result.name}")
+
+    results = batch_module.batch(jobs, Config(), 2, on_done)
+
+    assert [result.success for result in results] == [True, False, False]
+    assert "Can't save b/c" in results[1].error
+    assert "Pipeline failed" in results[2].error
+
+
+def test_batch_command_is_detected():
+    def is_batch(*prompt):
+        return main_module.is_batch(argparse.Namespace(prompt=list(prompt)))
+
+    assert is_batch("batch", "missing.jsonl")
+    assert not is_batch("batch renamer")  # Quoted
+    assert not is_batch("batch", "rename", "files")
+
+
+def test_missing_batch_file_is_an_error(tmp_path):
+    # Rather than a TUI generated from the prompt "batch missing.jsonl"
+    result = subprocess.run(
+        [sys.executable, "-m", "termite", "batch", str(tmp_path / "missing.jsonl")],
+        cwd=REPO_DIR,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert result.returncode == 1
+    assert "No prompt file found" in result.stdout
+
+
+def test_malformed_line_names_its_line(tmp_path):
+    path = tmp_path / "jobs.jsonl"
+    path.write_text('"Say hello"\n\n{"prompt": "Say bye",}\n')
+
+    with pytest.raises(ValueError, match=r"Line 3 of .*jobs\.jsonl is not valid JSON"):
+        batch_module.load_jobs(str(path))
+
+
+def test_abatch_shuts_down_its_executor(monkeypatch):
+    monkeypatch.setattr(batch_module, "atermite", fake_atermite)
+    jobs = [{"name": "a", "prompt": "a"}]
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(
+            batch_module.abatch(jobs, Config(), 1, lambda *_: None)
+        )
+        executor = loop._default_executor  # Closing the loop would shut it down
+        assert executor._shutdown
+    finally:
+        loop.close()
@@ -0,0 +1,99 @@
+# Local
+from termite.tools.build_tui import CodeStreamChecker
+
+
+#########
+# HELPERS
+#########
+
+
+def feed_code(code: str) -> CodeStreamChecker:
+    checker = CodeStreamChecker()
+    for line in ["```python\n", *code.splitlines(keepends=True)]:
+        if checker.feed(line):
+            break
+
+    return checker
+
+
+######
+# MAIN
+######
+
+
+def test_multiline_decorator_stays_with_its_def():
+    checker = feed_code(
+        "from textual import on\n"
+        "\n"
+        "@on(\n"
+        "    Button.Pressed,\n"
+        '    "#quit",\n'
+        ")\n"
+        "def quit(self):\n"
+        "    pass\n"
+        "\n"
+        "x = 1\n"
+    )
+    assert checker.error is None
+
+
+def test_stacked_decorators_with_comments_stay_with_their_def():
+    checker = feed_code(
+        "@first\n"
+        "# A comment between the decorators\n"
+        "@second(\n"
+        "    1,\n"
+        ")\n"
+        "# And one before the def\n"
+        "async def handler():\n"
+        "    pass\n"
+        "\n"
+        "class App:\n"
+        "    pass\n"
+        "\n"
+        "y = 2\n"
+    )
+    assert checker.error is None
+
+
+def test_open_triple_quoted_string_isnt_an_error():
+    checker = feed_code('CSS = """\nScreen {\n\nlayout: grid;\n}\n"""\nx = 1\n')
+    assert checker.error is None
+
+
+def test_broken_statement_is_caught_while_streaming():
+    checker = feed_code("x = = 1\ny = 2\n")
+    assert checker.error
+
+
+def test_except_star_continues_its_try():
+    checker = feed_code(
+        "try:\n"
+        "    run()\n"
+        "except* ValueError:\n"
+        "    pass\n"
+        "except*(KeyError, TypeError):\n"
+        "    pass\n"
+        "else:\n"
+        "    pass\n"
+        "\n"
+        "x = 1\n"
+    )
+    assert checker.error is None
+
+
+def test_match_statement_stays_whole():
+    checker = feed_code(
+        "match key:\n"
+        '    case "q":\n'
+        "    # A comment between the cases\n"
+        "        quit()\n"
+        "\n"
+        '    case "r" | "R":\n'
+        "        refresh()\n"
+        "    case _:\n"
+        "        pass\n"
+        "\n"
+        "x = 1\n"
+    )
+    assert checker.error is None
@@ -0,0 +1,70 @@
+# Standard library
+import os
+import sys
+import importlib
+
+# Third party
+import pytest
+
+
+#########
+# HELPERS
+#########
+
+
+bytecode_module = importlib.import_module("termite.shared.utils.bytecode")
+
+
+@pytest.fixture
+def script_path(tmp_path):
+    path = tmp_path / "tool.py"
+    path.write_text("print('Hello')\n")
+    return str(path)
+
+
+def write_venv_config(tmp_path, version: str):
+    termite_home = tmp_path / ".termite"  # HOME is tmp_path
+    termite_home.mkdir(exist_ok=True)
+    (termite_home / "pyvenv.cfg").write_text(
+        f"home = /usr/bin\ninclude-system-site-packages = false\nversion = {version}\n"
+    )
+
+
+######
+# MAIN
+######
+
+
+def test_bytecode_is_used_when_the_venv_matches(tmp_path, script_path):
+    major, minor, micro = sys.version_info[:3]
+    write_venv_config(tmp_path, f"{major}.{minor}.{micro}")
+
+    runnable_path = bytecode_module.get_runnable_path(script_path)
+
+    assert runnable_path.endswith(".pyc")
+    assert os.path.exists(runnable_path)
+
+
+@pytest.mark.parametrize("version", [None, "2.7.18", "3.0.1"])
+def test_script_is_used_when_the_venv_doesnt_match(tmp_path, script_path, version):
+    if version:
+        write_venv_config(tmp_path, version)
+
+    assert bytecode_module.get_runnable_path(script_path) == script_path
+
+
+def test_stale_bytecode_is_recompiled(tmp_path, script_path):
+    major, minor = sys.version_info[:2]
+    write_venv_config(tmp_path, f"{major}.{minor}.0")
+    bytecode_path = bytecode_module.compile_script(script_path)
+    os.utime(bytecode_path, (0, 0))  # Older than the script
+
+    assert bytecode_module.get_runnable_path(script_path) == bytecode_path
+    assert os.path.getmtime(bytecode_path) >= os.path.getmtime(script_path)
+
+
+def test_broken_script_isnt_compiled(tmp_path):
+    path = tmp_path / "broken.py"
+    path.write_text("def broken(:\n")
+
+    assert bytecode_module.compile_script(str(path)) is None
@@ -0,0 +1,96 @@
+# Standard library
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+# Third party
+import pytest
+
+# Local
+from termite.dtos import Config
+from tests.helpers import call_llm_module, send_body
+
+
+#########
+# HELPERS
+#########
+
+
+MESSAGES = [{"role": "user", "content": "Hi"}]
+
+
+def completion(handler, body):
+    payload = {
+        "id": "chatcmpl-1",
+        "object": "chat.completion",
+        "created": 0,
+        "model": body["model"],
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": "Hello"},
+                "finish_reason": "stop",
+            }
+        ],
+    }
+    send_body(handler, 200, json.dumps(payload).encode())
+
+
+@pytest.fixture
+def api_keys(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test")
+
+
+######
+# MAIN
+######
+
+
+@pytest.mark.parametrize("provider", ["openai", "anthropic", "ollama"])
+def test_one_client_is_shared_across_threads(api_keys, provider):
+    config = Config()
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        futures = [
+            executor.submit(call_llm_module.get_client, provider, config)
+            for _ in range(32)
+        ]
+        clients = [future.result() for future in futures]
+
+    assert len({id(client) for client in clients}) == 1
+
+
+@pytest.mark.parametrize("provider", ["openai", "anthropic", "ollama"])
+def test_pool_size_and_timeout_reach_httpx(api_keys, provider):
+    config = Config(llm_pool_size=3, llm_timeout=12.0)
+    client = call_llm_module.get_client(provider, config)._client
+
+    pool = client._transport._pool
+    assert pool._max_connections == 3
+    assert pool._max_keepalive_connections == 3
+    assert client.timeout.read == 12.0
+    assert client.timeout.connect == 12.0
+
+
+def test_calls_reuse_one_connection(api_keys, fake_server, monkeypatch):
+    monkeypatch.setenv("OPENAI_BASE_URL", f"{fake_server.url}/v1")
+    fake_server.responses = [completion]
+
+    config = Config(use_cache=False)
+    for _ in range(5):
+        assert call_llm_module.call_llm("System", MESSAGES, config) == "Hello"
+
+    assert len(fake_server.requests) == 5
+    assert len(set(fake_server.connections)) == 1  # Kept alive between calls
+
+
+def test_prediction_reaches_openai(api_keys, fake_server, monkeypatch):
+    monkeypatch.setenv("OPENAI_BASE_URL", f"{fake_server.url}/v1")
+    fake_server.responses = [completion]
+
+    prediction = {"type": "content", "content": "print('Hello')"}
+    config = Config(use_cache=False)
+    call_llm_module.call_llm("System", MESSAGES, config, prediction=prediction)
+    call_llm_module.call_llm("System", MESSAGES, config)
+
+    assert fake_server.requests[0]["prediction"] == prediction
+    assert "prediction" not in fake_server.requests[1]
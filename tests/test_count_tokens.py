@@ -0,0 +1,60 @@
+# Standard library
+import sys
+import types
+import importlib
+
+# Third party
+import pytest
+
+
+#########
+# HELPERS
+#########
+
+
+count_tokens_module = importlib.import_module("termite.shared.utils.count_tokens")
+
+
+class FakeEncoding:
+    def encode(self, text, disallowed_special):
+        return text.split()
+
+
+@pytest.fixture(autouse=True)
+def fresh_encoding():
+    count_tokens_module.get_encoding.cache_clear()
+    yield
+    count_tokens_module.get_encoding.cache_clear()
+
+
+def fake_tiktoken(get_encoding) -> types.ModuleType:
+    module = types.ModuleType("tiktoken")
+    module.get_encoding = get_encoding
+    return module
+
+
+######
+# MAIN
+######
+
+
+def test_tiktoken_is_used_when_installed(monkeypatch):
+    tiktoken = fake_tiktoken(lambda name: FakeEncoding())
+    monkeypatch.setitem(sys.modules, "tiktoken", tiktoken)
+
+    assert count_tokens_module.count_tokens("one two three") == 3
+
+
+def test_estimate_without_tiktoken(monkeypatch):
+    monkeypatch.setitem(sys.modules, "tiktoken", None)  # Import fails
+
+    assert count_tokens_module.count_tokens("x" * 40) == 10
+
+
+def test_estimate_when_the_encoding_cant_be_downloaded(monkeypatch):
+    def get_encoding(name):
+        raise ConnectionError("No network")
+
+    monkeypatch.setitem(sys.modules, "tiktoken", fake_tiktoken(get_encoding))
+
+    assert count_tokens_module.count_tokens("x" * 40) == 10
@@ -0,0 +1,279 @@
+# Standard library
+import time
+import importlib
+from typing import Dict, List
+
+# Local
+from termite.dtos import Script, Config
+
+
+#########
+# HELPERS
+#########
+
+
+fix_errors_module = importlib.import_module("termite.tools.fix_errors")
+
+SCRIPT = "def f():\n    x = 1\n    return x\n"
+
+
+class FakeFixer:
+    """
+    Stands in for the LLM (each call returns the next script) and for run_tui
+    (each script fails with its error in `errors`, or runs if it has none).
+    """
+
+    def __init__(self, monkeypatch, outputs: List[str], errors: Dict[str, str]):
+        self.outputs, self.errors = list(outputs), errors
+        self.calls: List[dict] = []
+        self.regenerated = 0
+        monkeypatch.setattr(fix_errors_module, "call_llm", self.call_llm)
+        monkeypatch.setattr(fix_errors_module, "run_tui", self.run_tui)
+        monkeypatch.setattr(fix_errors_module, "generate_script", self.generate_script)
+
+    def call_llm(self, **kwargs):
+        self.calls.append(kwargs)
+        return iter([self.outputs.pop(0)])
+
+    def run_tui(self, script: Script, config: Config):
+        script.stderr = self.errors.get(script.code, "")
+
+    def generate_script(self, design, incr_p_bar, config, candidate):
+        self.regenerated += 1
+        return Script(code=self.outputs.pop(0))
+
+    def fix(self, code: str, fix_mode: str = "rewrite", fix_iters: int = 10):
+        config = Config(fix_mode=fix_mode, fix_iters=fix_iters, speculate=False)
+        script = Script(code=code)
+        return fix_errors_module.fix_errors(script, "Design", None, config)
+
+
+def error(name: str, line: int = 3, address: str = "0x7f3a2c") -> str:
+    return (
+        "Traceback (most recent call last):\n"
+        f'  File "/tmp/tmpab12cd.py", line {line}, in main\n'
+        "    draw()\n"
+        f"{name}: <Widget at {address}> failed"
+    )
+
+
+def get_steps(script: Script) -> List[tuple]:
+    return [
+        (step.strategy, step.temperature, step.outcome)
+        for step in script.fix_report.steps
+    ]
+
+
+def edit_with(monkeypatch, output: str, code: str = SCRIPT):
+    monkeypatch.setattr(fix_errors_module, "call_llm", lambda **kwargs: iter([output]))
+    script = Script(code=code, stderr="NameError: name 'y' is not defined")
+    config = Config(speculate=False)
+    return fix_errors_module.edit_script(script, "Design", None, config)
+
+
+######
+# MAIN
+######
+
+
+def test_edit_is_applied(monkeypatch):
+    output = (
+        "<<<<<<< SEARCH\n"
+        "    x = 1\n"
+        "=======\n"
+        "    x = 2\n"
+        ">>>>>>> REPLACE\n"
+    )
+    code, _ = edit_with(monkeypatch, output)
+    assert code == SCRIPT.replace("x = 1", "x = 2")
+
+
+def test_edit_that_breaks_the_syntax_is_rejected(monkeypatch):
+    # Applies (ignoring indentation), but the hunk's own indentation is off
+    output = (
+        "<<<<<<< SEARCH\n"
+        "  x = 1\n"
+        "  return x\n"
+        "=======\n"
+        "  x = 3\n"
+        "    return x\n"
+        ">>>>>>> REPLACE\n"
+    )
+    code, raw_output = edit_with(monkeypatch, output)
+    assert code is None
+    assert raw_output == output
+
+
+def test_edit_of_a_broken_script_is_kept(monkeypatch):
+    # The error being fixed may itself be a syntax error, elsewhere in the script
+    broken = SCRIPT + "print(\n"
+    output = (
+        "<<<<<<< SEARCH\n"
+        "    x = 1\n"
+        "=======\n"
+        "    x = 2\n"
+        ">>>>>>> REPLACE\n"
+    )
+    code, _ = edit_with(monkeypatch, output, broken)
+    assert code == broken.replace("x = 1", "x = 2")
+
+
+def test_error_is_normalized():
+    first = fix_errors_module.normalize_error(error("ValueError", 3, "0x7f3a2c"))
+    second = fix_errors_module.normalize_error(
+        "Crashed after pressing 'q' (keystroke 1 of 1)\n\n"
+        + error("ValueError", 57, "0x10b4e8f").replace("tmpab12cd", "tmpzz99yy")
+    )
+
+    assert first == second
+    assert first == (
+        "Traceback (most recent call last):\n"
+        "File, in main\n"
+        "ValueError: <Widget at 0x?> failed"
+    )
+    assert first != fix_errors_module.normalize_error(error("TypeError"))
+
+
+def test_fixed_on_the_first_try(monkeypatch):
+    fixer = FakeFixer(monkeypatch, ["v1"], {"v0": error("ValueError")})
+    script = fixer.fix("v0")
+
+    assert script.code == "v1"
+    assert script.fix_report.stop_reason == "fixed"
+    assert get_steps(script) == [("rewrite", None, "fixed")]
+
+
+def test_same_error_escalates_the_temperature(monkeypatch):
+    errors = {code: error("ValueError", line) for line, code in enumerate("abcd")}
+    fixer = FakeFixer(monkeypatch, ["b", "c", "d", "fixed"], errors)
+    script = fixer.fix("a")
+
+    # Line numbers differ between the versions, but it's the same error
+    assert get_steps(script) == [
+        ("rewrite", None, "same_error"),
+        ("rewrite", None, "same_error"),
+        ("rewrite", 1.0, "same_error"),
+        ("rewrite", 1.0, "fixed"),
+    ]
+    assert [call.get("temperature") for call in fixer.calls] == [None, None, 1.0, 1.0]
+
+
+def test_new_error_doesnt_escalate(monkeypatch):
+    errors = {"a": error("ValueError"), "b": error("TypeError"), "c": error("KeyError")}
+    fixer = FakeFixer(monkeypatch, ["b", "c", "fixed"], errors)
+    script = fixer.fix("a")
+
+    assert get_steps(script) == [
+        ("rewrite", None, "new_error"),
+        ("rewrite", None, "new_error"),
+        ("rewrite", None, "fixed"),
+    ]
+
+
+def test_no_op_escalates_right_away(monkeypatch):
+    # Only whitespace changes, so it's the same script
+    errors = {"a": error("ValueError"), "a  \n\n": error("ValueError")}
+    fixer = FakeFixer(monkeypatch, ["a  \n\n", "fixed"], errors)
+    script = fixer.fix("a")
+
+    assert get_steps(script) == [("rewrite", None, "no_op"), ("rewrite", 1.0, "fixed")]
+
+
+def test_cycle_escalates_right_away(monkeypatch):
+    errors = {"a": error("ValueError"), "b": error("TypeError")}
+    fixer = FakeFixer(monkeypatch, ["b", "a", "fixed"], errors)
+    script = fixer.fix("a")
+
+    assert get_steps(script) == [
+        ("rewrite", None, "new_error"),
+        ("rewrite", None, "cycle"),
+        ("rewrite", 1.0, "fixed"),
+    ]
+
+
+def test_failed_edit_falls_back_to_a_rewrite(monkeypatch):
+    fixer = FakeFixer(monkeypatch, ["Not an edit", "fixed"], {"a": error("ValueError")})
+    script = fixer.fix("a", fix_mode="edit")
+
+    assert script.code == "fixed"
+    assert get_steps(script) == [("edit", None, "fixed")]
+    assert len(fixer.calls) == 2  # The edit, then the rewrite
+
+
+def test_regenerates_then_starts_over_from_the_bottom(monkeypatch):
+    errors = {"a": error("ValueError"), "fresh": error("KeyError")}
+    outputs = ["a", "a", "fresh", "fixed"]
+    fixer = FakeFixer(monkeypatch, outputs, errors)
+    script = fixer.fix("a")
+
+    assert get_steps(script) == [
+        ("rewrite", None, "no_op"),
+        ("rewrite", 1.0, "no_op"),
+        ("regenerate", None, "new_error"),
+        ("rewrite", None, "fixed"),  # Back to the first rung
+    ]
+    assert fixer.regenerated == 1
+
+
+def test_stops_once_every_strategy_is_exhausted(monkeypatch):
+    errors = {"a": error("ValueError"), "fresh": error("ValueError", 9)}
+    outputs = ["a", "a", "fresh", "fresh", "fresh"]
+    fixer = FakeFixer(monkeypatch, outputs, errors)
+    script = fixer.fix("a")
+
+    assert script.fix_report.stop_reason == "stuck"
+    assert get_steps(script) == [
+        ("rewrite", None, "no_op"),
+        ("rewrite", 1.0, "no_op"),
+        ("regenerate", None, "same_error"),
+        ("rewrite", None, "no_op"),
+        ("rewrite", 1.0, "no_op"),  # Regenerating isn't tried twice
+    ]
+    assert fixer.regenerated == 1
+
+
+def test_stops_at_max_iters(monkeypatch):
+    errors = {code: error(code.upper()) for code in "abc"}
+    fixer = FakeFixer(monkeypatch, ["b", "c"], errors)
+    script = fixer.fix("a", fix_iters=2)
+
+    assert script.fix_report.stop_reason == "max_iters"
+    assert len(script.fix_report.steps) == 2
+
+
+def test_new_imports_are_installed_once_while_streaming(monkeypatch):
+    installs = []
+
+    def fix_missing_modules(modules, config):
+        time.sleep(0.1)
+        installs.append(modules)
+
+    monkeypatch.setattr(fix_errors_module, "fix_missing_modules", fix_missing_modules)
+    old_code = "import os\nimport urwid\n\nprint(os.getcwd())\n"
+    tracker = fix_errors_module.DivergenceTracker(old_code, Config())
+
+    for line in [
+        "import os",
+        "import urwid",
+        "import numpy as np",  # New
+        "from rich.table import Table",  # New
+        "import numpy",  # Already being installed
+        "import os.path",  # Already in the old script
+        "print(os.getcwd(), np, Table)",
+    ]:
+        tracker.feed(line)
+
+    tracker.close()  # Waits for the installs
+
+    assert installs == [["numpy"], ["rich"]]
+    assert tracker.diverged_at == 3
+
+
+def test_failed_speculative_install_doesnt_fail_the_fix(monkeypatch):
+    def fix_missing_modules(modules, config):
+        raise ImportError("No matching distribution found")
+
+    monkeypatch.setattr(fix_errors_module, "fix_missing_modules", fix_missing_modules)
+    tracker = fix_errors_module.DivergenceTracker("print('Hi')\n", Config())
+    tracker.feed("import numpy")
+    tracker.close()
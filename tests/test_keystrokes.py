@@ -0,0 +1,60 @@
+# Standard library
+import sys
+from subprocess import Popen, PIPE
+
+# Local
+from termite.shared.run_tui import watch_process
+from termite.shared.utils.keystrokes import get_design_keys
+
+
+#########
+# HELPERS
+#########
+
+
+DESIGN = """- Layout: a table of processes
+- User inputs:
+  - Arrow keys to move the selection, 'r' to refresh
+  - 'k' to kill the selected process
+  - 'd' to delete the selected file; 'x' to remove it from the list
+  - 's' to save the list to disk, Enter to open the details
+  - 'q' to quit
+- Colors: green and white
+"""
+
+# Renders, warns on stderr, then echoes each key it's sent
+ECHO_SCRIPT = """
+import sys
+print("ready", flush=True)
+print("DeprecationWarning: something old", file=sys.stderr, flush=True)
+while key := sys.stdin.buffer.read(1):
+    print("pressed", key.decode(), flush=True)
+"""
+
+
+######
+# MAIN
+######
+
+
+def test_design_keys_skip_quitting_and_destructive_keys():
+    assert get_design_keys(DESIGN) == ["down", "up", "r", "enter"]
+
+
+def test_warnings_dont_stop_the_replay():
+    proc = Popen(
+        [sys.executable, "-c", ECHO_SCRIPT], stdin=PIPE, stdout=PIPE, stderr=PIPE
+    )
+    try:
+        stdout, stderr, _, _, num_sent = watch_process(
+            proc, timeout=5, settle_time=0.3, keys=["a", "b"], key_delay=0.2
+        )
+    finally:
+        proc.kill()
+        proc.wait()
+        for stream in (proc.stdin, proc.stdout, proc.stderr):
+            stream.close()
+
+    assert "DeprecationWarning" in stderr
+    assert num_sent == 2
+    assert "pressed a" in stdout and "pressed b" in stdout
@@ -0,0 +1,118 @@
+# Standard library
+import json
+import importlib
+
+# Third party
+import pytest
+
+# Local
+from termite.dtos import Script
+
+
+#########
+# HELPERS
+#########
+
+
+library_module = importlib.import_module("termite.library")
+main_module = importlib.import_module("termite.__main__")
+
+CODE = "import urwid\nimport json\n\nprint('Hello')\n"
+
+
+@pytest.fixture
+def library_home(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path))
+    return library_module.get_library_home()
+
+
+def read_index(library_home) -> dict:
+    return json.loads((library_home / "index.json").read_text())["tools"]
+
+
+######
+# MAIN
+######
+
+
+def test_save_tool_indexes_and_compiles(library_home):
+    tui = Script(code=CODE)
+    path = library_module.save_tool(tui, "hello", "Say hello", "urwid")
+
+    assert path == library_home / "hello.py"
+    assert tui.path == str(path)
+    assert (library_home / "__pycache__").is_dir()
+    assert list((library_home / "__pycache__").glob("hello.*.pyc"))
+
+    tool = read_index(library_home)["hello"]
+    assert tool["prompt"] == "Say hello"
+    assert tool["library"] == "urwid"
+    assert tool["dependencies"] == ["urwid"]  # Not the standard library
+
+
+def test_index_is_built_from_existing_scripts(library_home):
+    (library_home / "old_tool.py").write_text(CODE)
+
+    tools = library_module.load_index()
+
+    assert tools["old_tool"]["file"] == "old_tool.py"
+    assert tools["old_tool"]["prompt"] is None
+    assert "old_tool" in read_index(library_home)
+
+
+def test_index_picks_up_scripts_added_later(library_home):
+    library_module.save_tool(Script(code=CODE), "first")
+    (library_home / "added_by_hand.py").write_text(CODE)
+
+    tool = library_module.find_tool("added_by_hand")
+
+    assert tool["file"] == "added_by_hand.py"
+    assert "added_by_hand" in read_index(library_home)
+
+
+def test_index_drops_deleted_scripts(library_home):
+    library_module.save_tool(Script(code=CODE), "gone")
+    (library_home / "gone.py").unlink()
+
+    assert library_module.find_tool("gone") is None
+    assert "gone" not in read_index(library_home)
+
+
+def test_corrupted_index_is_rebuilt(library_home):
+    (library_home / "kept.py").write_text(CODE)
+    (library_home / "index.json").write_text("{not json")
+
+    assert "kept" in library_module.load_index()
+    assert "kept" in read_index(library_home)
+
+
+def test_find_tool_only_matches_exact_names(library_home):
+    library_module.save_tool(Script(code=CODE), "Port_Monitor")
+    library_module.save_tool(Script(code=CODE), "port_scanner")
+
+    assert library_module.find_tool("Port_Monitor")["name"] == "Port_Monitor"
+    assert library_module.find_tool("port_monitor")["name"] == "Port_Monitor"
+    assert library_module.find_tool("port_monitr") is None  # Typo
+    assert library_module.find_tool("port") is None  # Partial
+
+
+def test_typos_get_suggestions(library_home):
+    library_module.save_tool(Script(code=CODE), "Port_Monitor")
+    library_module.save_tool(Script(code=CODE), "port_scanner")
+
+    assert library_module.suggest_tools("port_monitr")[0] == "Port_Monitor"
+    assert set(library_module.suggest_tools("port")) == {
+        "Port_Monitor",
+        "port_scanner",
+    }
+    assert library_module.suggest_tools("redis") == []
+
+
+def test_run_tool_doesnt_run_fuzzy_matches(library_home, capsys):
+    library_module.save_tool(Script(code=CODE), "port_monitor")
+
+    with pytest.raises(SystemExit) as exc_info:
+        main_module.load_script("port_monitr")
+
+    assert exc_info.value.code == 1
+    assert "Did you mean 'port_monitor'?" in capsys.readouterr().out
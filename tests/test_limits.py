@@ -0,0 +1,90 @@
+# Standard library
+import os
+import sys
+import time
+import types
+from subprocess import Popen
+
+# Third party
+import pytest
+
+# Local
+from termite.dtos import Config
+from termite.shared.utils.limits import (
+    get_max_rss_mb,
+    get_runner_env,
+    has_exited,
+    kill_process_tree,
+)
+
+
+#########
+# HELPERS
+#########
+
+
+def wait_for_exit(proc: Popen, timeout: float = 10.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if has_exited(proc):
+            return True
+
+        time.sleep(0.01)
+
+    return False
+
+
+######
+# MAIN
+######
+
+
+@pytest.mark.parametrize("has_waitid", [True, False])
+def test_exit_is_detected_and_usage_kept(monkeypatch, has_waitid):
+    if not has_waitid:
+        monkeypatch.delattr(os, "waitid", raising=False)
+    elif not hasattr(os, "waitid"):
+        pytest.skip("os.waitid isn't available on this platform")
+
+    proc = Popen([sys.executable, "-c", "sum(range(10**6))"], start_new_session=True)
+    assert wait_for_exit(proc)
+    assert has_exited(proc)  # Still true on the next check
+
+    usage = kill_process_tree(proc)
+    assert proc.returncode == 0
+    assert usage is not None
+    max_rss_mb, cpu_time = usage
+    assert max_rss_mb > 0 and cpu_time > 0
+
+
+@pytest.mark.parametrize("has_waitid", [True, False])
+def test_running_process_hasnt_exited(monkeypatch, has_waitid):
+    if not has_waitid:
+        monkeypatch.delattr(os, "waitid", raising=False)
+
+    proc = Popen(
+        [sys.executable, "-c", "import time; time.sleep(30)"], start_new_session=True
+    )
+    try:
+        assert not has_exited(proc)
+    finally:
+        kill_process_tree(proc)
+
+    assert proc.returncode is not None
+
+
+@pytest.mark.parametrize("platform, expected", [("linux", 1024.0), ("darwin", 1.0)])
+def test_max_rss_units(monkeypatch, platform, expected):
+    monkeypatch.setattr(sys, "platform", platform)
+    usage = types.SimpleNamespace(ru_maxrss=1024 * 1024)
+
+    assert get_max_rss_mb(usage) == pytest.approx(expected)
+
+
+def test_memory_limit_is_opt_in(monkeypatch):
+    monkeypatch.delenv("TERMITE_MEMORY_LIMIT", raising=False)
+
+    assert "TERMITE_MEMORY_LIMIT" not in get_runner_env(Config())
+
+    env = get_runner_env(Config(memory_limit_mb=512))
+    assert env["TERMITE_MEMORY_LIMIT"] == str(512 * 1024 * 1024)
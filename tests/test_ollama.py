@@ -0,0 +1,133 @@
+# Standard library
+import json
+import time
+import asyncio
+
+# Third party
+import pytest
+
+# Local
+from termite.dtos import Config
+from tests.helpers import call_llm_module, error, send_body, send_chunks
+
+
+#########
+# HELPERS
+#########
+
+
+MESSAGES = [{"role": "user", "content": "Hi"}]
+WORDS = ["Hello ", "from ", "Ollama"]
+
+
+def message(body, content: str, done: bool) -> bytes:
+    payload = {
+        "model": body["model"],
+        "created_at": "2024-01-01T00:00:00Z",
+        "message": {"role": "assistant", "content": content},
+        "done": done,
+    }
+    return json.dumps(payload).encode() + b"\n"
+
+
+def chat(handler, body):
+    # Mimics Ollama's /api/chat: one JSON object, or NDJSON when streaming
+    if not body.get("stream"):
+        send_body(handler, 200, message(body, "".join(WORDS), True))
+        return
+
+    chunks = [message(body, word, False) for word in WORDS]
+    chunks.append(message(body, "", True))
+    send_chunks(handler, "application/x-ndjson", chunks, delay=0.05)
+
+
+@pytest.fixture
+def ollama_server(fake_server, monkeypatch):
+    monkeypatch.setenv("OLLAMA_MODEL", "test-model")
+    monkeypatch.setenv("OLLAMA_HOST", fake_server.url)
+    fake_server.responses = [chat]
+    return fake_server
+
+
+def get_config(**kwargs) -> Config:
+    return Config(use_cache=False, retry_base_delay=0.01, **kwargs)
+
+
+######
+# MAIN
+######
+
+
+def test_sync_stream_arrives_in_chunks(ollama_server):
+    output = call_llm_module.call_llm("System", MESSAGES, get_config(), stream=True)
+
+    start_time, arrivals = time.monotonic(), []
+    for chunk in output:
+        arrivals.append((chunk, time.monotonic() - start_time))
+
+    assert [chunk for chunk, _ in arrivals] == WORDS
+    assert arrivals[-1][1] - arrivals[0][1] >= 0.08  # Not buffered until the end
+    assert ollama_server.requests[0]["stream"] is True
+
+
+def test_async_stream(ollama_server):
+    async def run():
+        try:
+            output = await call_llm_module.acall_llm(
+                "System", MESSAGES, get_config(), stream=True
+            )
+            return [chunk async for chunk in output]
+        finally:
+            await call_llm_module.aclose_clients()
+
+    assert asyncio.run(run()) == WORDS
+
+
+def test_non_streaming_response(ollama_server):
+    output = call_llm_module.call_llm("System", MESSAGES, get_config())
+    assert output == "".join(WORDS)
+    assert ollama_server.requests[0]["stream"] is False
+
+
+def test_closing_a_stream_early_frees_its_slot(ollama_server):
+    config = get_config(max_llm_calls=1)
+    output = call_llm_module.call_llm("System", MESSAGES, config, stream=True)
+    assert next(output) == WORDS[0]
+    output.close()
+
+    # Would wait forever if the first stream still held the only slot
+    output = call_llm_module.call_llm("System", MESSAGES, config, stream=True)
+    assert "".join(output) == "".join(WORDS)
+
+
+def test_unavailable_is_retried_before_the_first_chunk(ollama_server):
+    ollama_server.responses = [error(503), chat]
+
+    output = call_llm_module.call_llm("System", MESSAGES, get_config(), stream=True)
+
+    assert "".join(output) == "".join(WORDS)
+    assert len(ollama_server.requests) == 2
+
+
+def test_tuning_options_reach_the_request(ollama_server):
+    config = get_config(
+        ollama_keep_alive="1h", ollama_num_ctx=4096, ollama_num_predict=256
+    )
+    call_llm_module.call_llm("System", MESSAGES, config, temperature=0.2)
+
+    request = ollama_server.requests[0]
+    assert request["model"] == "test-model"
+    assert request["keep_alive"] == "1h"
+    assert request["options"] == {
+        "temperature": 0.2,
+        "num_ctx": 4096,
+        "num_predict": 256,
+    }
+
+
+def test_default_options(ollama_server):
+    call_llm_module.call_llm("System", MESSAGES, get_config())
+
+    options = ollama_server.requests[0]["options"]
+    assert options["num_predict"] == call_llm_module.MAX_TOKENS
+    assert options["num_ctx"] == Config().ollama_num_ctx
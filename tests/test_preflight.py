@@ -0,0 +1,194 @@
+# Standard library
+import sys
+import importlib
+
+# Third party
+import pytest
+
+# Local
+from termite.dtos import Config, Script
+
+
+#########
+# HELPERS
+#########
+
+
+preflight_module = importlib.import_module("termite.shared.utils.preflight")
+fix_imports_module = importlib.import_module("termite.shared.utils.fix_imports")
+run_tui_module = importlib.import_module("termite.shared.run_tui")
+
+INSTALLED = {"sys", "os", "urwid"}
+
+PLATFORM_GUARDED = """import sys
+import urwid
+
+if sys.platform == "win32":
+    import msvcrt
+else:
+    import termios
+
+try:
+    import ujson as json
+except ImportError:
+    import json
+
+def main():
+    if sys.platform == "darwin":
+        from AppKit import NSApp
+
+print(urwid)
+"""
+
+
+@pytest.fixture
+def introspect_calls(monkeypatch):
+    """Stands in for the venv, where only INSTALLED modules exist."""
+
+    calls = []
+
+    def introspect(modules, paths):
+        if not modules and not paths:
+            return []  # Like the real one, which doesn't start the venv then
+
+        calls.append((list(modules), list(paths)))
+        return [module for module in modules if module not in INSTALLED]
+
+    monkeypatch.setattr(preflight_module, "introspect", introspect)
+    monkeypatch.setattr(fix_imports_module, "introspect", introspect)
+    return calls
+
+
+@pytest.fixture
+def venv(monkeypatch):
+    """Resolves library paths with the real introspect.py, in this interpreter."""
+
+    monkeypatch.setattr(
+        preflight_module, "get_python_executable", lambda: sys.executable
+    )
+    monkeypatch.setattr(preflight_module, "_path_cache", {})
+
+
+######
+# MAIN
+######
+
+
+def test_guarded_imports_arent_reported(introspect_calls):
+    assert preflight_module.preflight(PLATFORM_GUARDED, "urwid") == ""
+    assert introspect_calls[0][0] == ["sys", "urwid"]
+
+
+def test_unguarded_missing_import_is_reported(introspect_calls):
+    stderr = preflight_module.preflight("import sys\nimport numpy\n", "urwid")
+    assert "ModuleNotFoundError: No module named 'numpy'" in stderr
+
+
+def test_run_tui_asks_the_venv_once(introspect_calls, monkeypatch):
+    monkeypatch.setattr(
+        run_tui_module, "run_in_pseudo_terminal", lambda script, config: ("", "", "")
+    )
+
+    script = Script(code=PLATFORM_GUARDED)
+    run_tui_module.run_tui(script, config=Config(use_cache=False))
+
+    assert len(introspect_calls) == 1
+    assert script.stderr == ""
+
+
+def test_undefined_name_is_reported(introspect_calls):
+    stderr = preflight_module.preflight("def main():\n    show(42)\n", "urwid")
+
+    assert 'File "<string>", line 2, in main' in stderr
+    assert "NameError: name 'show' is not defined" in stderr
+
+
+def test_implicit_names_arent_reported(introspect_calls):
+    code = """
+class Widget:
+    label = __qualname__
+    origin = __module__
+
+print(__name__, __file__, __doc__, Widget.label)
+"""
+    assert preflight_module.preflight(code, "urwid") == ""
+
+
+def test_names_bound_anywhere_arent_reported(introspect_calls):
+    # Scopes aren't tracked, so a name bound anywhere counts as defined
+    code = """
+def draw():
+    return [row for row in rows if (width := len(row)) < limit]
+
+def main():
+    global limit
+    limit = 80
+    try:
+        draw()
+    except ValueError as error:
+        print(error, width)
+
+rows = []
+"""
+    assert preflight_module.preflight(code, "urwid") == ""
+
+
+def test_star_imports_skip_the_name_check(introspect_calls):
+    code = "from urwid import *\n\nText('Hi')\n"
+    assert "NameError" not in preflight_module.preflight(code, "urwid")
+
+
+def test_misspelled_library_attribute_is_reported(venv):
+    code = "import urwid\n\ncolumns = urwid.Colums([])\n"
+    stderr = preflight_module.preflight(code, "urwid")
+
+    assert "AttributeError: module 'urwid' has no attribute 'Colums'" in stderr
+    assert "Did you mean: 'Columns'?" in stderr
+
+
+def test_misspelled_library_import_is_reported(venv):
+    code = "from urwid import Txt\n\nprint(Txt)\n"
+    stderr = preflight_module.preflight(code, "urwid")
+
+    assert "ImportError: cannot import name 'Txt' from 'urwid'" in stderr
+
+
+def test_wrong_arity_library_call_is_reported(venv):
+    code = "import urwid\n\ntext = urwid.Text('a', 'b', 'c', 'd', 'e', 'f')\n"
+    stderr = preflight_module.preflight(code, "urwid")
+
+    assert "TypeError: Text() takes" in stderr
+
+
+def test_wrong_arity_local_calls_are_reported(introspect_calls):
+    code = """
+def render(title, width=80, *, color):
+    return title
+
+render("Hi", 40, 20, color="red")
+render("Hi", colour="red")
+render()
+"""
+    stderr = preflight_module.preflight(code, "urwid")
+
+    assert "render() takes 2 positional arguments but 3 were given" in stderr
+    assert "render() got an unexpected keyword argument 'colour'" in stderr
+    assert "render() missing required arguments: 'title', 'color'" in stderr
+
+
+def test_rebound_and_unpacked_calls_arent_checked(introspect_calls):
+    code = """
+def render(title):
+    return title
+
+args = ["Hi", 40]
+render(*args)
+render(**{"title": "Hi"})
+
+def handler(key):
+    return key
+
+handler = print
+handler(1, 2, 3)
+"""
+    assert preflight_module.preflight(code, "urwid") == ""
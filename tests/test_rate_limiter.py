@@ -0,0 +1,227 @@
+# Standard library
+import json
+import types
+import asyncio
+
+# Third party
+import pytest
+
+# Local
+from termite.dtos import Config
+from tests.helpers import (
+    call_llm_module,
+    rate_limiter_module,
+    error,
+    send_body,
+    send_chunks,
+)
+
+
+#########
+# HELPERS
+#########
+
+
+MESSAGES = [{"role": "user", "content": "Hi"}]
+
+
+def completion(handler, body):
+    payload = {
+        "id": "chatcmpl-1",
+        "object": "chat.completion",
+        "created": 0,
+        "model": body["model"],
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": "Hello"},
+                "finish_reason": "stop",
+            }
+        ],
+    }
+    send_body(handler, 200, json.dumps(payload).encode())
+
+
+def stream_completion(complete: bool):
+    def respond(handler, body):
+        chunks = []
+        for text in ("Hel", "lo"):
+            chunk = {
+                "id": "chatcmpl-1",
+                "object": "chat.completion.chunk",
+                "created": 0,
+                "model": body["model"],
+                "choices": [{"index": 0, "delta": {"content": text}}],
+            }
+            chunks.append(f"data: {json.dumps(chunk)}\n\n".encode())
+
+        if not complete:
+            chunks = chunks[:1]  # Then the connection drops
+        else:
+            chunks.append(b"data: [DONE]\n\n")
+
+        send_chunks(handler, "text/event-stream", chunks, complete=complete)
+
+    return respond
+
+
+@pytest.fixture
+def openai_server(fake_server, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("OPENAI_BASE_URL", f"{fake_server.url}/v1")
+    return fake_server
+
+
+def get_config(**kwargs) -> Config:
+    return Config(use_cache=False, retry_base_delay=0.01, **kwargs)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+######
+# MAIN
+######
+
+
+def test_retries_throttled_and_unavailable_responses(openai_server):
+    openai_server.responses = [
+        error(429, {"retry-after": "0.2"}),
+        error(503),
+        error(429, {"retry-after-ms": "100"}),
+        completion,
+    ]
+
+    output = call_llm_module.call_llm("System", MESSAGES, get_config())
+
+    assert output == "Hello"
+    assert len(openai_server.requests) == 4
+    gaps = openai_server.gaps
+    assert 0.2 <= gaps[0] < 0.35  # Retry-After, plus up to 10% jitter
+    assert gaps[1] < 0.1  # Exponential backoff from retry_base_delay
+    assert 0.1 <= gaps[2] < 0.25  # retry-after-ms
+
+    metrics = rate_limiter_module.get_llm_metrics()["openai"]
+    assert metrics["requests"] == 4
+    assert metrics["retries"] == 3
+    assert metrics["throttled"] == 2
+    assert metrics["backoff_time"] >= 0.3
+
+
+def test_retry_after_is_capped(openai_server):
+    openai_server.responses = [error(429, {"retry-after": "120"}), completion]
+
+    config = get_config(retry_max_delay=0.2)
+    assert call_llm_module.call_llm("System", MESSAGES, config) == "Hello"
+    assert 0.2 <= openai_server.gaps[0] < 0.35
+
+
+def test_gives_up_after_max_retries(openai_server):
+    openai_server.responses = [error(503)]
+
+    with pytest.raises(Exception) as exc_info:
+        call_llm_module.call_llm("System", MESSAGES, get_config(llm_retries=2))
+
+    assert exc_info.value.status_code == 503
+    assert len(openai_server.requests) == 3
+    assert rate_limiter_module.get_llm_metrics()["openai"]["retries"] == 2
+
+
+def test_client_errors_arent_retried(openai_server):
+    openai_server.responses = [error(400)]
+
+    with pytest.raises(Exception):
+        call_llm_module.call_llm("System", MESSAGES, get_config())
+
+    assert len(openai_server.requests) == 1
+
+
+def test_streams_are_retried_before_the_first_chunk(openai_server):
+    openai_server.responses = [
+        error(429, {"retry-after": "0"}),
+        stream_completion(True),
+    ]
+
+    output = call_llm_module.call_llm("System", MESSAGES, get_config(), stream=True)
+
+    assert "".join(output) == "Hello"
+    assert len(openai_server.requests) == 2
+
+
+def test_streams_arent_retried_after_yielding(openai_server):
+    openai_server.responses = [stream_completion(False), stream_completion(True)]
+
+    output = call_llm_module.call_llm("System", MESSAGES, get_config(), stream=True)
+    chunks = []
+    with pytest.raises(Exception):
+        for chunk in output:
+            chunks.append(chunk)
+
+    assert chunks == ["Hel"]
+    assert len(openai_server.requests) == 1
+    assert rate_limiter_module.get_llm_metrics()["openai"]["retries"] == 0
+
+
+def test_async_requests_are_retried(openai_server):
+    openai_server.responses = [error(429, {"retry-after": "0.1"}), completion]
+
+    async def run():
+        try:
+            return await call_llm_module.acall_llm("System", MESSAGES, get_config())
+        finally:
+            await call_llm_module.aclose_clients()
+
+    assert asyncio.run(run()) == "Hello"
+    assert len(openai_server.requests) == 2
+    assert rate_limiter_module.get_llm_metrics()["openai"]["throttled"] == 1
+
+
+def test_token_bucket_goes_into_debt(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(
+        rate_limiter_module, "time", types.SimpleNamespace(monotonic=clock.monotonic)
+    )
+    bucket = rate_limiter_module.TokenBucket(60)  # 1 unit a second
+
+    assert bucket.reserve(60) == 0.0
+    assert bucket.reserve(30) == pytest.approx(30.0)
+
+    bucket.charge(10)  # E.g. output tokens, once they're known
+    assert bucket.reserve(0) == pytest.approx(40.0)
+
+    clock.now += 15
+    assert bucket.reserve(0) == pytest.approx(25.0)
+
+
+def test_token_bucket_caps_requests_and_refills(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(
+        rate_limiter_module, "time", types.SimpleNamespace(monotonic=clock.monotonic)
+    )
+    bucket = rate_limiter_module.TokenBucket(60)
+
+    # A request bigger than the whole budget only has to wait for a full bucket
+    assert bucket.reserve(1000) == 0.0
+    assert bucket.reserve(60) == pytest.approx(60.0)
+
+    clock.now += 1000  # Refills stop at the bucket's capacity
+    assert bucket.reserve(60) == 0.0
+    assert bucket.reserve(1) == pytest.approx(1.0)
+
+
+def test_rate_limiter_waits_on_the_tighter_budget(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(
+        rate_limiter_module, "time", types.SimpleNamespace(monotonic=clock.monotonic)
+    )
+    limiter = rate_limiter_module.RateLimiter(rpm=60, tpm=600)
+
+    assert limiter.reserve(600) == 0.0
+    assert limiter.reserve(300) == pytest.approx(30.0)  # Tokens, not requests
+    assert limiter.metrics["requests"] == 2
+    assert limiter.metrics["wait_time"] == pytest.approx(30.0)
@@ -0,0 +1,126 @@
+# Standard library
+import os
+import sys
+import time
+import importlib
+from subprocess import Popen, PIPE
+
+# Third party
+import pytest
+
+# Local
+from termite.dtos import Config, Script
+
+
+#########
+# HELPERS
+#########
+
+
+run_tui_module = importlib.import_module("termite.shared.run_tui")
+
+RUNNER_FILE = os.path.join(
+    os.path.dirname(run_tui_module.__file__), "utils", "run_pty.py"
+)
+
+# urwid draws on stdout
+URWID_SCRIPT = """
+import urwid
+
+text = urwid.Text("Hello from urwid")
+
+
+def on_key(key):
+    text.set_text(f"pressed {key}")
+
+
+urwid.MainLoop(urwid.Filler(text), unhandled_input=on_key).run()
+"""
+
+# textual draws on stderr, and leaves stdout empty
+TEXTUAL_SCRIPT = """
+from textual.app import App
+from textual.widgets import Static
+
+
+class Echo(App):
+    def compose(self):
+        yield Static("Hello from textual", id="label")
+
+    def on_key(self, event):
+        if event.key == "x":
+            raise RuntimeError("Boom")
+
+        self.query_one("#label", Static).update(f"pressed {event.key}")
+
+
+Echo().run()
+"""
+
+
+def watch_script(tmp_path, code: str, keys=None):
+    script_file = tmp_path / "tui.py"
+    script_file.write_text(code)
+
+    proc = Popen(
+        [sys.executable, RUNNER_FILE, str(script_file)],
+        stdin=PIPE,
+        stdout=PIPE,
+        stderr=PIPE,
+        start_new_session=True,
+    )
+    start = time.monotonic()
+    try:
+        output = run_tui_module.watch_process(
+            proc, timeout=10, settle_time=0.5, keys=keys, key_delay=0.3
+        )
+    finally:
+        run_tui_module.terminate_process(proc)
+
+    return output, time.monotonic() - start
+
+
+######
+# MAIN
+######
+
+
+@pytest.mark.parametrize("code", [URWID_SCRIPT, TEXTUAL_SCRIPT])
+def test_healthy_tui_is_done_once_it_settles(tmp_path, code):
+    (_, _, _, exited, _), elapsed = watch_script(tmp_path, code)
+
+    assert not exited
+    assert elapsed < 8  # Well before the timeout
+
+
+@pytest.mark.parametrize(
+    "code, text",
+    [(URWID_SCRIPT, "Hello from urwid"), (TEXTUAL_SCRIPT, "Hello from textual")],
+)
+def test_snapshot_shows_the_screen(tmp_path, code, text):
+    (_, _, snapshot, _, _), _ = watch_script(tmp_path, code)
+
+    assert text in snapshot
+
+
+@pytest.mark.parametrize("code", [URWID_SCRIPT, TEXTUAL_SCRIPT])
+def test_keys_are_replayed(tmp_path, code):
+    (_, _, snapshot, _, num_sent), _ = watch_script(tmp_path, code, keys=["a"])
+
+    assert num_sent == 1
+    assert "pressed a" in snapshot
+
+
+def test_crash_after_a_key_is_reported(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        run_tui_module, "get_python_executable", lambda: sys.executable
+    )
+
+    script = Script(code=TEXTUAL_SCRIPT)
+    config = Config(
+        pool_size=0, keystrokes=["a", "x"], validate_timeout=10, settle_time=2.0
+    )
+    _, stderr, _ = run_tui_module.run_in_pseudo_terminal(script, config)
+
+    assert stderr.startswith("Crashed after pressing 'x' (keystroke 2 of 2")
+    assert "Boom" in stderr
@@ -0,0 +1,61 @@
+# Standard library
+import sys
+import subprocess
+from pathlib import Path
+from typing import Dict
+
+
+#########
+# HELPERS
+#########
+
+
+REPO_DIR = Path(__file__).resolve().parents[1]
+
+# Slow to import, and not needed to run a saved tool
+LAZY_MODULES = ("openai", "anthropic", "ollama", "termite.termite")
+IMPORT_BUDGET = 0.5  # Seconds for `import termite.__main__`, generous for slow CI
+
+
+def get_import_times() -> Dict[str, float]:
+    """
+    Imports the CLI in a fresh interpreter and returns each module's cumulative
+    import time in seconds.
+    """
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import termite.__main__"],
+        cwd=REPO_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    times = {}
+    for line in result.stderr.split("\n"):
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+
+        _, cumulative, module = line.split("|")
+        times[module.strip()] = int(cumulative) / 1e6
+
+    return times
+
+
+######
+# MAIN
+######
+
+
+def test_cli_doesnt_import_the_pipeline_or_sdks():
+    times = get_import_times()
+
+    imported = [name for name in LAZY_MODULES if name in times]
+    imported += [name for name in times if name.startswith(("openai.", "anthropic."))]
+    assert not imported
+
+
+def test_cli_imports_within_budget():
+    # Best of a few runs, so a busy machine doesn't fail the test
+    best = min(get_import_times()["termite.__main__"] for _ in range(3))
+    assert best < IMPORT_BUDGET
@@ -0,0 +1,66 @@
+# Third party
+import pytest
+
+# Local
+from termite.shared import StreamCollector
+
+
+#########
+# HELPERS
+#########
+
+
+TEXT = "import urwid\n\ndef main():\n    pass\n\n\nmain()"
+
+
+def collect_lines(chunks):
+    collector, lines = StreamCollector(), []
+    for chunk in chunks:
+        lines += collector.add(chunk)
+
+    return lines, collector.finish()
+
+
+def split_every(text: str, size: int):
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+######
+# MAIN
+######
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 7, 100])
+def test_lines_are_split_across_chunk_boundaries(size):
+    lines, text = collect_lines(split_every(TEXT, size))
+
+    assert text == TEXT
+    # Every complete line, once, with the unfinished last line held back
+    assert lines == [line + "\n" for line in TEXT.split("\n")[:-1]]
+
+
+def test_chunks_ending_and_starting_lines():
+    lines, _ = collect_lines(["ab", "c\n", "d\ne", "f\n\n", "g"])
+    assert lines == ["abc\n", "d\n", "ef\n", "\n"]
+
+
+def test_progress_updates_are_batched():
+    updates = []
+    collector = StreamCollector(
+        lambda n, **fields: updates.append(n), update_interval=60
+    )
+    for chunk in split_every(TEXT, 1):
+        collector.add(chunk)
+    collector.finish()
+
+    assert updates == [len(TEXT)]  # One repaint at the end, with every token
+
+
+def test_stream_stats():
+    collector = StreamCollector()
+    assert collector.get_stats() == ""
+
+    collector.collect(["a", "b", "c"])
+    assert collector.num_tokens == 3
+    assert collector.ttft is not None and collector.ttft >= 0
+    assert "to first token" in collector.get_stats()
@@ -0,0 +1,63 @@
+# Standard library
+import gc
+import time
+import asyncio
+import importlib
+
+# Third party
+import pytest
+
+# Local
+from termite.dtos import Config
+
+
+#########
+# HELPERS
+#########
+
+
+termite_module = importlib.import_module("termite.termite")
+
+
+class DesignError(Exception):
+    pass
+
+
+@pytest.fixture
+def warm_up_calls(monkeypatch):
+    calls = []
+
+    def warm_up(config):
+        time.sleep(0.2)
+        calls.append("done")
+        raise RuntimeError("Warm-up failed")
+
+    async def design_tui(prompt, p_bar, config):
+        raise DesignError("LLM is down")
+
+    monkeypatch.setattr(termite_module, "_warm_up", warm_up)
+    monkeypatch.setattr(termite_module, "adesign_tui", design_tui)
+    return calls
+
+
+######
+# MAIN
+######
+
+
+def test_warm_up_is_awaited_when_the_design_fails(warm_up_calls):
+    unhandled = []
+
+    async def run():
+        asyncio.get_running_loop().set_exception_handler(
+            lambda loop, context: unhandled.append(context)
+        )
+        with pytest.raises(DesignError):  # Not the warm-up's error
+            await termite_module.atermite("A clock", Config(quiet=True))
+
+        calls = list(warm_up_calls)
+        gc.collect()  # An unretrieved task exception is reported here
+        return calls
+
+    assert asyncio.run(run()) == ["done"]  # Finished before the error was raised
+    assert not unhandled
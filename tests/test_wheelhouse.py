@@ -0,0 +1,129 @@
+# Standard library
+import importlib
+from subprocess import CalledProcessError
+
+# Third party
+import pytest
+
+
+#########
+# HELPERS
+#########
+
+
+python_exe_module = importlib.import_module("termite.shared.utils.python_exe")
+wheelhouse_module = importlib.import_module("termite.shared.utils.wheelhouse")
+
+LOCKFILE = """# Pinned
+urwid==4.2.5
+textual==99.0.0 --hash=sha256:abc  # No wheel for this one
+
+-r other.txt
+rich==15.0.0; python_version >= "3.8"
+"""
+
+
+@pytest.fixture
+def installable(monkeypatch):
+    """Stands in for pip, which can only install the given requirements."""
+
+    calls, available = [], set()
+
+    def install_packages(requirements):
+        calls.append(list(requirements))
+        if not all(requirement in available for requirement in requirements):
+            raise CalledProcessError(1, "pip")
+
+    monkeypatch.setattr(wheelhouse_module, "install_packages", install_packages)
+    return calls, available
+
+
+######
+# MAIN
+######
+
+
+def test_shipped_lockfile_pins_the_tui_libraries():
+    requirements = python_exe_module.read_requirements(python_exe_module.SEED_LOCKFILE)
+    names = {python_exe_module.get_requirement_name(r) for r in requirements}
+
+    assert set(python_exe_module.SEED_REQUIREMENTS) <= names
+    assert all("==" in requirement for requirement in requirements)
+
+
+def test_lockfile_is_parsed(tmp_path):
+    lockfile = tmp_path / "requirements.txt"
+    lockfile.write_text(LOCKFILE)
+
+    assert python_exe_module.read_requirements(str(lockfile)) == [
+        "urwid==4.2.5",
+        "textual==99.0.0",
+        'rich==15.0.0; python_version >= "3.8"',
+    ]
+
+
+def test_seed_falls_back_per_package(installable, tmp_path):
+    calls, available = installable
+    available.update(["urwid==4.2.5", "textual"])
+    available.add('rich==15.0.0; python_version >= "3.8"')
+    lockfile = tmp_path / "requirements.txt"
+    lockfile.write_text(LOCKFILE)
+
+    assert wheelhouse_module.seed_venv(str(lockfile)) == []
+    assert calls[0] == ["-r", str(lockfile)]  # All at once first
+    assert calls[1:] == [
+        ["urwid==4.2.5"],
+        ["textual==99.0.0"],
+        ["textual"],  # Any version, since the pin can't be installed
+        ['rich==15.0.0; python_version >= "3.8"'],
+    ]
+
+
+def test_seed_reports_what_couldnt_be_installed(installable, monkeypatch):
+    calls, available = installable
+    available.update(["urwid==4.2.5"])
+    monkeypatch.setattr(
+        wheelhouse_module,
+        "get_seed_requirements",
+        lambda: ["urwid==4.2.5", "textual==8.2.8"],
+    )
+
+    assert wheelhouse_module.seed_venv() == ["textual"]
+    assert calls[0] == ["urwid==4.2.5", "textual==8.2.8"]
+
+
+def test_seed_installs_everything_in_one_go(installable, monkeypatch):
+    calls, available = installable
+    available.update(["urwid==4.2.5", "textual==8.2.8"])
+    monkeypatch.setattr(
+        wheelhouse_module,
+        "get_seed_requirements",
+        lambda: ["urwid==4.2.5", "textual==8.2.8"],
+    )
+
+    assert wheelhouse_module.seed_venv() == []
+    assert len(calls) == 1
+
+
+def test_offline_seed_falls_back_per_package(monkeypatch):
+    calls, available = [], {"urwid==4.2.5", "textual"}
+
+    def install_offline(executable, requirements):
+        calls.append(list(requirements))
+        return all(requirement in available for requirement in requirements)
+
+    monkeypatch.setattr(python_exe_module, "install_offline", install_offline)
+    monkeypatch.setattr(
+        python_exe_module,
+        "get_seed_requirements",
+        lambda: ["urwid==4.2.5", "textual==99.0.0", "rich==15.0.0"],
+    )
+
+    assert python_exe_module.seed_from_wheelhouse("python") == ["rich"]
+    assert calls[1:] == [
+        ["urwid==4.2.5"],
+        ["textual==99.0.0"],
+        ["textual"],
+        ["rich==15.0.0"],
+        ["rich"],
+    ]